@@ -1,10 +1,15 @@
-import sys
+import time
+import argparse
+import importlib
+from concurrent.futures import ThreadPoolExecutor
 from data_parser import extract_data as ed
 from .createTrainingDataset import cluster_transaction_descriptions_with_amounts_split_pytorch as cluster_func
 from .store_load_data import save_dict, load_dict
 from .transaction_mapping import assign_categories_to_clusters as assign_rule
 from .transaction_mapping_llm import assign_categories_to_clusters as assign_llm
 from .transaction_mapping_llm_direct import classify_transaction_descriptions_with_amounts_split_pytorch as assign_llm_direct
+from . import merchant_matcher
+from .classification_cascade import classify_transactions_cascade
 import pandas as pd
 
 
@@ -27,113 +32,221 @@ def classification_pipeline(df, cluster_func, assign_func=None, **kwargs):
            text_column, debit_column, credit_column, candidate_labels, model_name, context, few_shot_prompt.
          Pass any that exist along with df to cluster_func.
       2. Return the dataframe received from cluster_func.
+
+    With a merchant dictionary (kwargs merchant_dictionary, a CSV path or MerchantMatcher,
+    defaulting to MERCHANT_DICTIONARY_PATH), rows that match it with at least
+    merchant_min_confidence are categorized directly and only the other rows go through
+    the steps above.
     """
+    merchant_dictionary = kwargs.get("merchant_dictionary", merchant_matcher.DEFAULT_MERCHANT_DICTIONARY_PATH)
+    # The cascade applies the merchant dictionary itself, as part of its first tier.
+    if merchant_dictionary is None or df.empty or cluster_func is classify_transactions_cascade:
+        return _classify(df, cluster_func, assign_func, **kwargs)
+
+    categories, _ = merchant_matcher.categorize_by_merchant(
+        df,
+        text_column=kwargs.get("text_column", "Transaction Description"),
+        debit_column=kwargs.get("debit_column", "Debit"),
+        credit_column=kwargs.get("credit_column", "Credit"),
+        merchant_dictionary=merchant_dictionary,
+        min_confidence=kwargs.get("merchant_min_confidence", merchant_matcher.DEFAULT_MERCHANT_MIN_CONFIDENCE),
+    )
+    matched = categories.notnull().values
+    labeled_df = df.copy()
+    if not matched.all():
+        rest = df[~matched]
+        rest_categories = _classify(rest, cluster_func, assign_func, **kwargs)["Category"]
+        if rest.index.is_unique:
+            rest_categories = rest_categories.reindex(rest.index)
+        # Filled in by position, so the rows keep the order of df even with duplicate index labels.
+        categories = categories.astype(object).values.copy()
+        categories[~matched] = rest_categories.values
+    labeled_df["Category"] = categories
+    return labeled_df
+
+def _cluster(df, cluster_func, **kwargs):
+    # Collect kwargs for clustering.
+    cluster_keys = ["text_column", "debit_column", "credit_column", "num_clusters", "amount_scale", "model_name", "embedding_model_name", "embedding_batch_size", "use_embedding_cache",
+                    "kmeans_seed", "kmeans_n_init", "kmeans_mini_batch", "auto_k_max", "auto_k_method", "auto_k_time_budget"]
+    cluster_args = {k: kwargs[k] for k in cluster_keys if k in kwargs}
+    
+    # Call the clustering function.
+    return cluster_func(df, **cluster_args)
+
+def _assign(cluster_df, assign_func, **kwargs):
+    # Collect kwargs for assignment.
+    assign_keys = ["text_column", "context", "candidate_labels", "model_name", "few_shot_prompt", "embedding_model_name", "label_template",
+                   "zero_shot_batch_size", "cluster_sample_nearest", "cluster_sample_frequent", "cluster_token_budget", "category_rules"]
+    assign_args = {k: kwargs[k] for k in assign_keys if k in kwargs}
+    
+    # Call the assignment function (which returns a DataFrame with a "Category" column).
+    assigned_df = assign_func(cluster_df, **assign_args)
+    
+    # Drop the "Cluster" column.
+    if "Cluster" in assigned_df.columns:
+        assigned_df = assigned_df.drop(columns=["Cluster"])
+    return assigned_df
+
+def _classify(df, cluster_func, assign_func=None, **kwargs):
     # If an assign_func is provided, perform clustering first then assignment.
     if assign_func is not None:
-        # Collect kwargs for clustering.
-        cluster_keys = ["text_column", "debit_column", "credit_column", "num_clusters", "amount_scale", "model_name", "embedding_model_name"]
-        cluster_args = {k: kwargs[k] for k in cluster_keys if k in kwargs}
-        
-        # Call the clustering function.
-        cluster_df = cluster_func(df, **cluster_args)
-        
-        # Collect kwargs for assignment.
-        assign_keys = ["text_column", "context", "candidate_labels", "model_name", "few_shot_prompt"]
-        assign_args = {k: kwargs[k] for k in assign_keys if k in kwargs}
-        
-        # Call the assignment function (which returns a DataFrame with a "Category" column).
-        assigned_df = assign_func(cluster_df, **assign_args)
-        
-        # Drop the "Cluster" column.
-        if "Cluster" in assigned_df.columns:
-            assigned_df = assigned_df.drop(columns=["Cluster"])
-        return assigned_df
+        return _assign(_cluster(df, cluster_func, **kwargs), assign_func, **kwargs)
 
     else:
         # If assign_func is None, use a slightly different set of kwargs for the cluster_func.
-        alt_keys = ["text_column", "debit_column", "credit_column", "candidate_labels", "model_name", "context", "few_shot_prompt"]
+        alt_keys = ["text_column", "debit_column", "credit_column", "candidate_labels", "model_name", "context", "few_shot_prompt",
+                    "zero_shot_batch_size", "deduplicate", "use_label_cache", "embedding_model_name", "label_template",
+                    "use_embedding_cache", "category_rules", "merchant_dictionary", "cascade_rule_threshold",
+                    "cascade_embedding_threshold", "cascade_stats"]
         alt_args = {k: kwargs[k] for k in alt_keys if k in kwargs}
         return cluster_func(df, **alt_args)
 
 
-def run_comparison(df, **kwargs):
+# Name -> (cluster_func, assign_func), as passed to classification_pipeline.
+DEFAULT_COMPARISON_STRATEGIES = {
+    "Rule": (cluster_func, assign_rule),
+    "LLM": (cluster_func, assign_llm),
+    "LLM Direct": (assign_llm_direct, None),
+}
+
+def agreement_matrix(categories):
     """
-    Calls the extraction pipeline on pdf_file and then applies three classification
-    combinations.
-    
-    Combinations:
-      1. cluster_func = cluster_func, assign_func = assign_rule
-      2. cluster_func = cluster_func, assign_func = assign_llm
-      3. cluster_func = assign_llm_direct, assign_func = None
-      
-    Then prints the original Transaction Description and the Category column for each run.
-    
-    Additional kwargs are passed along to the classification pipeline.
+    Returns the share of rows on which each pair of columns of categories holds the same
+    label (two missing labels agree).
     """
-    # Combination 1
-    df_rule = classification_pipeline(
-        df,
-        cluster_func=cluster_func,  # your cluster function, assumed to be imported elsewhere
-        assign_func=assign_rule,
-        **kwargs
-    )
-    
-    # Combination 2
-    df_llm = classification_pipeline(
-        df,
-        cluster_func=cluster_func,
-        assign_func=assign_llm,
-        **kwargs
-    )
-    
-    # Combination 3: assign_func is None, and we directly use the assign_llm_direct function as cluster_func.
-    df_llm_direct = classification_pipeline(
-        df,
-        cluster_func=assign_llm_direct,
-        assign_func=None,
-        **kwargs
-    )
-    results = {
-    "rule": df_rule,          # obtained earlier from assign_rule
-    "llm": df_llm,            # obtained earlier from assign_llm
-    "llm_direct": df_llm_direct  # obtained earlier from assign_llm_direct
-    }
-
-    # Combine the outputs based on the assumption that the rows align by index.
-    # (This should be the case if the extraction pipeline preserves order.)
-    comparison_df = pd.DataFrame({
-        "Transaction Description": results["rule"]["Transaction Description"],
-        "Rule Category": results["rule"]["Category"],
-        "LLM Category": results["llm"]["Category"],
-        "LLM Direct Category": results["llm_direct"]["Category"]
-    })
-    print(comparison_df)
+    names = list(categories.columns)
+    values = {name: categories[name].astype(object).where(categories[name].notnull(), None) for name in names}
+    matrix = pd.DataFrame(1.0, index=names, columns=names)
+    for i, first in enumerate(names):
+        for second in names[i + 1:]:
+            share = float((values[first] == values[second]).mean()) if len(categories) else 1.0
+            matrix.loc[first, second] = matrix.loc[second, first] = share
+    return matrix
 
+def run_comparison(df, strategies=None, max_workers=None, labels_column=None, verbose=True, **kwargs):
+    """
+    Applies several classification strategies to the same DataFrame and compares them.
 
-if __name__ == '__main__':
-    loadPath = sys.argv[1]
-    savePath = sys.argv[2]
-    # files = [0,1,3]
-    # dataDirectory = {}
-    # for num in files:
-    #     pdf_file = 'pdfData/Untitled'+str(num)+'.pdf'
-    #     data = ed.data_extract_and_clean_pipeline(pdf_file)
-
-    #     dataDirectory[num] = data
-    # save_dict(dataDirectory, path)
-    dataDirectory = load_dict(loadPath)
-    run_comparison(dataDirectory[1], model_name = 'facebook/bart-large-mnli')
-    
-    # labeledDirectory = {}
-    # for key in dataDirectory.keys():
-        
-    #     clusters  = cluster_func(dataDirectory[key], amount_scale=.1, model_name='mgrella/autonlp-bank-transaction-classification-5521155',
-    #                              num_clusters=[5,2])
-    #     labeledDirectory[key] = clusters
-    # save_dict(labeledDirectory, savePath)
-    
+    Strategies with an assign_func share one clustering per cluster_func, computed once
+    up front. The assign step of every strategy (or the whole direct classification when
+    assign_func is None) then runs concurrently in a thread pool; the models are shared
+    through the model registry. The merchant dictionary pre-step of classification_pipeline
+    is not applied, so every strategy is compared on every row.
 
+    Default strategies:
+      1. "Rule":       cluster_func = cluster_func, assign_func = assign_rule
+      2. "LLM":        cluster_func = cluster_func, assign_func = assign_llm
+      3. "LLM Direct": cluster_func = assign_llm_direct, assign_func = None
 
+    Parameters:
+      df (pd.DataFrame): The transactions.
+      strategies (dict): Name -> (cluster_func, assign_func); defaults to DEFAULT_COMPARISON_STRATEGIES.
+      max_workers (int): Threads running strategies; defaults to one per strategy.
+      labels_column (str): Column of df with reference labels; adds it to the agreement
+                           matrix and an accuracy per strategy.
+      verbose (bool): Print the categories, agreement matrix and timings.
+      **kwargs: Passed along as for classification_pipeline.
 
+    Returns:
+      dict: "categories" (the description and one '<name> Category' column per strategy),
+            "agreement" (agreement_matrix of the strategies), "timings" (seconds, rows and
+            rows_per_second per strategy and per shared clustering, plus accuracy with
+            labels_column) and "seconds" (wall-clock time of the whole comparison).
+    """
+    strategies = strategies or DEFAULT_COMPARISON_STRATEGIES
+    text_column = kwargs.get("text_column", "Transaction Description")
+    started = time.perf_counter()
+    timings = {}
 
-    
+    clustered = {}
+    for shared_cluster_func, assign_func in strategies.values():
+        if assign_func is not None and shared_cluster_func not in clustered:
+            cluster_started = time.perf_counter()
+            clustered[shared_cluster_func] = _cluster(df, shared_cluster_func, **kwargs)
+            timings[f"clustering: {shared_cluster_func.__name__}"] = time.perf_counter() - cluster_started
+
+    def run(strategy_cluster_func, assign_func):
+        strategy_started = time.perf_counter()
+        if assign_func is None:
+            result = _classify(df, strategy_cluster_func, None, **kwargs)
+        else:
+            result = _assign(clustered[strategy_cluster_func], assign_func, **kwargs)
+        return result, time.perf_counter() - strategy_started
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(strategies)) as pool:
+        futures = {name: pool.submit(run, *funcs) for name, funcs in strategies.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    labels = pd.DataFrame({name: result["Category"].reindex(df.index) for name, (result, _) in results.items()})
+    if labels_column is not None:
+        labels[labels_column] = df[labels_column]
+    for name, (_, seconds) in results.items():
+        timings[name] = seconds
+
+    timings = pd.DataFrame({"seconds": pd.Series(timings)})
+    timings["rows"] = len(df)
+    timings["rows_per_second"] = timings["rows"] / timings["seconds"]
+    agreement = agreement_matrix(labels)
+    if labels_column is not None:
+        timings["accuracy"] = agreement[labels_column].reindex(timings.index)
+
+    categories = pd.concat([df[text_column], labels.add_suffix(" Category")], axis=1)
+    report = {"categories": categories, "agreement": agreement, "timings": timings,
+              "seconds": time.perf_counter() - started}
+    if verbose:
+        print(categories)
+        print(agreement)
+        print(timings)
+    return report
+
+def _load_strategy(spec):
+    # "Name=package.module:function" -> (name, function)
+    name, _, target = spec.partition("=")
+    module_name, _, function_name = target.partition(":")
+    return name, getattr(importlib.import_module(module_name), function_name)
+
+def _load_transactions(path, key=None):
+    if path.lower().endswith(".pdf"):
+        return ed.data_extract_and_clean_pipeline(path)
+    if path.lower().endswith(".csv"):
+        return pd.read_csv(path)
+    # A dictionary of DataFrames saved with save_dict.
+    dataDirectory = load_dict(path)
+    if key is None:
+        key = 1 if 1 in dataDirectory else next(iter(dataDirectory))
+    return dataDirectory[key]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare classification strategies on one set of transactions.")
+    parser.add_argument("data", help="A statement PDF, a CSV of transactions, or a save_dict file of DataFrames.")
+    parser.add_argument("--key", help="Entry of a save_dict file to use (default 1, or the first).")
+    parser.add_argument("--labels-column", help="Column with reference labels, for accuracy.")
+    parser.add_argument("--model-name", default="facebook/bart-large-mnli")
+    parser.add_argument("--embedding-model-name")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--strategy", action="append", default=[], metavar="NAME=MODULE:FUNCTION",
+                        help="Add a direct classifier (used as cluster_func with assign_func=None).")
+    parser.add_argument("--assign-strategy", action="append", default=[], metavar="NAME=MODULE:FUNCTION",
+                        help="Add an assign_func that labels the shared clustering.")
+    parser.add_argument("--save", metavar="PATH", help="Save the comparison report with save_dict.")
+    args = parser.parse_args()
+
+    key = args.key
+    if key is not None and key.isdigit():
+        key = int(key)
+    data = _load_transactions(args.data, key)
+    strategies = dict(DEFAULT_COMPARISON_STRATEGIES)
+    for spec in args.strategy:
+        name, function = _load_strategy(spec)
+        strategies[name] = (function, None)
+    for spec in args.assign_strategy:
+        name, function = _load_strategy(spec)
+        strategies[name] = (cluster_func, function)
+    options = {"model_name": args.model_name}
+    if args.embedding_model_name:
+        options["embedding_model_name"] = args.embedding_model_name
+    report = run_comparison(data, strategies=strategies, max_workers=args.workers, labels_column=args.labels_column,
+                            **options)
+    if args.save:
+        save_dict(report, args.save)
@@ -0,0 +1,199 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+import analyzer.default_classification_settings as default_classification_settings
+import analyzer.transaction_mapping as transaction_mapping
+import analyzer.merchant_matcher as merchant_matcher
+import analyzer.transaction_mapping_embedding as transaction_mapping_embedding
+import analyzer.transaction_mapping_llm_direct as transaction_mapping_llm_direct
+
+DEFAULT_CANDIDATE_LABELS = default_classification_settings.DEFAULT_CANDIDATE_LABELS
+DEFAULT_MODEL_NAME = default_classification_settings.DEFAULT_CLASSIFICATION_MODEL
+DEFAULT_EMBEDDING_MODEL = default_classification_settings.DEFAULT_EMBEDDING_MODEL
+DEFAULT_HYPOTHESIS_TEMPLATE = default_classification_settings.DEFAULT_HYPOTHESIS_TEMPLATE
+DEFAULT_ZERO_SHOT_BATCH_SIZE = default_classification_settings.DEFAULT_ZERO_SHOT_BATCH_SIZE
+DEFAULT_MERCHANT_DICTIONARY_PATH = default_classification_settings.DEFAULT_MERCHANT_DICTIONARY_PATH
+DEFAULT_CASCADE_RULE_THRESHOLD = default_classification_settings.DEFAULT_CASCADE_RULE_THRESHOLD
+DEFAULT_CASCADE_EMBEDDING_THRESHOLD = default_classification_settings.DEFAULT_CASCADE_EMBEDDING_THRESHOLD
+
+RULES = "rules"
+EMBEDDING = "embedding"
+ZERO_SHOT = "zero_shot"
+TIERS = (RULES, EMBEDDING, ZERO_SHOT)
+
+
+class CascadeStats:
+    """
+    Per-tier counters: rows offered to the tier, rows it labeled (hits) and time spent.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = {}
+
+    def record(self, tier, rows, hits, seconds):
+        with self._lock:
+            counters = self._tiers.setdefault(tier, {"rows": 0, "hits": 0, "seconds": 0.0})
+            counters["rows"] += rows
+            counters["hits"] += hits
+            counters["seconds"] += seconds
+
+    def snapshot(self):
+        """
+        Returns {tier: {rows, hits, hit_rate, seconds, rows_per_second}} for the tiers that ran.
+        """
+        with self._lock:
+            return {
+                tier: {
+                    "rows": c["rows"],
+                    "hits": c["hits"],
+                    "hit_rate": c["hits"] / c["rows"] if c["rows"] else 0.0,
+                    "seconds": c["seconds"],
+                    "rows_per_second": c["rows"] / c["seconds"] if c["seconds"] else 0.0,
+                }
+                for tier, c in self._tiers.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._tiers.clear()
+
+
+_stats = CascadeStats()
+
+def get_stats():
+    """
+    Returns the cascade's per-tier counters accumulated since the process started (or reset_stats).
+    """
+    return _stats.snapshot()
+
+def reset_stats():
+    _stats.reset()
+
+def _classify_rules(rows, text_column, category_rules, merchant_dictionary):
+    # Keyword rules, overridden by a more confident merchant match when a dictionary is configured.
+    texts = rows[text_column].values
+    categories, confidences = transaction_mapping.match_transactions_by_rules(texts, category_rules)
+    if merchant_dictionary is not None:
+        merchants, merchant_confidences = merchant_matcher.get_matcher(merchant_dictionary).match(texts.tolist())
+        better = merchants.notnull() & (merchant_confidences > confidences)
+        categories = categories.astype(object).where(~better, merchants)
+        confidences = confidences.where(~better, merchant_confidences)
+    return categories.values, confidences.values
+
+def _classify_embedding(rows, text_column, candidate_labels, embedding_model_name, label_template, use_embedding_cache):
+    labels, scores = transaction_mapping_embedding.classify_texts_by_similarity(
+        rows[text_column].fillna("").tolist(), candidate_labels, embedding_model_name, label_template,
+        use_embedding_cache=use_embedding_cache)
+    return np.asarray(labels, dtype=object), scores.numpy().astype(float)
+
+def _classify_zero_shot(rows, text_column, debit_column, credit_column, candidate_labels, model_name,
+                        zero_shot_batch_size, use_label_cache):
+    # The final tier labels every row it gets; labels may come from the label cache, so no score is kept.
+    classified = transaction_mapping_llm_direct.classify_transaction_descriptions_with_amounts_split_pytorch(
+        rows, text_column=text_column, debit_column=debit_column, credit_column=credit_column,
+        candidate_labels=candidate_labels, model_name=model_name, zero_shot_batch_size=zero_shot_batch_size,
+        use_label_cache=use_label_cache)
+    return classified.loc[rows.index, "Category"].values, np.full(len(rows), np.nan)
+
+def classify_transactions_cascade(
+    df,
+    text_column="Transaction Description",
+    debit_column="Debit",
+    credit_column="Credit",
+    candidate_labels=DEFAULT_CANDIDATE_LABELS,
+    model_name=DEFAULT_MODEL_NAME,
+    embedding_model_name=DEFAULT_EMBEDDING_MODEL,
+    label_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+    category_rules=None,
+    merchant_dictionary=DEFAULT_MERCHANT_DICTIONARY_PATH,
+    cascade_rule_threshold=DEFAULT_CASCADE_RULE_THRESHOLD,
+    cascade_embedding_threshold=DEFAULT_CASCADE_EMBEDDING_THRESHOLD,
+    use_embedding_cache=True,
+    zero_shot_batch_size=DEFAULT_ZERO_SHOT_BATCH_SIZE,
+    use_label_cache=True,
+    cascade_stats=None,
+    **kwargs
+):
+    """
+    Classifies every transaction with a cascade of increasingly expensive tiers. A row
+    leaves the cascade at the first tier whose confidence reaches that tier's threshold:
+
+      1. rules:     keyword rules (transaction_mapping) and, when configured, the merchant
+                    dictionary (merchant_matcher); confidence is the matching rule's.
+      2. embedding: cosine similarity to the label prototypes (transaction_mapping_embedding);
+                    confidence is the winning similarity.
+      3. zero_shot: the zero-shot NLI classifier (transaction_mapping_llm_direct) labels
+                    all remaining rows.
+
+    Use it as cluster_func with assign_func=None. Per-tier row, hit and timing counters are
+    added to the process-wide totals (get_stats).
+
+    Parameters:
+      df (pd.DataFrame): Input DataFrame containing at least the columns
+                         'Transaction Description', 'Debit', and 'Credit'.
+      text_column, debit_column, credit_column (str): Column names.
+      candidate_labels (list): Labels for the embedding and zero-shot tiers.
+      model_name (str): The zero-shot classification model.
+      embedding_model_name (str): The sentence-embedding model.
+      label_template (str): Template turning a label into its prototype sentence.
+      category_rules: Rules list, rules file path, or None for the default rules file.
+      merchant_dictionary: Merchant CSV path or MerchantMatcher; None skips merchant matching.
+      cascade_rule_threshold (float): Minimum rule confidence; None skips the rules tier.
+      cascade_embedding_threshold (float): Minimum cosine similarity; None skips the embedding tier.
+      use_embedding_cache (bool): Reuse cached embeddings for descriptions seen before.
+      zero_shot_batch_size (int): Premise/hypothesis pairs per forward pass.
+      use_label_cache (bool): Reuse zero-shot labels from earlier statements.
+      cascade_stats (dict): If given, filled with this call's per-tier counters.
+
+    Returns:
+      pd.DataFrame: The original DataFrame with added 'Category', 'Category Tier' and
+                    'Category Confidence' columns. Rows with neither debit nor credit are
+                    'Unclassified' and have no tier.
+    """
+    df = df.copy()
+    categories = np.full(len(df), None, dtype=object)
+    tiers = np.full(len(df), None, dtype=object)
+    confidences = np.full(len(df), np.nan)
+    has_amount = (df[debit_column].notnull() | df[credit_column].notnull()).values
+    categories[~has_amount] = "Unclassified"
+    pending = has_amount.copy()
+
+    classifiers = [
+        (RULES, cascade_rule_threshold,
+         lambda rows: _classify_rules(rows, text_column, category_rules, merchant_dictionary)),
+        (EMBEDDING, cascade_embedding_threshold,
+         lambda rows: _classify_embedding(rows, text_column, candidate_labels, embedding_model_name, label_template,
+                                          use_embedding_cache)),
+        (ZERO_SHOT, None,
+         lambda rows: _classify_zero_shot(rows, text_column, debit_column, credit_column, candidate_labels, model_name,
+                                          zero_shot_batch_size, use_label_cache)),
+    ]
+    call_stats = CascadeStats()
+    for tier, threshold, classify in classifiers:
+        if not pending.any():
+            break
+        final = tier == ZERO_SHOT
+        if threshold is None and not final:
+            continue
+        positions = np.flatnonzero(pending)
+        started = time.perf_counter()
+        labels, scores = classify(df.iloc[positions])
+        seconds = time.perf_counter() - started
+        accepted = pd.notnull(labels)
+        if not final:
+            accepted &= scores >= threshold
+        categories[positions[accepted]] = labels[accepted]
+        tiers[positions[accepted]] = tier
+        confidences[positions[accepted]] = scores[accepted]
+        pending[positions[accepted]] = False
+        for counters in (_stats, call_stats):
+            counters.record(tier, len(positions), int(accepted.sum()), seconds)
+
+    if cascade_stats is not None:
+        cascade_stats.update(call_stats.snapshot())
+    df["Category"] = categories
+    df["Category Tier"] = tiers
+    # None rather than NaN, so the transactions stay valid JSON.
+    df["Category Confidence"] = pd.Series([None if np.isnan(c) else float(c) for c in confidences], index=df.index, dtype=object)
+    return df
@@ -0,0 +1,308 @@
+import math
+import time
+import torch
+import analyzer.default_classification_settings as default_classification_settings
+
+DEFAULT_AUTO_K_MAX = default_classification_settings.DEFAULT_AUTO_K_MAX
+DEFAULT_AUTO_K_METHOD = default_classification_settings.DEFAULT_AUTO_K_METHOD
+DEFAULT_AUTO_K_SAMPLE_SIZE = default_classification_settings.DEFAULT_AUTO_K_SAMPLE_SIZE
+DEFAULT_AUTO_K_TIME_BUDGET = default_classification_settings.DEFAULT_AUTO_K_TIME_BUDGET
+DEFAULT_KMEANS_MAX_ITER = default_classification_settings.DEFAULT_KMEANS_MAX_ITER
+DEFAULT_KMEANS_MINIBATCH_SIZE = default_classification_settings.DEFAULT_KMEANS_MINIBATCH_SIZE
+DEFAULT_KMEANS_MINIBATCH_THRESHOLD = default_classification_settings.DEFAULT_KMEANS_MINIBATCH_THRESHOLD
+DEFAULT_KMEANS_N_INIT = default_classification_settings.DEFAULT_KMEANS_N_INIT
+DEFAULT_KMEANS_SEED = default_classification_settings.DEFAULT_KMEANS_SEED
+
+_ASSIGN_CHUNK_SIZE = 65536
+
+
+def make_generator(seed=DEFAULT_KMEANS_SEED):
+    """
+    Returns a torch.Generator seeded with seed, or from system entropy when seed is None.
+    """
+    generator = torch.Generator()
+    if seed is None:
+        generator.seed()
+    else:
+        generator.manual_seed(seed)
+    return generator
+
+def squared_distances(X, centroids, X_sq=None, centroids_sq=None):
+    """
+    Squared Euclidean distances (N, K) computed as |x|^2 - 2 x.c + |c|^2, one matmul.
+    Precomputed squared row norms can be passed in as X_sq and centroids_sq.
+    """
+    if X_sq is None:
+        X_sq = (X * X).sum(dim=1)
+    if centroids_sq is None:
+        centroids_sq = (centroids * centroids).sum(dim=1)
+    distances = X_sq[:, None] - 2 * (X @ centroids.T) + centroids_sq[None, :]
+    return distances.clamp_min_(0)
+
+def assign_clusters(X, centroids, X_sq=None, chunk_size=_ASSIGN_CHUNK_SIZE):
+    """
+    Returns (cluster_ids, squared distance to the nearest centroid) for every row,
+    processing chunk_size rows at a time to bound memory.
+    """
+    if X_sq is None:
+        X_sq = (X * X).sum(dim=1)
+    ids = torch.empty(X.shape[0], dtype=torch.long)
+    min_d = torch.empty(X.shape[0], dtype=X.dtype)
+    for start in range(0, X.shape[0], chunk_size):
+        end = start + chunk_size
+        min_d[start:end], ids[start:end] = squared_distances(X[start:end], centroids, X_sq[start:end]).min(dim=1)
+    return ids, min_d
+
+def kmeans_plusplus(X, num_clusters, generator, X_sq=None):
+    """
+    Greedy k-means++ seeding: each new centroid is the best (lowest resulting potential)
+    of 2 + log(k) candidates sampled proportionally to the squared distance to the
+    nearest centroid chosen so far.
+    """
+    N = X.shape[0]
+    if X_sq is None:
+        X_sq = (X * X).sum(dim=1)
+    n_trials = 2 + int(math.log(num_clusters))
+
+    first = torch.randint(N, (1,), generator=generator)
+    centroids = X[first]
+    min_d = squared_distances(X, centroids, X_sq)[:, 0]
+    for _ in range(1, num_clusters):
+        weights = min_d if min_d.sum() > 0 else torch.ones_like(min_d)
+        candidates = torch.multinomial(weights, n_trials, replacement=True, generator=generator)
+        # Potential after adding each candidate: shape (n_trials, N)
+        candidate_d = torch.minimum(min_d[None, :], squared_distances(X[candidates], X, X_sq[candidates], X_sq))
+        best = candidate_d.sum(dim=1).argmin()
+        centroids = torch.cat([centroids, X[candidates[best]][None, :]])
+        min_d = candidate_d[best]
+    return centroids
+
+def _update_centroids(X, cluster_ids, centroids, min_d):
+    # Sum and count the members of every cluster in one pass.
+    K = centroids.shape[0]
+    sums = torch.zeros_like(centroids).index_add_(0, cluster_ids, X)
+    counts = torch.bincount(cluster_ids, minlength=K).to(X.dtype)
+    new_centroids = sums / counts.clamp_min(1)[:, None]
+    empty = counts == 0
+    if empty.any():
+        # Move empty clusters onto the points that are currently worst served.
+        farthest = torch.topk(min_d, int(empty.sum())).indices
+        new_centroids[empty] = X[farthest]
+    return new_centroids
+
+def _lloyd(X, centroids, X_sq, max_iter, tol):
+    for _ in range(max_iter):
+        cluster_ids, min_d = assign_clusters(X, centroids, X_sq)
+        new_centroids = _update_centroids(X, cluster_ids, centroids, min_d)
+        shift = ((new_centroids - centroids) ** 2).sum()
+        centroids = new_centroids
+        if shift <= tol:
+            break
+    return centroids
+
+def _minibatch(X, centroids, X_sq, batch_size, max_iter, tol, generator, max_no_improvement=10):
+    N, K = X.shape[0], centroids.shape[0]
+    counts = torch.zeros(K, dtype=X.dtype)
+    n_steps = max_iter * max(1, math.ceil(N / batch_size))
+    # Early stopping on a smoothed batch inertia, as in scikit-learn's MiniBatchKMeans.
+    alpha = min(1.0, 2.0 * batch_size / (N + 1))
+    smoothed_inertia = None
+    best_inertia = None
+    steps_without_improvement = 0
+    for _ in range(n_steps):
+        batch = torch.randint(N, (batch_size,), generator=generator)
+        X_batch = X[batch]
+        cluster_ids, min_d = assign_clusters(X_batch, centroids, X_sq[batch])
+        batch_counts = torch.bincount(cluster_ids, minlength=K).to(X.dtype)
+        batch_sums = torch.zeros_like(centroids).index_add_(0, cluster_ids, X_batch)
+        # Per-centroid learning rate 1 / (points seen so far), as in Sculley's mini-batch k-means.
+        counts += batch_counts
+        touched = batch_counts > 0
+        step = torch.zeros_like(centroids)
+        step[touched] = (batch_sums[touched] - batch_counts[touched, None] * centroids[touched]) / counts[touched, None]
+        centroids = centroids + step
+        if (step ** 2).sum() <= tol:
+            break
+
+        batch_inertia = min_d.mean().item()
+        smoothed_inertia = batch_inertia if smoothed_inertia is None else (1 - alpha) * smoothed_inertia + alpha * batch_inertia
+        if best_inertia is None or smoothed_inertia < best_inertia:
+            best_inertia = smoothed_inertia
+            steps_without_improvement = 0
+        else:
+            steps_without_improvement += 1
+            if steps_without_improvement >= max_no_improvement:
+                break
+    return centroids
+
+def kmeans(
+    embeddings,
+    num_clusters,
+    num_iters=DEFAULT_KMEANS_MAX_ITER,
+    n_init=DEFAULT_KMEANS_N_INIT,
+    tol=1e-4,
+    seed=DEFAULT_KMEANS_SEED,
+    mini_batch=None,
+    batch_size=DEFAULT_KMEANS_MINIBATCH_SIZE,
+    minibatch_threshold=DEFAULT_KMEANS_MINIBATCH_THRESHOLD,
+):
+    """
+    K-means clustering with k-means++ seeding and n_init restarts, keeping the run with
+    the lowest inertia. Centroid updates use index_add/bincount, so no Python loop runs
+    over clusters.
+
+    The number of clusters is capped at the number of distinct rows, and cluster ids are
+    always contiguous (0 .. K-1), so every returned cluster has at least one member.
+
+    Parameters:
+      embeddings (torch.Tensor): Tensor of shape (N, D).
+      num_clusters (int): Number of clusters requested.
+      num_iters (int): Maximum number of Lloyd iterations (epochs in mini-batch mode).
+      n_init (int): Number of k-means++ restarts.
+      tol (float): Convergence tolerance on the squared centroid shift, relative to the mean feature variance.
+      seed (int): Random seed; the same seed and input give the same clustering. None for a random run.
+      mini_batch (bool): Use mini-batch updates. None chooses them when N > minibatch_threshold.
+      batch_size (int): Rows per mini-batch.
+      minibatch_threshold (int): Row count above which mini_batch=None switches to mini-batch mode.
+
+    Returns:
+      cluster_ids (torch.Tensor): Tensor of cluster assignments for each embedding.
+      centroids (torch.Tensor): The final cluster centroids.
+      inertia (float): Sum of squared distances from each row to its centroid.
+    """
+    X = embeddings.detach().float().cpu()
+    N, D = X.shape
+    if N == 0 or num_clusters < 1:
+        return torch.empty(0, dtype=torch.long), torch.empty(0, D), 0.0
+
+    num_clusters = min(num_clusters, torch.unique(X, dim=0).shape[0])
+    if mini_batch is None:
+        mini_batch = N > minibatch_threshold
+    X_sq = (X * X).sum(dim=1)
+    tol = tol * X.var(dim=0, unbiased=False).mean().item() if N > 1 else 0.0
+    generator = make_generator(seed)
+
+    best = None
+    for _ in range(max(1, n_init)):
+        if mini_batch:
+            # Seed on a sample (3 batches, as scikit-learn does) rather than the full data.
+            sample = torch.randperm(N, generator=generator)[:max(3 * batch_size, num_clusters)]
+            if torch.unique(X[sample], dim=0).shape[0] < num_clusters:
+                sample = torch.arange(N)
+            centroids = kmeans_plusplus(X[sample], num_clusters, generator, X_sq[sample])
+            centroids = _minibatch(X, centroids, X_sq, batch_size, num_iters, tol, generator)
+        else:
+            centroids = kmeans_plusplus(X, num_clusters, generator, X_sq)
+            centroids = _lloyd(X, centroids, X_sq, num_iters, tol)
+        cluster_ids, min_d = assign_clusters(X, centroids, X_sq)
+        inertia = min_d.sum().item()
+        if best is None or inertia < best[2]:
+            best = (cluster_ids, centroids, inertia)
+
+    cluster_ids, centroids, inertia = best
+    # Drop clusters that ended up empty and renumber the rest contiguously.
+    used, cluster_ids = torch.unique(cluster_ids, return_inverse=True)
+    return cluster_ids, centroids[used], inertia
+
+def silhouette_score(distances, cluster_ids, num_clusters):
+    """
+    Mean silhouette coefficient from a precomputed (n, n) distance matrix. Per-cluster
+    distance sums for every row come from one matmul with the one-hot assignment matrix.
+    Rows in singleton clusters score 0, as in scikit-learn.
+    """
+    one_hot = torch.zeros(len(cluster_ids), num_clusters, dtype=distances.dtype)
+    one_hot[torch.arange(len(cluster_ids)), cluster_ids] = 1
+    sums = distances @ one_hot  # shape: (n, K)
+    counts = one_hot.sum(dim=0)
+
+    own_count = counts[cluster_ids]
+    a = sums.gather(1, cluster_ids[:, None])[:, 0] / (own_count - 1).clamp_min(1)
+    mean_other = sums / counts.clamp_min(1)[None, :]
+    mean_other.scatter_(1, cluster_ids[:, None], float("inf"))
+    mean_other[:, counts == 0] = float("inf")
+    b = mean_other.min(dim=1).values
+    scores = (b - a) / torch.maximum(a, b).clamp_min(1e-12)
+    scores[own_count <= 1] = 0
+    return scores.mean().item()
+
+def _elbow(ks, inertias):
+    # Kneedle: the k whose (normalized) inertia lies furthest below the chord joining the ends.
+    if len(ks) < 3:
+        return ks[0]
+    k = torch.tensor(ks, dtype=torch.float64)
+    inertia = torch.tensor(inertias, dtype=torch.float64)
+    k = (k - k[0]) / (k[-1] - k[0])
+    span = inertia[0] - inertia[-1]
+    if span <= 0:
+        return ks[0]
+    inertia = (inertia - inertia[-1]) / span
+    return ks[int(((1 - k) - inertia).argmax())]
+
+def select_num_clusters(
+    embeddings,
+    k_min=2,
+    k_max=DEFAULT_AUTO_K_MAX,
+    method=DEFAULT_AUTO_K_METHOD,
+    sample_size=DEFAULT_AUTO_K_SAMPLE_SIZE,
+    time_budget=DEFAULT_AUTO_K_TIME_BUDGET,
+    seed=DEFAULT_KMEANS_SEED,
+    num_iters=DEFAULT_KMEANS_MAX_ITER,
+    tol=1e-4,
+):
+    """
+    Picks the number of clusters for embeddings by scoring k = k_min .. k_max on a
+    random sample of at most sample_size rows.
+
+    Work is shared across candidates: the sample's pairwise distance matrix is computed
+    once, and a single greedy k-means++ pass for k_max provides the seeds for every
+    smaller k (its first k centroids), so each candidate costs one short Lloyd run.
+    Candidates are tried in increasing k until time_budget seconds have passed.
+
+    Parameters:
+      embeddings (torch.Tensor): Tensor of shape (N, D).
+      k_min (int): Smallest cluster count tried.
+      k_max (int): Largest cluster count tried.
+      method (str): "silhouette" (highest mean silhouette) or "elbow" (knee of the inertia curve).
+      sample_size (int): Maximum number of rows scored.
+      time_budget (float): Seconds after which no further k is tried; None for no limit.
+      seed (int): Random seed for sampling and seeding.
+
+    Returns:
+      tuple: (chosen k, dict of k -> score), where the score is the silhouette or the inertia.
+    """
+    if method not in ("silhouette", "elbow"):
+        raise ValueError(f"Unknown cluster-count selection method: {method}")
+    started = time.perf_counter()
+    X = embeddings.detach().float().cpu()
+    generator = make_generator(seed)
+    if X.shape[0] > sample_size:
+        X = X[torch.randperm(X.shape[0], generator=generator)[:sample_size]]
+
+    n_unique = torch.unique(X, dim=0).shape[0]
+    # Silhouettes need at least two clusters and one row more than clusters.
+    k_max = min(k_max, n_unique - 1 if method == "silhouette" else n_unique)
+    k_min = max(k_min, 2 if method == "silhouette" else 1)
+    if k_max < k_min:
+        return max(1, min(k_min, n_unique)), {}
+
+    X_sq = (X * X).sum(dim=1)
+    tol = tol * X.var(dim=0, unbiased=False).mean().item()
+    seeds = kmeans_plusplus(X, k_max, generator, X_sq)
+    distances = squared_distances(X, X, X_sq, X_sq).sqrt_() if method == "silhouette" else None
+
+    scores = {}
+    for k in range(k_min, k_max + 1):
+        centroids = _lloyd(X, seeds[:k], X_sq, num_iters, tol)
+        cluster_ids, min_d = assign_clusters(X, centroids, X_sq)
+        if method == "silhouette":
+            scores[k] = silhouette_score(distances, cluster_ids, k)
+        else:
+            scores[k] = min_d.sum().item()
+        if time_budget is not None and time.perf_counter() - started > time_budget:
+            break
+
+    if method == "silhouette":
+        best_k = max(scores, key=scores.get)
+    else:
+        best_k = _elbow(list(scores), list(scores.values()))
+    return best_k, scores
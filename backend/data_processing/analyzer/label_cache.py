@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+import warnings
+import analyzer.default_classification_settings as default_classification_settings
+
+DEFAULT_LABEL_CACHE_PATH = default_classification_settings.DEFAULT_LABEL_CACHE_PATH
+
+_MONTH_PATTERN = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*"
+_KEY_PATTERNS = [
+    # Dates: 12/03, 12/03/2023, 2023-03-12, 12 Mar, 12 Mar 2023, Mar 12
+    re.compile(r"\b\d{1,4}[/-]\d{1,2}(?:[/-]\d{2,4})?\b"),
+    re.compile(r"\b\d{1,2}\s?" + _MONTH_PATTERN + r"\b(?:\s?\d{2,4}\b)?"),
+    re.compile(r"\b" + _MONTH_PATTERN + r"\s?\d{1,2}\b"),
+    # Card suffixes: xx1234, ****1234, card 1234
+    re.compile(r"[x*#]{2,}\d{2,}"),
+    re.compile(r"\bcard\s*(?:no|number)?\s*[:#]?\s*\d{2,}\b"),
+    # Reference numbers: ref 12345, receipt: A1B2C3, and any token with 4+ digits
+    re.compile(r"\b(?:ref|reference|receipt|rcpt|txn|trace|id)\b\s*(?:no)?\s*[:#.]?\s*[\w-]*\d[\w-]*"),
+    re.compile(r"\b\w*\d{4,}\w*\b"),
+]
+
+
+def normalize_transaction_key(description):
+    """
+    Reduces a transaction description to a key shared by recurring transactions:
+    lowercased, with dates, reference numbers and card suffixes removed and punctuation
+    and whitespace collapsed. Descriptions that would reduce to nothing keep their
+    lowercased text instead.
+    """
+    if not isinstance(description, str):
+        return ""
+    key = description.lower()
+    for pattern in _KEY_PATTERNS:
+        key = pattern.sub(" ", key)
+    key = re.sub(r"[^\w\s&]", " ", key)
+    key = re.sub(r"\s+", " ", key).strip()
+    if not key:
+        key = re.sub(r"\s+", " ", description.lower()).strip()
+    return key
+
+def make_namespace(**settings):
+    """
+    Hashes everything that affects a label (model, labels, hypothesis template, prompt
+    options) so that entries made under different settings never mix.
+    """
+    return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class LabelCache:
+    """
+    Persistent cache of classifier labels per normalized description key, so recurring
+    merchants are classified once and then reused across statements.
+
+    Entries live in an in-memory dict in front of a SQLite database at path, which several
+    worker processes can share. Pass path=None for a memory-only cache.
+    """
+    def __init__(self, path=DEFAULT_LABEL_CACHE_PATH):
+        self.path = path
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self.path is None:
+            return None
+        if self._connection is None:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS labels (namespace TEXT, description_key TEXT, label TEXT, "
+                    "PRIMARY KEY (namespace, description_key))"
+                )
+                self._connection.commit()
+            except (OSError, sqlite3.Error) as e:
+                warnings.warn(f"Label cache database disabled: {e}")
+                self.path = None
+                self._connection = None
+        return self._connection
+
+    def get_many(self, namespace, keys):
+        """
+        Returns a dict key -> label for the keys that are cached under namespace.
+        """
+        with self._lock:
+            found = {}
+            missing = []
+            for key in keys:
+                if (namespace, key) in self._memory:
+                    found[key] = self._memory[(namespace, key)]
+                else:
+                    missing.append(key)
+            connection = self._connect()
+            if connection is None:
+                return found
+            # Query in chunks to stay under SQLite's bound-parameter limit.
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = connection.execute(
+                    f"SELECT description_key, label FROM labels WHERE namespace = ? AND description_key IN ({','.join('?' * len(chunk))})",
+                    [namespace, *chunk],
+                ).fetchall()
+                for key, label in rows:
+                    self._memory[(namespace, key)] = label
+                    found[key] = label
+            return found
+
+    def put_many(self, namespace, labels):
+        """
+        Stores a dict key -> label under namespace.
+        """
+        with self._lock:
+            for key, label in labels.items():
+                self._memory[(namespace, key)] = label
+            connection = self._connect()
+            if connection is not None and labels:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO labels (namespace, description_key, label) VALUES (?, ?, ?)",
+                    [(namespace, key, label) for key, label in labels.items()],
+                )
+                connection.commit()
+
+
+_default_cache = None
+
+def get_default_cache():
+    """
+    Returns the process-wide label cache, creating it on first use.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LabelCache()
+    return _default_cache
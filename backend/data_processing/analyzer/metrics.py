@@ -1,3 +1,6 @@
+import re
+import math
+import numpy as np
 import pandas as pd
 import analyzer.default_classification_settings as default_classification_settings
 DEFAULT_DISCRETIONARY_CATEGORIES = default_classification_settings.DEFAULT_DISCRETIONARY_CATEGORIES
@@ -50,88 +53,266 @@ def aggregate_metrics(df, discretionary_categories = DEFAULT_DISCRETIONARY_CATEG
       
     Returns:
       dict: A dictionary where keys are metric names and values are the computed values.
+
+    The dict is computed through MetricsAccumulator, so it is identical to merging
+    accumulators built over chunks of df and finalizing them.
     """
-    # Ensure DataFrame is sorted by date.
-    
-    metrics = {}
-    
-    # 1. Starting and Ending Balance.
-    if not df.empty:
-        starting_balance = df.iloc[0]["Balance"]
-        ending_balance = df.iloc[-1]["Balance"]
-    else:
-        starting_balance = ending_balance = None
-    metrics["starting_balance"] = starting_balance
-    metrics["ending_balance"] = ending_balance
-
-    # 2. Minimum Balance, Maximum Balance and its ratio to the starting balance.
-    if not df.empty and "Balance" in df.columns:
-        min_balance = df["Balance"].min()
-        max_balance = df["Balance"].max()
-    else:
-        min_balance = None
-        max_balance = None
-    metrics["min_balance"] = min_balance
-    metrics["max_balance"] = max_balance
-    if starting_balance and starting_balance != 0:
-        metrics["min_balance_ratio"] = min_balance / starting_balance
-        metrics["max_balance_ratio"] = max_balance / starting_balance
-    else:
-        metrics["min_balance_ratio"] = None
-        metrics["max_balance_ratio"] = None
-
-    # 3. Total Income and Total Expenses.
-    # Assume that deposits/income are in the "Credit" column and expenses in the "Debit" column.
-    total_income = df["Credit"].dropna().sum() if "Credit" in df.columns else None
-    total_expenses = df["Debit"].dropna().sum() if "Debit" in df.columns else None
-    metrics["total_income"] = total_income
-    metrics["total_expenses"] = total_expenses
-
-    # 4. Category-Based Spending/Income.
-    # Sum the debit/credit amounts grouped by category.
-    if "Category" in df.columns:
-        if "Debit" in df.columns:
-            category_expenses = df.groupby("Category")["Debit"].sum().to_dict()
+    return MetricsAccumulator.from_dataframe(df).finalize(discretionary_categories, essential_categories)
+
+class MetricsAccumulator:
+    """
+    Mergeable summary of a set of transactions (running sums, counts, min/max, Welford
+    moments of the debits, first/last balance with their dates and per-category sums) from
+    which the aggregate_metrics dict is built without keeping the rows.
+
+    Build one per chunk, page or statement with from_dataframe() (or feed chunks to update()),
+    combine them with merge() and call finalize() for the metrics dict. merge(a, b) summarizes
+    a's rows followed by b's and is associative, so chunks can be reduced in any grouping,
+    e.g. in parallel. The first and last row dates are kept so that separately uploaded
+    statements can be put in date order (see merge_accumulators).
+    """
+    def __init__(self):
+        self.row_count = 0
+        self.has_balance = False
+        self.has_debit = False
+        self.has_credit = False
+        self.has_category = False
+        self.first_balance = None
+        self.last_balance = None
+        # ISO dates of the first and last row, or None when unknown.
+        self.first_date = None
+        self.last_date = None
+        self.min_balance = None
+        self.max_balance = None
+        self.total_income = 0.0
+        self.total_expenses = 0.0
+        # Welford moments of the non-null debits.
+        self.debit_count = 0
+        self.debit_mean = 0.0
+        self.debit_m2 = 0.0
+        self.category_debit = {}
+        self.category_credit = {}
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Summarizes a DataFrame with the columns aggregate_metrics expects.
+        """
+        acc = cls()
+        acc.row_count = len(df)
+        acc.has_balance = "Balance" in df.columns
+        acc.has_debit = "Debit" in df.columns
+        acc.has_credit = "Credit" in df.columns
+        acc.has_category = "Category" in df.columns
+        if acc.row_count and acc.has_balance:
+            acc.first_balance = _to_float(df.iloc[0]["Balance"])
+            acc.last_balance = _to_float(df.iloc[-1]["Balance"])
+        if acc.row_count and "Date" in df.columns:
+            acc.first_date = _date_key(df.iloc[0]["Date"])
+            acc.last_date = _date_key(df.iloc[-1]["Date"])
+        if acc.row_count and acc.has_balance:
+            balances = df["Balance"].dropna()
+            if not balances.empty:
+                acc.min_balance = float(balances.min())
+                acc.max_balance = float(balances.max())
+        if acc.has_credit:
+            acc.total_income = float(df["Credit"].dropna().sum())
+        if acc.has_debit:
+            debits = df["Debit"].dropna().astype(float)
+            acc.total_expenses = float(debits.sum())
+            acc.debit_count = len(debits)
+            if acc.debit_count:
+                acc.debit_mean = float(debits.mean())
+                acc.debit_m2 = float(((debits - acc.debit_mean) ** 2).sum())
+        if acc.has_category:
+            if acc.has_debit:
+                acc.category_debit = {k: float(v) for k, v in df.groupby("Category")["Debit"].sum().items()}
+            if acc.has_credit:
+                acc.category_credit = {k: float(v) for k, v in df.groupby("Category")["Credit"].sum().items()}
+        return acc
+
+    def merge(self, other):
+        """
+        Returns a new accumulator for self's transactions followed by other's.
+        """
+        merged = MetricsAccumulator()
+        merged.row_count = self.row_count + other.row_count
+        merged.has_balance = self.has_balance or other.has_balance
+        merged.has_debit = self.has_debit or other.has_debit
+        merged.has_credit = self.has_credit or other.has_credit
+        merged.has_category = self.has_category or other.has_category
+        first = self if self.row_count else other
+        merged.first_balance, merged.first_date = first.first_balance, first.first_date
+        last = other if other.row_count else self
+        merged.last_balance, merged.last_date = last.last_balance, last.last_date
+        merged.min_balance = _combine(min, self.min_balance, other.min_balance)
+        merged.max_balance = _combine(max, self.max_balance, other.max_balance)
+        merged.total_income = self.total_income + other.total_income
+        merged.total_expenses = self.total_expenses + other.total_expenses
+
+        # Chan et al.'s parallel update of the Welford moments.
+        n = self.debit_count + other.debit_count
+        merged.debit_count = n
+        if n:
+            delta = other.debit_mean - self.debit_mean
+            merged.debit_mean = self.debit_mean + delta * other.debit_count / n
+            merged.debit_m2 = self.debit_m2 + other.debit_m2 + delta * delta * self.debit_count * other.debit_count / n
+
+        merged.category_debit = _add_dicts(self.category_debit, other.category_debit)
+        merged.category_credit = _add_dicts(self.category_credit, other.category_credit)
+        return merged
+
+    def update(self, df):
+        """
+        Adds the rows of df (the next chunk) to this accumulator in place and returns it.
+        """
+        self.__dict__.update(self.merge(MetricsAccumulator.from_dataframe(df)).__dict__)
+        return self
+
+    def finalize(self, discretionary_categories=DEFAULT_DISCRETIONARY_CATEGORIES,
+                 essential_categories=DEFAULT_ESSENTIAL_CATEGORIES):
+        """
+        Returns the same metrics dict aggregate_metrics produces for the summarized rows.
+        """
+        metrics = {}
+        if self.row_count:
+            starting_balance = _nan_if_none(self.first_balance)
+            ending_balance = _nan_if_none(self.last_balance)
         else:
-            category_expenses = {}
-        metrics["category_expenses_debit"] = category_expenses
+            starting_balance = ending_balance = None
+        metrics["starting_balance"] = starting_balance
+        metrics["ending_balance"] = ending_balance
 
-        if "Credit" in df.columns:
-            category_expenses = df.groupby("Category")["Credit"].sum().to_dict()
+        if self.row_count and self.has_balance:
+            min_balance = _nan_if_none(self.min_balance)
+            max_balance = _nan_if_none(self.max_balance)
+        else:
+            min_balance = max_balance = None
+        metrics["min_balance"] = min_balance
+        metrics["max_balance"] = max_balance
+        if starting_balance and starting_balance != 0:
+            metrics["min_balance_ratio"] = min_balance / starting_balance
+            metrics["max_balance_ratio"] = max_balance / starting_balance
         else:
-            category_expenses = {}
-        metrics["category_expenses_debit"] = category_expenses
+            metrics["min_balance_ratio"] = None
+            metrics["max_balance_ratio"] = None
 
+        total_income = self.total_income if self.has_credit else None
+        total_expenses = self.total_expenses if self.has_debit else None
+        metrics["total_income"] = total_income
+        metrics["total_expenses"] = total_expenses
 
-    # If you want to compare essential spending vs discretionary spending,
-    # you might pre-define lists of categories:
-    
-    essential_spending = sum(val for cat, val in category_expenses.items() if cat in essential_categories)
-    discretionary_spending = sum(val for cat, val in category_expenses.items() if cat in discretionary_categories)
-    metrics["essential_spending"] = essential_spending
-    metrics["discretionary_spending"] = discretionary_spending
+        # Like aggregate_metrics, report (and rank spending by) the per-category credit sums under this key.
+        category_expenses = dict(sorted(self.category_credit.items())) if self.has_category else {}
+        if self.has_category:
+            metrics["category_expenses_debit"] = category_expenses
+        metrics["essential_spending"] = sum(val for cat, val in category_expenses.items() if cat in essential_categories)
+        metrics["discretionary_spending"] = sum(val for cat, val in category_expenses.items() if cat in discretionary_categories)
 
-    # 5. Spending Variability.
-    # Calculate standard deviation of Debit (expenses). Also compute the coefficient of variation (std / mean).
-    if "Debit" in df.columns:
-        debit_series = df["Debit"].dropna()
-        spending_std = debit_series.std() if not debit_series.empty else None
-        spending_mean = debit_series.mean() if not debit_series.empty else None
-    else:
-        spending_std = spending_mean = None
-    metrics["spending_std"] = spending_std
-    if spending_mean and spending_mean != 0:
-        metrics["spending_cv"] = spending_std / spending_mean
-    else:
-        metrics["spending_cv"] = None
+        if self.has_debit and self.debit_count:
+            spending_std = math.sqrt(self.debit_m2 / (self.debit_count - 1)) if self.debit_count > 1 else float("nan")
+            spending_mean = self.debit_mean
+        else:
+            spending_std = spending_mean = None
+        metrics["spending_std"] = spending_std
+        if spending_mean and spending_mean != 0:
+            metrics["spending_cv"] = spending_std / spending_mean
+        else:
+            metrics["spending_cv"] = None
 
-    # Compute net cash flow over the period (Total Income - Total Expenses)
-    if total_income is not None and total_expenses is not None:
-        metrics["net_cash_flow"] = total_income - total_expenses
-    else:
-        metrics["net_cash_flow"] = None
-    
-    return metrics
+        if total_income is not None and total_expenses is not None:
+            metrics["net_cash_flow"] = total_income - total_expenses
+        else:
+            metrics["net_cash_flow"] = None
+        return metrics
+
+    def to_dict(self):
+        """
+        Returns the state as a JSON-serializable dict.
+        """
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, state):
+        acc = cls()
+        acc.__dict__.update(state)
+        return acc
+
+
+def merge_accumulators(accumulators, order_by_date=False):
+    """
+    Merges accumulators into one, pairwise as a balanced tree.
+
+    Parameters:
+      accumulators (iterable): MetricsAccumulator objects in row order.
+      order_by_date (bool): First sort them by the date of their first row, e.g. for
+                            statements uploaded out of order. The given order is kept
+                            when any of them has no parseable date.
+
+    Returns:
+      MetricsAccumulator: The merged accumulator.
+    """
+    accumulators = list(accumulators)
+    level = [acc for acc in accumulators if acc.row_count]
+    if order_by_date and all(acc.first_date is not None for acc in level):
+        level.sort(key=lambda acc: acc.first_date)
+    # Empty accumulators hold no rows but still record which columns were present.
+    level += [acc for acc in accumulators if not acc.row_count]
+    if not level:
+        return MetricsAccumulator()
+    while len(level) > 1:
+        merged = [a.merge(b) for a, b in zip(level[0::2], level[1::2])]
+        if len(level) % 2:
+            merged.append(level[-1])
+        level = merged
+    return level[0]
+
+def accumulate_metrics(chunks, discretionary_categories=DEFAULT_DISCRETIONARY_CATEGORIES,
+                       essential_categories=DEFAULT_ESSENTIAL_CATEGORIES):
+    """
+    Computes the aggregate_metrics dict from an iterable of DataFrame chunks (in row order),
+    holding only one chunk at a time.
+    """
+    acc = MetricsAccumulator()
+    for chunk in chunks:
+        acc.update(chunk)
+    return acc.finalize(discretionary_categories, essential_categories)
+
+def _date_key(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    # Parsing fills a missing year with the current one, which would order statements wrongly
+    # across a year end, so text without a 4-digit year is not used. Datetimes cannot be
+    # checked this way: create_dataset has already given yearless cells the current year, so
+    # statements with yearless dates can still be ordered wrongly across a year end.
+    if isinstance(value, str) and not re.search(r"\b\d{4}\b", value):
+        return None
+    try:
+        date = pd.to_datetime(value)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    if pd.isna(date):
+        return None
+    return date.isoformat()
+
+def _to_float(value):
+    return None if pd.isna(value) else float(value)
+
+def _nan_if_none(value):
+    return float("nan") if value is None else value
+
+def _combine(func, a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return func(a, b)
+
+def _add_dicts(a, b):
+    total = dict(a)
+    for key, value in b.items():
+        total[key] = total.get(key, 0.0) + value
+    return total
 
 def calculate_loan_eligibility_score(metrics, weights=DEFAULT_METRICS_DICTIONARY):
     """
@@ -208,3 +389,98 @@ def calculate_loan_eligibility_score(metrics, weights=DEFAULT_METRICS_DICTIONARY
 
 
     return score, return_message
+
+
+_SCORED_METRICS = ["starting_balance", "ending_balance", "min_balance_ratio", "net_cash_flow",
+                   "total_expenses", "essential_spending", "spending_cv"]
+
+def metrics_frame(metrics_dicts, index=None):
+    """
+    Builds the table calculate_loan_eligibility_scores expects from metrics dicts (one per
+    applicant). Columns keep object dtype so that missing metrics (None) stay distinct from NaN.
+    """
+    rows = [{name: m.get(name) for name in _SCORED_METRICS} for m in metrics_dicts]
+    return pd.DataFrame(rows, columns=_SCORED_METRICS, index=index, dtype=object)
+
+def _metric_column(metrics_df, name):
+    # Returns (float values with NaN for missing, mask of missing (None) entries).
+    n = len(metrics_df)
+    if name not in metrics_df.columns:
+        return np.full(n, np.nan), np.ones(n, dtype=bool)
+    column = metrics_df[name]
+    if column.dtype == object:
+        is_none = np.fromiter((v is None or v is pd.NA for v in column), dtype=bool, count=n)
+        values = pd.to_numeric(column.where(~is_none, np.nan), errors="coerce").to_numpy(dtype=float)
+    else:
+        # Numeric columns cannot hold None, so NaN is read as a missing metric.
+        values = column.to_numpy(dtype=float)
+        is_none = np.isnan(values)
+    return values, is_none
+
+def calculate_loan_eligibility_scores(metrics_df, weights=DEFAULT_METRICS_DICTIONARY):
+    """
+    Vectorized calculate_loan_eligibility_score for many applicants at once, e.g. to
+    rescore stored evaluations after the weights change. Each rule is evaluated over whole
+    columns and added in the same order as the scalar function, so scores and messages are
+    identical to calling it row by row.
+
+    Parameters:
+      metrics_df (pd.DataFrame or list): One row per applicant with the metric columns
+                      (as built by metrics_frame), or a list of metrics dicts. In numeric
+                      columns NaN stands for a missing metric; use object columns
+                      (metrics_frame) to tell None from NaN.
+      weights (dict): A dictionary specifying the weight for each metric component.
+
+    Returns:
+      tuple: (pd.Series of scores, pd.Series of data-loss messages), indexed like metrics_df.
+    """
+    if not isinstance(metrics_df, pd.DataFrame):
+        metrics_df = metrics_frame(metrics_df)
+    n = len(metrics_df)
+    score = np.zeros(n)
+    data_loss_warning = np.zeros(n, dtype=int)
+    MAX_DATA_LOSS_SCORE = 5
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # 1. Starting vs. Ending Balance.
+        starting_balance, starting_none = _metric_column(metrics_df, "starting_balance")
+        ending_balance, ending_none = _metric_column(metrics_df, "ending_balance")
+        applies = ~starting_none & (starting_balance != 0) & ~ending_none
+        data_loss_warning += applies
+        increase = ending_balance >= starting_balance
+        ratio = np.where(starting_balance != 0, ending_balance / starting_balance, 0)
+        score = np.where(applies, score + np.where(increase, weights["balance_increase"], weights["balance_decrease"] * ratio), score)
+
+        # 2. Minimum Balance Ratio.
+        min_balance_ratio, ratio_none = _metric_column(metrics_df, "min_balance_ratio")
+        applies = ~ratio_none
+        data_loss_warning += applies
+        points = np.select([min_balance_ratio >= 0.8, min_balance_ratio >= 0.5],
+                           [weights["min_balance_high"], weights["min_balance_mid"]], weights["min_balance_low"])
+        score = np.where(applies, score + points, score)
+
+        # 3. Net Cash Flow.
+        net_cash_flow, net_none = _metric_column(metrics_df, "net_cash_flow")
+        applies = ~net_none
+        data_loss_warning += applies
+        score = np.where(applies, score + np.where(net_cash_flow > 0, weights["positive_net"], weights["negative_net"]), score)
+
+        # 4. Essential Spending Ratio.
+        total_expenses, expenses_none = _metric_column(metrics_df, "total_expenses")
+        essential_spending, _ = _metric_column(metrics_df, "essential_spending")
+        applies = ~expenses_none & (total_expenses > 0)
+        data_loss_warning += applies
+        essential_ratio = essential_spending / total_expenses
+        score = np.where(applies, score + np.where(essential_ratio >= 0.7, weights["essential_high"], weights["essential_low"]), score)
+
+        # 5. Spending Variability.
+        spending_cv, cv_none = _metric_column(metrics_df, "spending_cv")
+        applies = ~cv_none
+        data_loss_warning += applies
+        points = np.select([spending_cv < 0.3, spending_cv > 1.0],
+                           [weights["low_variability"], weights["high_variability"]], 0)
+        score = np.where(applies, score + points, score)
+
+    messages = np.select([data_loss_warning == MAX_DATA_LOSS_SCORE, data_loss_warning >= MAX_DATA_LOSS_SCORE * .7],
+                         [DATA_LOSS_MESSAGES[0], DATA_LOSS_MESSAGES[1]], DATA_LOSS_MESSAGES[2])
+    return pd.Series(score, index=metrics_df.index), pd.Series(messages, index=metrics_df.index)
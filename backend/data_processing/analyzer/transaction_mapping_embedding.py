@@ -0,0 +1,125 @@
+import torch
+import torch.nn.functional as F
+import pandas as pd
+import analyzer.default_classification_settings as default_classification_settings
+from .createTrainingDataset import get_embeddings, get_cached_embeddings
+
+DEFAULT_EMBEDDING_MODEL = default_classification_settings.DEFAULT_EMBEDDING_MODEL
+DEFAULT_CANDIDATE_LABELS = default_classification_settings.DEFAULT_CANDIDATE_LABELS
+DEFAULT_HYPOTHESIS_TEMPLATE = default_classification_settings.DEFAULT_HYPOTHESIS_TEMPLATE
+
+_label_matrices = {}
+
+def get_label_matrix(candidate_labels=DEFAULT_CANDIDATE_LABELS, embedding_model_name=DEFAULT_EMBEDDING_MODEL,
+                     label_template=DEFAULT_HYPOTHESIS_TEMPLATE):
+    """
+    Embeds one prototype sentence per label (label_template filled with the label) and
+    returns the L2-normalized (L, D) matrix. Matrices are computed once per process for
+    each (model, labels, template).
+    """
+    key = (embedding_model_name, tuple(candidate_labels), label_template)
+    if key not in _label_matrices:
+        prototypes = [label_template.format(label) for label in candidate_labels]
+        _label_matrices[key] = F.normalize(get_embeddings(prototypes, model_name=embedding_model_name), dim=1)
+    return _label_matrices[key]
+
+def classify_by_similarity(embeddings, candidate_labels=DEFAULT_CANDIDATE_LABELS, embedding_model_name=DEFAULT_EMBEDDING_MODEL,
+                           label_template=DEFAULT_HYPOTHESIS_TEMPLATE):
+    """
+    Assigns each embedding the label whose prototype is most similar, using one matmul
+    against the cached label matrix.
+
+    Parameters:
+      embeddings (torch.Tensor): (N, D) embeddings from embedding_model_name.
+      candidate_labels (list): List of candidate labels.
+      embedding_model_name (str): The sentence-embedding model.
+      label_template (str): Template turning a label into its prototype sentence.
+
+    Returns:
+      tuple: (list of labels, torch.Tensor of the winning cosine similarities), both of length N.
+    """
+    if len(embeddings) == 0:
+        return [], torch.empty(0)
+    label_matrix = get_label_matrix(candidate_labels, embedding_model_name, label_template)
+    similarities = F.normalize(embeddings.float(), dim=1) @ label_matrix.T  # shape: (N, L)
+    scores, best = similarities.max(dim=1)
+    return [candidate_labels[i] for i in best.tolist()], scores
+
+def classify_texts_by_similarity(texts, candidate_labels=DEFAULT_CANDIDATE_LABELS, embedding_model_name=DEFAULT_EMBEDDING_MODEL,
+                                 label_template=DEFAULT_HYPOTHESIS_TEMPLATE, use_embedding_cache=True):
+    """
+    Embeds the texts (through the embedding cache by default) and classifies them with classify_by_similarity.
+    """
+    embed = get_cached_embeddings if use_embedding_cache else get_embeddings
+    embeddings = embed(list(texts), model_name=embedding_model_name)
+    return classify_by_similarity(embeddings, candidate_labels, embedding_model_name, label_template)
+
+def classify_transaction_descriptions_by_similarity(
+    df,
+    text_column="Transaction Description",
+    debit_column="Debit",
+    credit_column="Credit",
+    candidate_labels=DEFAULT_CANDIDATE_LABELS,
+    embedding_model_name=DEFAULT_EMBEDDING_MODEL,
+    label_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+    use_embedding_cache=True,
+    **kwargs
+):
+    """
+    Directly classifies every transaction by cosine similarity between its description
+    embedding and the label prototype embeddings. A cheap alternative to the zero-shot
+    NLI classifier that scales linearly in rows; use it as cluster_func with assign_func=None.
+
+    Parameters:
+      df (pd.DataFrame): Input DataFrame containing at least the columns
+                         'Transaction Description', 'Debit', and 'Credit'.
+      text_column (str): Column name for transaction descriptions.
+      debit_column (str): Column name for the Debit values.
+      credit_column (str): Column name for the Credit values.
+      candidate_labels (list): List of candidate category labels.
+      embedding_model_name (str): The sentence-embedding model.
+      label_template (str): Template turning a label into its prototype sentence.
+      use_embedding_cache (bool): Reuse cached embeddings for descriptions seen before.
+
+    Returns:
+      pd.DataFrame: The original DataFrame with an added 'Category' column. Rows
+                    with neither debit nor credit are marked 'Unclassified'.
+    """
+    df = df.copy()
+    has_amount = df[debit_column].notnull() | df[credit_column].notnull()
+    df["Category"] = "Unclassified"
+    if has_amount.any():
+        texts = df.loc[has_amount, text_column].fillna("").tolist()
+        labels, _ = classify_texts_by_similarity(texts, candidate_labels, embedding_model_name, label_template,
+                                                 use_embedding_cache=use_embedding_cache)
+        df.loc[has_amount, "Category"] = labels
+    return df
+
+def assign_categories_to_clusters(df, text_column="Transaction Description", candidate_labels=DEFAULT_CANDIDATE_LABELS,
+                                  embedding_model_name=DEFAULT_EMBEDDING_MODEL, label_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+                                  **kwargs):
+    """
+    For each unique cluster in the DataFrame, average the normalized description
+    embeddings of its rows and assign the label whose prototype is closest to that mean.
+    Then, assign the corresponding category to all rows in that cluster.
+
+    Returns: A new DataFrame with a 'Category' column.
+    """
+    df = df.copy()
+    clustered = df["Cluster"].notnull()
+    if not clustered.any():
+        df["Category"] = None
+        return df
+
+    texts = df.loc[clustered, text_column].fillna("").tolist()
+    embeddings = F.normalize(get_cached_embeddings(texts, model_name=embedding_model_name), dim=1)
+
+    # Mean embedding per cluster with a single index_add.
+    cluster_codes, cluster_labels = pd.factorize(df.loc[clustered, "Cluster"])
+    cluster_codes = torch.as_tensor(cluster_codes, dtype=torch.long)
+    sums = torch.zeros(len(cluster_labels), embeddings.shape[1]).index_add_(0, cluster_codes, embeddings)
+    labels, _ = classify_by_similarity(sums, candidate_labels, embedding_model_name, label_template)
+
+    cluster_to_category = dict(zip(cluster_labels, labels))
+    df["Category"] = df["Cluster"].map(cluster_to_category)
+    return df
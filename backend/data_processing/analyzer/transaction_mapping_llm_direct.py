@@ -1,11 +1,91 @@
 import pandas as pd
-from transformers import pipeline
+import numpy as np
+import torch
 import analyzer.default_classification_settings as default_classification_settings
+import analyzer.model_registry as model_registry
+import analyzer.label_cache as label_cache
 
 DEFAULT_CANDIDATE_LABELS = default_classification_settings.DEFAULT_CANDIDATE_LABELS
 DEFAULT_MODEL_NAME = default_classification_settings.DEFAULT_CLASSIFICATION_MODEL
+DEFAULT_HYPOTHESIS_TEMPLATE = default_classification_settings.DEFAULT_HYPOTHESIS_TEMPLATE
+DEFAULT_ZERO_SHOT_BATCH_SIZE = default_classification_settings.DEFAULT_ZERO_SHOT_BATCH_SIZE
 
-def classify_transactions_in_subset(sub_df, text_column, candidate_labels, classifier, context, few_shot_prompt):
+def _entailment_id(model_config):
+    # Same lookup the zero-shot pipeline uses.
+    for label, index in model_config.label2id.items():
+        if label.lower().startswith("entail"):
+            return index
+    return -1
+
+def classify_zero_shot_batched(prompts, candidate_labels, classifier, hypothesis_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+                               batch_size=DEFAULT_ZERO_SHOT_BATCH_SIZE):
+    """
+    Batched equivalent of calling the zero-shot pipeline once per prompt with multi_label=False.
+    
+    Every (prompt, hypothesis) pair is run through the NLI model in fixed-size batches, with
+    prompts sorted by length to limit padding. For each prompt, the label whose hypothesis has
+    the highest entailment logit wins, which is the label the pipeline ranks first.
+    
+    Parameters:
+      prompts (list of str): The premises to classify.
+      candidate_labels (list): List of candidate labels.
+      classifier: A zero-shot classification pipeline (its model and tokenizer are used).
+      hypothesis_template (str): Template turning a label into a hypothesis.
+      batch_size (int): Number of premise/hypothesis pairs per forward pass.
+      
+    Returns:
+      list of str: The top label for each prompt, in order.
+    """
+    if not prompts:
+        return []
+    model = classifier.model
+    tokenizer = classifier.tokenizer
+    entailment_id = _entailment_id(model.config)
+    hypotheses = [hypothesis_template.format(label) for label in candidate_labels]
+    num_labels = len(hypotheses)
+
+    lengths = [len(ids) for ids in model_registry.tokenize(tokenizer, prompts, truncation=True)["input_ids"]]
+    order = sorted(range(len(prompts)), key=lambda i: lengths[i])
+    pairs = [(prompts[i], hypothesis) for i in order for hypothesis in hypotheses]
+
+    entailment_logits = torch.empty(len(pairs), dtype=torch.float32)
+    with torch.inference_mode():
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            inputs = model_registry.tokenize(
+                tokenizer,
+                [premise for premise, _ in batch],
+                [hypothesis for _, hypothesis in batch],
+                padding=True,
+                truncation="only_first",
+                return_tensors="pt",
+            ).to(model.device)
+            logits = model(**inputs).logits
+            entailment_logits[start:start + len(batch)] = logits[:, entailment_id].float().cpu()
+
+    # Softmax over labels and take the last index of argsort, as the pipeline does, so ties
+    # resolve to the same label.
+    entailment_logits = entailment_logits.view(len(order), num_labels).numpy()
+    scores = np.exp(entailment_logits) / np.exp(entailment_logits).sum(-1, keepdims=True)
+    best = scores.argsort(axis=1)[:, -1]
+    labels = [None] * len(prompts)
+    for position, prompt_index in enumerate(order):
+        labels[prompt_index] = candidate_labels[best[position]]
+    return labels
+
+def _build_prompt(row, text_column, context, few_shot_prompt):
+    description = row[text_column]
+    if context:
+        amount = row.get("Debit") if pd.notnull(row.get("Debit")) else row.get("Credit")
+        context = f"This is a bank transaction of amount {amount}. "
+        return context + description
+    elif few_shot_prompt is not None:
+        return f"{few_shot_prompt}\nTransaction:{description}\nCategory:"
+    else:
+        return description
+
+def classify_transactions_in_subset(sub_df, text_column, candidate_labels, classifier, context, few_shot_prompt,
+                                    batch_size=DEFAULT_ZERO_SHOT_BATCH_SIZE):
     """
     For each row in the subset DataFrame, use the classifier to assign a category
     based on the transaction description.
@@ -17,34 +97,69 @@ def classify_transactions_in_subset(sub_df, text_column, candidate_labels, class
       classifier: A zero-shot classification pipeline.
       context: Whether or not to add context to model.
       few_shot_prompt: Optional-examples to add to help classifier.
+      batch_size (int): Premise/hypothesis pairs per forward pass. If None, the pipeline
+                        is called once per row instead.
       
     Returns:
       pd.DataFrame: The subset DataFrame with an added 'Category' column.
     """
     sub_df = sub_df.copy()
-    categories = []
-    
-    for idx, row in sub_df.iterrows():
-        description = row[text_column]
-        prompt = ''
-        if context:
-            amount = row.get("Debit") if pd.notnull(row.get("Debit")) else row.get("Credit")
-            context = f"This is a bank transaction of amount {amount}. "
-            prompt = context + description
-        elif few_shot_prompt is not None:
-            prompt = f"{few_shot_prompt}\nTransaction:{description}\nCategory:"
-        else:
-            prompt = description
+    prompts = [_build_prompt(row, text_column, context, few_shot_prompt) for _, row in sub_df.iterrows()]
 
-        
-        # Run the classification.
-        result = classifier(prompt, candidate_labels, multi_label=False ,  hypothesis_template="This bank transaction is about {}.")
-        
-        categories.append(result["labels"][0])
+    if batch_size is not None:
+        categories = classify_zero_shot_batched(prompts, candidate_labels, classifier, batch_size=batch_size)
+    else:
+        categories = []
+        for prompt in prompts:
+            # Run the classification.
+            result = classifier(prompt, candidate_labels, multi_label=False ,  hypothesis_template=DEFAULT_HYPOTHESIS_TEMPLATE)
+            categories.append(result["labels"][0])
         
     sub_df["Category"] = categories
     return sub_df
 
+def classify_transactions_deduplicated(sub_df, text_column, candidate_labels, classifier, context, few_shot_prompt,
+                                       batch_size=DEFAULT_ZERO_SHOT_BATCH_SIZE, model_name=DEFAULT_MODEL_NAME, cache=None):
+    """
+    Like classify_transactions_in_subset, but rows are grouped by their normalized
+    description key (dates, reference numbers and card suffixes removed). Each key is
+    classified once, using its first row as the representative, and the label is
+    broadcast to every row with that key.
+    
+    Parameters:
+      sub_df, text_column, candidate_labels, classifier, context, few_shot_prompt, batch_size:
+        As for classify_transactions_in_subset.
+      model_name (str): Model identifier, part of the cache namespace.
+      cache (LabelCache): Labels already known per key; keys found there skip the model.
+                          None disables caching across calls.
+      
+    Returns:
+      pd.DataFrame: The subset DataFrame with an added 'Category' column.
+    """
+    sub_df = sub_df.copy()
+    keys = sub_df[text_column].map(label_cache.normalize_transaction_key)
+    unique_keys = list(dict.fromkeys(keys))
+
+    namespace = label_cache.make_namespace(
+        model_name=model_name, candidate_labels=list(candidate_labels), hypothesis_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+        context=bool(context), few_shot_prompt=None if context else few_shot_prompt,
+    )
+    key_to_label = cache.get_many(namespace, unique_keys) if cache is not None else {}
+
+    missing_keys = [key for key in unique_keys if key not in key_to_label]
+    if missing_keys:
+        representatives = sub_df.loc[~keys.duplicated()]
+        representatives = representatives[keys.loc[representatives.index].isin(missing_keys)]
+        classified = classify_transactions_in_subset(representatives, text_column, candidate_labels, classifier,
+                                                     context, few_shot_prompt, batch_size=batch_size)
+        new_labels = dict(zip(keys.loc[classified.index], classified["Category"]))
+        if cache is not None:
+            cache.put_many(namespace, new_labels)
+        key_to_label.update(new_labels)
+
+    sub_df["Category"] = keys.map(key_to_label)
+    return sub_df
+
 def classify_transaction_descriptions_with_amounts_split_pytorch(
     df, 
     text_column="Transaction Description", 
@@ -54,6 +169,9 @@ def classify_transaction_descriptions_with_amounts_split_pytorch(
     model_name=DEFAULT_MODEL_NAME,  # lightweight alternative
     context = True,
     few_shot_prompt = '',
+    zero_shot_batch_size = DEFAULT_ZERO_SHOT_BATCH_SIZE,
+    deduplicate = True,
+    use_label_cache = True,
     **kwargs
 ):
     """
@@ -70,6 +188,9 @@ def classify_transaction_descriptions_with_amounts_split_pytorch(
       model_name (str): The Hugging Face model identifier for zero-shot classification.
       context (bool): Whether or not to add context to model.
       few_shot_prompt (str): Optional-examples to add to help classifier.
+      zero_shot_batch_size (int): Premise/hypothesis pairs per forward pass; None classifies row by row.
+      deduplicate (bool): Classify each normalized description once and reuse its label.
+      use_label_cache (bool): With deduplicate, also reuse labels from earlier statements.
     
     Returns:
       pd.DataFrame: The original DataFrame with an added 'Category' column. Rows
@@ -78,8 +199,8 @@ def classify_transaction_descriptions_with_amounts_split_pytorch(
     # Set default candidate labels if none are provided.
     
     
-    # Initialize the zero-shot classifier using the provided model.
-    classifier = pipeline("zero-shot-classification", model=model_name)
+    # Get the zero-shot classifier for the provided model (cached across calls).
+    classifier = model_registry.get_zero_shot_classifier(model_name)
     
     # Split the DataFrame into debit and credit subsets.
     debit_df = df[df[debit_column].notnull()].copy()
@@ -88,10 +209,19 @@ def classify_transaction_descriptions_with_amounts_split_pytorch(
     other_df = df[(df[debit_column].isnull()) & (df[credit_column].isnull())].copy()
     
     # Classify each subset.
+    if deduplicate:
+        cache = label_cache.get_default_cache() if use_label_cache else label_cache.LabelCache(path=None)
+        def classify_subset(sub_df):
+            return classify_transactions_deduplicated(sub_df, text_column, candidate_labels, classifier, context, few_shot_prompt,
+                                                      batch_size=zero_shot_batch_size, model_name=model_name, cache=cache)
+    else:
+        def classify_subset(sub_df):
+            return classify_transactions_in_subset(sub_df, text_column, candidate_labels, classifier, context, few_shot_prompt,
+                                                   batch_size=zero_shot_batch_size)
     if not debit_df.empty:
-        debit_df = classify_transactions_in_subset(debit_df, text_column, candidate_labels, classifier, context, few_shot_prompt)
+        debit_df = classify_subset(debit_df)
     if not credit_df.empty:
-        credit_df = classify_transactions_in_subset(credit_df, text_column, candidate_labels, classifier,context, few_shot_prompt)
+        credit_df = classify_subset(credit_df)
     
     # Optionally, assign a default category to rows in 'other_df'
     if not other_df.empty:
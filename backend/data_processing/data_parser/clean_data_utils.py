@@ -1,16 +1,17 @@
 import pandas as pd
 import numpy as np
+import re
+import string as string_module
 import warnings
+from datetime import date, datetime
+from functools import lru_cache
 from dateutil import parser
 
 
-def merge_dollar_cr_cells(rows):
+def iter_merge_dollar_cr_cells(rows):
     """
-    For each row, checks each cell for the '$' character.
-    If a cell contains '$' and the cell immediately to the right contains 'CR',
-    merges the two cells into the right cell and replaces the cell with '$' with an empty string.
+    Generator version of merge_dollar_cr_cells: yields each merged row as it is processed.
     """
-    updated_rows = []
     for row in rows:
         # Work on a mutable copy of the row
         new_row = row.copy()
@@ -27,8 +28,28 @@ def merge_dollar_cr_cells(rows):
                 new_row[i + 1] = f"{dollar_substring}{right_cell}".strip()
                 # Replace the original cell with the left part if it exists or an empty string.
                 new_row[i] = left_part.strip() if left_part.strip() else ""
-        updated_rows.append(new_row)
-    return updated_rows
+        yield new_row
+
+def merge_dollar_cr_cells(rows):
+    """
+    For each row, checks each cell for the '$' character.
+    If a cell contains '$' and the cell immediately to the right contains 'CR',
+    merges the two cells into the right cell and replaces the cell with '$' with an empty string.
+    """
+    return list(iter_merge_dollar_cr_cells(rows))
+
+def _clean_cell(cell):
+    if cell is None or not isinstance(cell, str):
+        return ""
+    cleaned = cell.replace("$", "").replace("CR", "")
+    return cleaned.strip()
+
+def iter_clean_cell_dollar_cr(dataset):
+    """
+    Generator version of clean_cell_dollar_cr: yields each cleaned row as it is processed.
+    """
+    for row in dataset:
+        yield [_clean_cell(cell) for cell in row]
 
 def clean_cell_dollar_cr(dataset):
     """
@@ -40,24 +61,87 @@ def clean_cell_dollar_cr(dataset):
     Returns:
       list of list of str: A new dataset with all cells cleaned.
     """
-    def clean_cell(cell):
-        if cell is None or not isinstance(cell, str):
-            return ""
-        cleaned = cell.replace("$", "").replace("CR", "")
-        return cleaned.strip()
-    
-    cleaned_dataset = []
-    for row in dataset:
-        cleaned_row = [clean_cell(cell) for cell in row]
-        cleaned_dataset.append(cleaned_row)
-    return cleaned_dataset
+    return list(iter_clean_cell_dollar_cr(dataset))
 
 
-def _is_date(string, fuzzy=True):
+_PARSER_INFO = parser.parserinfo()
+_MONTHS = {name.lower(): number for number, names in enumerate(parser.parserinfo.MONTHS, start=1) for name in names}
+
+# Common bank statement date formats, recognized without calling dateutil.
+_ISO_DATE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")                       # 2023-03-12
+_NUMERIC_DATE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")                   # 12/03/2023
+_DAY_MONTH_DATE = re.compile(r"(\d{1,2})([ -])([A-Za-z]+)(?:\2(\d{4}))?")      # 12 Mar, 12-Mar-2023
+_MONTH_DAY_DATE = re.compile(r"([A-Za-z]+) (\d{1,2})(?:,? (\d{4}))?")          # Mar 12, Mar 12 2023
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+def _match_common_date(string, default_year):
     """
-    Tries to parse a string as a date.
-    Returns the parsed date if successful, otherwise returns None.
+    Parses the common formats above with the same field resolution dateutil uses
+    (month first for numeric dates unless the first field is above 12).
+    Returns a datetime, None for an impossible date, or False if the format is not recognized.
     """
+    try:
+        match = _ISO_DATE.fullmatch(string)
+        if match:
+            year, month, day = (int(g) for g in match.groups())
+            return datetime(year, month, day)
+
+        match = _NUMERIC_DATE.fullmatch(string)
+        if match:
+            first, second, year = (int(g) for g in match.groups())
+            if first > 31:
+                return False
+            if first > 12:
+                return datetime(year, second, first)
+            return datetime(year, first, second)
+
+        match = _DAY_MONTH_DATE.fullmatch(string)
+        if match and match.group(3).lower() in _MONTHS:
+            day = int(match.group(1))
+            year = int(match.group(4)) if match.group(4) else default_year
+            if day > 31:
+                return False
+            return datetime(year, _MONTHS[match.group(3).lower()], day)
+
+        match = _MONTH_DAY_DATE.fullmatch(string)
+        if match and match.group(1).lower() in _MONTHS:
+            day = int(match.group(2))
+            year = int(match.group(3)) if match.group(3) else default_year
+            if day > 31:
+                return False
+            return datetime(year, _MONTHS[match.group(1).lower()], day)
+    except ValueError:
+        # e.g. 31 Feb: dateutil rejects these as well.
+        return None
+    return False
+
+def _has_unknown_word(string):
+    """
+    True if the string contains a word that a non-fuzzy dateutil parse would reject:
+    not a month, weekday, am/pm, time unit or filler word, not a number such as 'nan',
+    and not something that could be a timezone abbreviation.
+    Strings that mention a month are left to dateutil, which may consume neighbouring words.
+    """
+    if "." in string:
+        return False
+    unknown = False
+    for word in _WORD.findall(string):
+        if _PARSER_INFO.month(word) is not None:
+            return False
+        if (_PARSER_INFO.jump(word) or _PARSER_INFO.weekday(word) is not None or _PARSER_INFO.ampm(word) is not None
+                or _PARSER_INFO.hms(word) is not None or _PARSER_INFO.pertain(word) or word in _PARSER_INFO.UTCZONE):
+            continue
+        if len(word) <= 5 and all(ch in string_module.ascii_uppercase for ch in word):
+            continue
+        try:
+            float(word)
+            continue
+        except ValueError:
+            unknown = True
+    return unknown
+
+def _parse_date(string, fuzzy):
     try:
         # parser.parse returns a datetime, but you can choose to format it as needed.
         with warnings.catch_warnings():
@@ -68,6 +152,29 @@ def _is_date(string, fuzzy=True):
     except (ValueError, TypeError, OverflowError, Exception):
         return None
 
+@lru_cache(maxsize=65536)
+def _is_date_cached(string, fuzzy, today):
+    stripped = string.strip()
+    parsed = _match_common_date(stripped, today.year)
+    if parsed is not False:
+        return parsed
+    if not fuzzy and _has_unknown_word(stripped):
+        return None
+    return _parse_date(string, fuzzy)
+
+def _is_date(string, fuzzy=True):
+    """
+    Tries to parse a string as a date.
+    Returns the parsed date if successful, otherwise returns None.
+
+    Common statement formats are matched with precompiled regexes, strings that cannot be a
+    date are rejected up front, and only the remaining cells go through dateutil. Results are
+    memoized per distinct string (and per day, since dateutil fills a missing year from today).
+    """
+    if not isinstance(string, str):
+        return _parse_date(string, fuzzy)
+    return _is_date_cached(string, fuzzy, date.today())
+
 def _extract_numeric(cell):
     """
     Attempts to extract a numeric value (float) from a cell.
@@ -79,9 +186,64 @@ def _extract_numeric(cell):
         return None
 
 
+def _parse_row(row):
+    """
+    Scans one row left-to-right for its date and numeric cells and builds its description.
+    
+    Returns:
+      tuple: (date, description, second_numeric, balance). balance is None when the row has
+             no numeric cell, in which case description is None as well.
+    """
+    found_date = None
+    date_index = None
+    numeric_cells = []  # List of tuples: (index, numeric_value)
+    
+    # Scan left-to-right for date and numeric values.
+    for i, cell in enumerate(row):
+        if cell is not None and isinstance(cell, str):
+            # When looking for date, ignore cell if it contains a "."
+            if "." not in cell and found_date is None:
+                parsed_date = _is_date(cell, fuzzy=False)
+                if parsed_date is not None:
+                    found_date = parsed_date
+                    date_index = i
+            # Attempt to extract numeric value.
+            num =_extract_numeric(cell)
+            if num is not None:
+                numeric_cells.append((i, num))
+    
+    # If no numeric values (and so no balance) are found, skip further processing for this row.
+    if not numeric_cells:
+        return found_date, None, None, None
+    
+    # Balance: the rightmost numeric cell. Debit/Credit: the second rightmost, if available.
+    balance_index, balance = numeric_cells[-1]
+    second_numeric = None
+    second_index = None
+    if len(numeric_cells) > 1:
+        second_index, second_numeric = numeric_cells[-2]
+    
+    # Build the Transaction Description, ending at the debit/credit cell if it exists,
+    # otherwise at the balance cell.
+    end_index = second_index if second_numeric is not None else balance_index
+    if found_date is None:
+        # If no date was found, concatenate all cells before the endpoint.
+        description = " ".join(cell.strip() for cell in row[:end_index] if cell and isinstance(cell, str))
+    else:
+        # Concatenate cells between date_index and end_index (exclusive)
+        description_parts = []
+        if date_index < end_index:
+            for cell in row[date_index + 1:end_index]:
+                if cell and isinstance(cell, str) and cell.strip() and not _is_date(cell,fuzzy=False):
+                    description_parts.append(cell.strip())
+        description = " ".join(description_parts)
+    return found_date, description, second_numeric, balance
+
+
 def create_dataset(processed_data):
     """
-    Given a processed dataset (list of lists), creates a DataFrame with columns:
+    Given a processed dataset (list of lists, or any iterable of rows such as the streaming
+    cleaning stages), creates a DataFrame with columns:
       'Date', 'Transaction Description', 'Debit', 'Credit', 'Balance'.
     
     For each row:
@@ -90,8 +252,9 @@ def create_dataset(processed_data):
          Otherwise, the transaction description is all cells from the leftmost onward.
       2. Numeric values in the row are collected; the rightmost numeric value is
          considered the Balance.
-      3. If a second rightmost numeric value exists, it is assigned to Debit or Credit,
-         based on comparison with the closest previous non-None balance.
+      3. If a previous non-None balance exists, the change from it is assigned to Debit
+         (balance went down) or Credit (balance went up). Otherwise the second rightmost
+         numeric value, if any, is assigned to Credit.
       4. The Transaction Description is constructed:
          - If no date was found: concatenate every cell in the row.
          - If a date was found and a balance was found: concatenate the cells 
@@ -99,106 +262,56 @@ def create_dataset(processed_data):
            or, if not, between the date cell and the balance cell.
          - If no balance is found, skip the transaction description logic for that row.
       5. Rows with no balance numeric value are later dropped.
+
+    Rows are parsed in a single pass into column lists; the previous balance for every row
+    comes from a forward fill over the balance column, and the DataFrame is built once.
     
     Returns:
       A DataFrame with the populated columns.
     """
-    num_rows = len(processed_data)
-    df = pd.DataFrame({
-        "Date": [None] * num_rows,
-        "Transaction Description": [None] * num_rows,
-        "Debit": [None] * num_rows,
-        "Credit": [None] * num_rows,
-        "Balance": [None] * num_rows
-    })
+    dates, descriptions, second_numerics, balances = [], [], [], []
+    for row in processed_data:
+        found_date, description, second_numeric, balance = _parse_row(row)
+        dates.append(found_date)
+        descriptions.append(description)
+        second_numerics.append(second_numeric)
+        balances.append(balance)
     
-    for idx, row in enumerate(processed_data):
-        found_date = None
-        date_index = None
-        numeric_cells = []  # List of tuples: (index, numeric_value)
-        
-        # Scan left-to-right for date and numeric values.
-        for i, cell in enumerate(row):
-            if cell is not None and isinstance(cell, str):
-                # When looking for date, ignore cell if it contains a "."
-                if "." not in cell and found_date is None:
-                    parsed_date = _is_date(cell, fuzzy=False)
-                    if parsed_date is not None:
-                        found_date = parsed_date
-                        date_index = i
-                # Attempt to extract numeric value.
-                num =_extract_numeric(cell)
-                if num is not None:
-                    numeric_cells.append((i, num))
-        
-        # Assign the found date (even if None).
-        df.at[idx, "Date"] = found_date
-        
-        # If no numeric values (and so no balance) are found, skip further processing for this row.
-        if not numeric_cells:
-            continue
-        
-        # Balance: the rightmost numeric cell.
-        balance_index, balance = numeric_cells[-1]
-        df.at[idx, "Balance"] = balance
-        
-        # Debit/Credit: use second rightmost numeric if available.
-        second_numeric = None
-        second_index = None
-        if len(numeric_cells) > 1:
-            second_index, second_numeric = numeric_cells[-2]
-            if idx > 0:
-                # Search upward for the closest previous non-None balance.
-                prev_balance = None
-                for search_idx in range(idx - 1, -1, -1):
-                    prev_balance = df.at[search_idx, "Balance"]
-                    if prev_balance is not None:
-                        break
-                if prev_balance is not None and balance < prev_balance:
-                    df.at[idx, "Debit"] = prev_balance-balance
-                elif prev_balance is not None:
-                    df.at[idx, "Credit"] = balance-prev_balance
-                else:
-                    df.at[idx, "Credit"] = second_numeric
-            else:
-                # For the first row, default to credit.
-                df.at[idx, "Credit"] = second_numeric
-        else:
-            prev_balance = None
-            for search_idx in range(idx - 1, -1, -1):
-                prev_balance = df.at[search_idx, "Balance"]
-                if prev_balance is not None:
-                    break
-            if prev_balance is not None and balance < prev_balance:
-                df.at[idx, "Debit"] = prev_balance-balance
-            elif prev_balance is not None:
-                df.at[idx, "Credit"] = balance-prev_balance
-            
-        # Build the Transaction Description.
-        description = ""
-        # If no date was found, concatenate all cells.
-        if found_date is None:
-            # If no date was found, but numeric_cells exist, use the rightmost numeric cell index as the endpoint.
-            if numeric_cells:
-                # Use the rightmost numeric cell index
-                end_index = second_index if second_numeric is not None else balance_index
-                description = " ".join(cell.strip() for cell in row[:end_index] if cell and isinstance(cell, str))
-            else:
-                # If no numeric value is found, concatenate everything.
-                description = " ".join(cell.strip() for cell in row if cell and isinstance(cell, str))
-        else:
-            # Only try description logic if we have a found balance.
-            if numeric_cells:
-                # Determine the endpoint: if second_numeric exists, use its index; otherwise, balance_index.
-                end_index = second_index if second_numeric is not None else balance_index
-                # Concatenate cells between date_index and end_index (exclusive)
-                description_parts = []
-                if date_index is not None and date_index < end_index:
-                    for cell in row[date_index + 1:end_index]:
-                        if cell and isinstance(cell, str) and cell.strip() and not _is_date(cell,fuzzy=False):
-                            description_parts.append(cell.strip())
-                description = " ".join(description_parts)
-        df.at[idx, "Transaction Description"] = description
+    num_rows = len(balances)
+    has_balance = np.array([b is not None for b in balances], dtype=bool)
+    has_second = np.array([v is not None for v in second_numerics], dtype=bool)
+    balance_values = np.array([b if b is not None else np.nan for b in balances], dtype=float)
+    second_values = np.array([v if v is not None else np.nan for v in second_numerics], dtype=float)
+    
+    # Forward-fill the index of the last row with a balance, then shift by one row to get the
+    # closest previous balance for every row (-1 where there is none).
+    last_balance_index = np.maximum.accumulate(np.where(has_balance, np.arange(num_rows), -1)) if num_rows else np.array([], dtype=int)
+    prev_index = np.roll(last_balance_index, 1)
+    if num_rows:
+        prev_index[0] = -1
+    has_prev = prev_index >= 0
+    prev_balance = balance_values[np.maximum(prev_index, 0)] if num_rows else balance_values
+    
+    went_down = balance_values < prev_balance
+    is_debit = has_balance & has_prev & went_down
+    is_credit = has_balance & has_prev & ~went_down
+    # Without a previous balance, fall back to the second rightmost numeric value.
+    is_first_credit = has_balance & ~has_prev & has_second
+    
+    debit = np.full(num_rows, None, dtype=object)
+    credit = np.full(num_rows, None, dtype=object)
+    with np.errstate(invalid="ignore"):
+        debit[is_debit] = (prev_balance[is_debit] - balance_values[is_debit]).tolist()
+        credit[is_credit] = (balance_values[is_credit] - prev_balance[is_credit]).tolist()
+    credit[is_first_credit] = second_values[is_first_credit].tolist()
+    
+    df = pd.DataFrame({
+        "Date": dates,
+        "Transaction Description": descriptions,
+        "Debit": debit,
+        "Credit": credit,
+        "Balance": balances
+    }, dtype=object)
     
     # Drop any rows with no Balance (i.e. balance remains None).
     df = df[df["Balance"].notnull()].reset_index(drop=True)
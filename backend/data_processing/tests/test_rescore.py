@@ -0,0 +1,60 @@
+import json
+import math
+import sqlite3
+
+import pytest
+
+import rescore
+from analyzer import metrics
+
+COMPLETE = {
+    "starting_balance": 1000.0, "ending_balance": 960.0, "min_balance": 930.0, "max_balance": 1000.0,
+    "min_balance_ratio": 0.93, "max_balance_ratio": 1.0, "total_income": 1030.0, "total_expenses": 70.0,
+    "category_expenses_debit": {"Food": 50.0, "Rent": 20.0}, "essential_spending": 20.0,
+    "discretionary_spending": 50.0, "spending_std": 21.2, "spending_cv": 0.61, "net_cash_flow": 960.0,
+}
+WITH_NONE = dict(COMPLETE, starting_balance=None, min_balance_ratio=None, spending_cv=None, net_cash_flow=None)
+DECREASING = dict(COMPLETE, ending_balance=400.0, min_balance_ratio=0.2, total_expenses=2000.0)
+EVALUATIONS = [COMPLETE, {}, WITH_NONE, DECREASING, None]
+
+
+@pytest.fixture
+def connection():
+    # SQLite stand-in for the evaluations table, metrics stored as JSON text.
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE evaluations (id INTEGER PRIMARY KEY, metrics TEXT, "
+                       "loan_eligibility_score REAL, message TEXT)")
+    connection.executemany(
+        "INSERT INTO evaluations (id, metrics, loan_eligibility_score, message) VALUES (?, ?, ?, ?)",
+        [(i + 1, None if m is None else json.dumps(m), -1.0, "old") for i, m in enumerate(EVALUATIONS)],
+    )
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+def _rows(connection):
+    return connection.execute("SELECT id, metrics, loan_eligibility_score, message FROM evaluations ORDER BY id").fetchall()
+
+
+@pytest.mark.parametrize("batch_size", [2, 100])
+def test_stored_scores_match_scalar_scoring(connection, batch_size):
+    weights = metrics.get_metrics_dictionary(balance_increase=7)
+    stats = rescore.rescore_evaluations(connection, weights, batch_size=batch_size)
+    assert stats["rows"] == stats["updated"] == len(EVALUATIONS)
+
+    for (_, _, score, message), stored_metrics in zip(_rows(connection), EVALUATIONS):
+        expected_score, expected_message = metrics.calculate_loan_eligibility_score(stored_metrics or {}, weights)
+        if math.isnan(expected_score):
+            assert score is None
+        else:
+            assert score == pytest.approx(expected_score)
+        assert message == expected_message
+
+
+def test_dry_run_leaves_rows_unchanged(connection):
+    before = _rows(connection)
+    stats = rescore.rescore_evaluations(connection, dry_run=True)
+    assert stats["rows"] == len(EVALUATIONS)
+    assert stats["updated"] == 0
+    assert _rows(connection) == before
@@ -2,6 +2,7 @@
 const express = require('express');
 const cors = require('cors');
 const pdfRoutes = require('./routes/pdf');  
+const processPdf = require('./services/processPdf');
 const path = require('path'); 
 const app = express();
 const port = process.env.PORT || 8000;
@@ -37,3 +38,11 @@ app.use('/api/pdf', pdfRoutes);
 app.listen(port, () => {
   console.log(`Server is running on port ${port}`);
 });
+
+// Stop the resident Python workers when the server is shut down.
+process.on('SIGTERM', () => {
+  if (processPdf.pool) {
+    processPdf.pool.close();
+  }
+  process.exit(0);
+});
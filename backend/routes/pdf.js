@@ -3,7 +3,7 @@ const express = require('express');
 const router = express.Router();
 const processPdf = require('../services/processPdf'); // We'll create this next
 const path = require('path');
-const pool = require('../services/db'); // The PostgreSQL pool.
+const evaluationStore = require('../services/evaluationStore');
 // Use multer for handling file uploads
 const multer = require('multer');
 const storage = multer.diskStorage({
@@ -27,42 +27,80 @@ router.post('/process', upload.single('file'), async (req, res) => {
     const filePath = req.file.path;
     const filename = req.file.filename;
     const applicantName = req.body.applicantName || "Unknown";
+    // Optional: uploads with the same applicantId are evaluated together, each PDF processed once.
+    const applicantId = req.body.applicantId || null;
+    if (applicantId && !/^[\w.-]{1,64}$/.test(applicantId)) {
+      return res.status(400).json({ error: 'applicantId may only contain letters, digits, "_", "." and "-"' });
+    }
     // Call the Python pipeline wrapper function with the file path.
-    const result = await processPdf(filePath);
+    const result = await processPdf(filePath, { applicantId });
 
     const finalResult = { 
       applicantName, 
       ...result 
     };
 
-    const insertQuery = `
-      INSERT INTO loan_evaluations (filename, evaluation_result)
-      VALUES ($1, $2)
-      RETURNING id;
-    `;
-    // Convert the result object to JSON.
-    const values = [filename, JSON.stringify(finalResult)];
-    const dbResult = await pool.query(insertQuery, values);
+    // Store the summary and the transactions in their own tables.
+    const id = await evaluationStore.saveEvaluation({ filename, applicantName, applicantId, result });
     
     // Send back the result, possibly including the new record's ID.
-    res.json({ id: dbResult.rows[0].id, filename, ...finalResult });
+    res.json({ id, filename, ...finalResult });
     
     //res.json({ filename: uniqueFilename, ...result });
   } catch (error) {
     console.error('Error processing PDF:', error);
-    res.status(500).json({ error: error.message });
+    // The Python worker pool is saturated; ask the client to retry later.
+    const status = error.code === 'POOL_BUSY' ? 503 : 500;
+    res.status(status).json({ error: error.message });
   }
 });
 
+// GET /api/pdf/evaluations?limit=50&before=<id>
+// Summaries only, newest first. Pass the returned nextBefore as `before` for the next page.
 router.get('/evaluations', async (req, res) => {
   try {
-    const queryText = 'SELECT * FROM loan_evaluations ORDER BY created_at DESC';
-    const dbResult = await pool.query(queryText);
-    res.json(dbResult.rows);
+    const before = req.query.before !== undefined ? parseInt(req.query.before, 10) : null;
+    if (Number.isNaN(before)) {
+      return res.status(400).json({ error: 'before must be an evaluation id' });
+    }
+    const page = await evaluationStore.listEvaluations({ limit: req.query.limit, before });
+    res.json(page);
   } catch (error) {
     console.error('Error fetching evaluations:', error);
     res.status(500).json({ error: error.message });
   }
 });
 
+// GET /api/pdf/evaluations/:id/transactions?from=YYYY-MM-DD&to=YYYY-MM-DD
+router.get('/evaluations/:id/transactions', async (req, res) => {
+  try {
+    const id = parseInt(req.params.id, 10);
+    // A real calendar date: Postgres rejects e.g. 2024-02-31, which would surface as a 500.
+    const isDate = (value) => {
+      if (value === undefined) {
+        return true;
+      }
+      const match = /^(\d{4})-(\d{2})-(\d{2})$/.exec(value);
+      if (!match) {
+        return false;
+      }
+      const [year, month, day] = match.slice(1).map(Number);
+      const date = new Date(0);
+      date.setUTCFullYear(year, month - 1, day);
+      return date.getUTCFullYear() === year && date.getUTCMonth() === month - 1 && date.getUTCDate() === day;
+    };
+    if (Number.isNaN(id) || !isDate(req.query.from) || !isDate(req.query.to)) {
+      return res.status(400).json({ error: 'Invalid evaluation id or date range' });
+    }
+    const transactions = await evaluationStore.getTransactions(id, { from: req.query.from, to: req.query.to });
+    if (transactions === null) {
+      return res.status(404).json({ error: 'Evaluation not found' });
+    }
+    res.json(transactions);
+  } catch (error) {
+    console.error('Error fetching transactions:', error);
+    res.status(500).json({ error: error.message });
+  }
+});
+
 module.exports = router;
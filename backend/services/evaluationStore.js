@@ -0,0 +1,129 @@
+// backend/services/evaluationStore.js
+const pool = require('./db'); // The PostgreSQL pool.
+
+const DEFAULT_PAGE_SIZE = 50;
+const MAX_PAGE_SIZE = 200;
+
+// Reads one numeric field of a transaction (a jsonb object `t.r`) as a double, or NULL.
+const numberField = (field) =>
+  `CASE WHEN jsonb_typeof(t.r->'${field}') = 'number' THEN (t.r->>'${field}')::double precision END`;
+
+/**
+ * Returns the calendar date (YYYY-MM-DD) of a transaction's Date, which the pipeline writes
+ * as ISO 8601 text, or null. Only that prefix is read; the text is never re-parsed.
+ */
+function transactionDate(text) {
+  const match = typeof text === 'string' && /^(\d{4}-\d{2}-\d{2})(?:[T ]|$)/.exec(text);
+  return match ? match[1] : null;
+}
+
+/**
+ * Stores one pipeline result: a summary row in `evaluations` and its transactions in
+ * `transactions`, written with a single set-based INSERT. Returns the new evaluation id.
+ */
+async function saveEvaluation({ filename, applicantName, applicantId = null, result }) {
+  const transactions = (result.transactions || []).map((tx) => ({ ...tx, _date: transactionDate(tx.Date) }));
+  const client = await pool.connect();
+  try {
+    await client.query('BEGIN');
+    const { rows } = await client.query(
+      `INSERT INTO evaluations
+         (filename, applicant_name, applicant_id, loan_eligibility_score, message, metrics, transaction_count)
+       VALUES ($1, $2, $3, $4, $5, $6, $7)
+       RETURNING id`,
+      [
+        filename,
+        applicantName,
+        applicantId,
+        result.loan_eligibility_score,
+        result.message,
+        JSON.stringify(result.metrics || {}),
+        transactions.length,
+      ]
+    );
+    const evaluationId = rows[0].id;
+    if (transactions.length > 0) {
+      // All rows go over as one JSON array and are expanded server-side in one statement.
+      await client.query(
+        `INSERT INTO transactions
+           (evaluation_id, row_index, date_text, transaction_date, description, debit, credit, balance, category)
+         SELECT $1, t.ordinality - 1, t.r->>'Date', (t.r->>'_date')::date, t.r->>'Transaction Description',
+                ${numberField('Debit')}, ${numberField('Credit')}, ${numberField('Balance')}, t.r->>'Category'
+         FROM jsonb_array_elements($2::jsonb) WITH ORDINALITY AS t(r, ordinality)`,
+        [evaluationId, JSON.stringify(transactions)]
+      );
+    }
+    await client.query('COMMIT');
+    return evaluationId;
+  } catch (error) {
+    await client.query('ROLLBACK');
+    throw error;
+  } finally {
+    client.release();
+  }
+}
+
+// Shapes a summary row like the stored pipeline result, without its transactions.
+function toSummary(row) {
+  return {
+    id: row.id,
+    filename: row.filename,
+    created_at: row.created_at,
+    transaction_count: row.transaction_count,
+    evaluation_result: {
+      applicantName: row.applicant_name,
+      applicantId: row.applicant_id,
+      loan_eligibility_score: row.loan_eligibility_score,
+      message: row.message,
+      metrics: row.metrics,
+    },
+  };
+}
+
+/**
+ * Lists evaluation summaries, newest first, with keyset pagination on id: pass the
+ * returned `nextBefore` as `before` to get the following page.
+ */
+async function listEvaluations({ limit = DEFAULT_PAGE_SIZE, before = null } = {}) {
+  const pageSize = Math.min(Math.max(parseInt(limit, 10) || DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE);
+  const { rows } = await pool.query(
+    `SELECT id, filename, applicant_name, applicant_id, loan_eligibility_score, message, metrics,
+            transaction_count, created_at
+     FROM evaluations
+     WHERE $1::integer IS NULL OR id < $1
+     ORDER BY id DESC
+     LIMIT $2`,
+    [before, pageSize + 1]
+  );
+  const hasMore = rows.length > pageSize;
+  const page = rows.slice(0, pageSize);
+  return {
+    items: page.map(toSummary),
+    nextBefore: hasMore ? page[page.length - 1].id : null,
+  };
+}
+
+/**
+ * Returns the transactions of one evaluation in statement order, with the pipeline's
+ * column names, or null when the evaluation does not exist. `from`/`to` (YYYY-MM-DD)
+ * keep only transactions with a known date in that range.
+ */
+async function getTransactions(evaluationId, { from = null, to = null } = {}) {
+  const exists = await pool.query('SELECT 1 FROM evaluations WHERE id = $1', [evaluationId]);
+  if (exists.rowCount === 0) {
+    return null;
+  }
+  const { rows } = await pool.query(
+    `SELECT date_text AS "Date", description AS "Transaction Description", debit AS "Debit",
+            credit AS "Credit", balance AS "Balance", category AS "Category"
+     FROM transactions
+     WHERE evaluation_id = $1
+       AND ($2::date IS NULL OR transaction_date >= $2)
+       AND ($3::date IS NULL OR transaction_date <= $3)
+     ORDER BY row_index`,
+    [evaluationId, from, to]
+  );
+  return rows;
+}
+
+module.exports = { saveEvaluation, listEvaluations, getTransactions };
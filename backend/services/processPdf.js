@@ -1,19 +1,35 @@
 // backend/services/processPdf.js
-const { exec } = require('child_process');
+const { execFile } = require('child_process');
 const path = require('path');
+const PythonWorkerPool = require('./pythonWorkerPool');
+
+const pythonScriptPath = '/app/data_processing/pipeline.py';
+
+// Number of resident Python workers. Set PYTHON_WORKERS=0 to run one process per upload instead.
+const workerCount = parseInt(process.env.PYTHON_WORKERS || '2', 10);
+
+const pool = workerCount > 0
+  ? new PythonWorkerPool({
+      scriptPath: pythonScriptPath,
+      size: workerCount,
+      maxJobsPerWorker: parseInt(process.env.PYTHON_WORKER_MAX_JOBS || '50', 10),
+      jobTimeoutMs: parseInt(process.env.PYTHON_JOB_TIMEOUT_MS || '300000', 10),
+      maxQueueSize: parseInt(process.env.PYTHON_MAX_QUEUE || '20', 10),
+    }).start()
+  : null;
 
 /**
- * Calls the Python pipeline function to process the PDF.
- * Expects the file path of the PDF and returns a Promise that resolves with the pipeline result.
+ * Runs the Python pipeline in a fresh process for a single PDF.
  */
-function processPdf(filePath) {
+function processPdfOnce(filePath, { applicantId = null } = {}) {
   return new Promise((resolve, reject) => {
-    // Construct the command to run your Python pipeline
-    // Adjust the command if your pipeline requires additional arguments.
-    const pythonScriptPath = '/app/data_processing/pipeline.py';
-    const command = `python3 ${pythonScriptPath} "${filePath}"`;
+    // Arguments are passed without a shell, so applicant ids need no quoting.
+    const args = [pythonScriptPath, filePath];
+    if (applicantId) {
+      args.push('--applicant', applicantId);
+    }
     //const command = `python3 -m data_processing.pipeline.pipeline "${filePath}"`;
-    exec(command, (error, stdout, stderr) => {
+    execFile('python3', args, { maxBuffer: 64 * 1024 * 1024 }, (error, stdout, stderr) => {
       if (error) {
         console.error("Command error:", error);
         return reject(error);
@@ -33,4 +49,19 @@ function processPdf(filePath) {
   });
 }
 
+/**
+ * Calls the Python pipeline function to process the PDF.
+ * Expects the file path of the PDF and returns a Promise that resolves with the pipeline result.
+ * With options.applicantId the PDF is added to that applicant's statements and the result
+ * covers all of them. Uses the resident worker pool unless it is disabled.
+ */
+function processPdf(filePath, options = {}) {
+  if (pool) {
+    return pool.run(path.resolve(filePath), options);
+  }
+  return processPdfOnce(filePath, options);
+}
+
+processPdf.pool = pool;
+
 module.exports = processPdf;
@@ -0,0 +1,200 @@
+// backend/services/pythonWorkerPool.js
+const { spawn } = require('child_process');
+const readline = require('readline');
+
+/**
+ * A pool of resident Python pipeline workers (`pipeline.py --worker`).
+ * Each worker loads its imports and models once, then serves jobs over a
+ * JSON-lines protocol on stdin/stdout. The pool queues jobs, matches responses
+ * by request ID, enforces per-job timeouts, rejects new work when the queue is
+ * full and recycles each worker after a fixed number of jobs.
+ */
+class PythonWorkerPool {
+  constructor({
+    scriptPath,
+    pythonPath = 'python3',
+    size = 2,
+    maxJobsPerWorker = 50,
+    jobTimeoutMs = 5 * 60 * 1000,
+    maxQueueSize = 20,
+    respawnDelayMs = 1000,
+  }) {
+    this.scriptPath = scriptPath;
+    this.pythonPath = pythonPath;
+    this.size = size;
+    this.maxJobsPerWorker = maxJobsPerWorker;
+    this.jobTimeoutMs = jobTimeoutMs;
+    this.maxQueueSize = maxQueueSize;
+    this.respawnDelayMs = respawnDelayMs;
+
+    this.workers = new Set();
+    this.queue = [];
+    this.nextRequestId = 1;
+    this.closed = false;
+  }
+
+  start() {
+    for (let i = 0; i < this.size; i++) {
+      this._spawnWorker();
+    }
+    return this;
+  }
+
+  /**
+   * Queues a PDF for processing. Resolves with the pipeline result, or rejects
+   * with an error whose `code` is 'POOL_BUSY' when the queue is full.
+   * Pass `applicantId` to add the PDF to that applicant's stored statements.
+   */
+  run(pdfFile, { applicantId = null } = {}) {
+    if (this.closed) {
+      return Promise.reject(new Error('Python worker pool is closed'));
+    }
+    if (this.queue.length >= this.maxQueueSize) {
+      const error = new Error('Too many PDFs are being processed, please retry shortly');
+      error.code = 'POOL_BUSY';
+      return Promise.reject(error);
+    }
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id: this.nextRequestId++, pdfFile, applicantId, resolve, reject });
+      this._dispatch();
+    });
+  }
+
+  stats() {
+    const workers = [...this.workers];
+    return {
+      workers: workers.length,
+      ready: workers.filter((w) => w.ready).length,
+      busy: workers.filter((w) => w.job).length,
+      queued: this.queue.length,
+    };
+  }
+
+  close() {
+    this.closed = true;
+    for (const job of this.queue.splice(0)) {
+      job.reject(new Error('Python worker pool is closed'));
+    }
+    for (const worker of this.workers) {
+      this._retire(worker);
+    }
+  }
+
+  _spawnWorker() {
+    const proc = spawn(this.pythonPath, [this.scriptPath, '--worker'], {
+      stdio: ['pipe', 'pipe', 'inherit'],
+    });
+    const worker = { proc, ready: false, job: null, timer: null, jobsDone: 0, retiring: false };
+    this.workers.add(worker);
+
+    const lines = readline.createInterface({ input: proc.stdout, crlfDelay: Infinity });
+    lines.on('line', (line) => this._onMessage(worker, line));
+    proc.on('error', (error) => console.error('Python worker error:', error));
+    // Writes to a worker that already died surface through the 'exit' handler.
+    proc.stdin.on('error', (error) => console.error('Python worker stdin error:', error.message));
+    proc.on('exit', (code, signal) => this._onExit(worker, code, signal));
+    return worker;
+  }
+
+  _onMessage(worker, line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (parseErr) {
+      console.error('Python worker sent invalid output:', line.slice(0, 200));
+      // Only responses are written to the protocol stream, so this was the current job's.
+      if (worker.job) {
+        this._finishJob(worker).reject(new Error(`Python worker sent an invalid response: ${parseErr.message}`));
+        this._afterJob(worker);
+      }
+      return;
+    }
+
+    if (message.type === 'ready') {
+      worker.ready = true;
+      this._dispatch();
+      return;
+    }
+
+    const job = worker.job;
+    if (!job || message.id !== job.id) {
+      console.error(`Python worker sent a response for unknown request ${message.id}`);
+      return;
+    }
+    this._finishJob(worker);
+
+    if (message.ok) {
+      job.resolve(message.result);
+    } else {
+      job.reject(new Error(message.error));
+    }
+    this._afterJob(worker);
+  }
+
+  _finishJob(worker) {
+    const job = worker.job;
+    clearTimeout(worker.timer);
+    worker.job = null;
+    worker.jobsDone += 1;
+    return job;
+  }
+
+  _afterJob(worker) {
+    if (worker.jobsDone >= this.maxJobsPerWorker) {
+      this._retire(worker);
+      this._spawnWorker();
+    }
+    this._dispatch();
+  }
+
+  _onExit(worker, code, signal) {
+    this.workers.delete(worker);
+    clearTimeout(worker.timer);
+    if (worker.job) {
+      worker.job.reject(new Error(`Python worker exited (code ${code}, signal ${signal})`));
+      worker.job = null;
+    }
+    if (!worker.retiring && !this.closed) {
+      console.error(`Python worker ${worker.proc.pid} exited unexpectedly, starting a new one`);
+      // Delay the restart so a worker that fails on startup does not spin.
+      setTimeout(() => {
+        if (!this.closed) {
+          this._spawnWorker();
+        }
+      }, this.respawnDelayMs);
+    }
+  }
+
+  _retire(worker) {
+    worker.retiring = true;
+    worker.ready = false;
+    // Closing stdin lets the worker finish and exit on its own.
+    worker.proc.stdin.end();
+  }
+
+  _dispatch() {
+    for (const worker of this.workers) {
+      if (this.queue.length === 0) {
+        return;
+      }
+      if (!worker.ready || worker.job || worker.retiring) {
+        continue;
+      }
+      const job = this.queue.shift();
+      worker.job = job;
+      worker.timer = setTimeout(() => {
+        job.reject(new Error(`Processing timed out after ${this.jobTimeoutMs} ms`));
+        worker.job = null;
+        // The worker is stuck on this job; replace it.
+        worker.retiring = true;
+        worker.proc.kill('SIGKILL');
+        if (!this.closed) {
+          this._spawnWorker();
+        }
+      }, this.jobTimeoutMs);
+      worker.proc.stdin.write(JSON.stringify({ id: job.id, pdf_file: job.pdfFile, applicant_id: job.applicantId }) + '\n');
+    }
+  }
+}
+
+module.exports = PythonWorkerPool;
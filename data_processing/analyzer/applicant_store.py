@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import pandas as pd
+import analyzer.default_classification_settings as default_classification_settings
+from .metrics import MetricsAccumulator
+
+DEFAULT_APPLICANT_STORE_PATH = default_classification_settings.DEFAULT_APPLICANT_STORE_PATH
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS statements (applicant_id TEXT, statement_id TEXT, filename TEXT, "
+    "added_at REAL, accumulator TEXT, PRIMARY KEY (applicant_id, statement_id))",
+    "CREATE TABLE IF NOT EXISTS transactions (applicant_id TEXT, statement_id TEXT, row_index INTEGER, "
+    "record TEXT, PRIMARY KEY (applicant_id, statement_id, row_index))",
+]
+
+
+def statement_fingerprint(pdf_file):
+    """
+    Returns the sha1 of the PDF's bytes, so that re-uploading the same statement is recognized.
+    """
+    digest = hashlib.sha1()
+    with open(pdf_file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ApplicantStore:
+    """
+    Per-applicant store of processed statements: the classified transaction rows of every
+    statement plus its MetricsAccumulator state. A new statement only has to be processed
+    once; the applicant's metrics are then rebuilt by merging the stored accumulators.
+
+    Statements are kept in a SQLite database at path, which several worker processes can share.
+    """
+    def __init__(self, path=DEFAULT_APPLICANT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+            self._connection.commit()
+        return self._connection
+
+    def has_statement(self, applicant_id, statement_id):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM statements WHERE applicant_id = ? AND statement_id = ?", (applicant_id, statement_id)
+            ).fetchone()
+            return row is not None
+
+    def add_statement(self, applicant_id, statement_id, df, accumulator=None, filename=None):
+        """
+        Stores a statement's classified rows and accumulator, replacing any earlier copy of it.
+        Returns the accumulator.
+        """
+        if accumulator is None:
+            accumulator = MetricsAccumulator.from_dataframe(df)
+        # ISO text rather than the default epoch milliseconds; load_transactions parses it back.
+        records = json.loads(df.to_json(orient="records", date_format="iso"))
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM transactions WHERE applicant_id = ? AND statement_id = ?", (applicant_id, statement_id))
+                connection.execute(
+                    "INSERT OR REPLACE INTO statements (applicant_id, statement_id, filename, added_at, accumulator) VALUES (?, ?, ?, ?, ?)",
+                    (applicant_id, statement_id, filename, time.time(), json.dumps(accumulator.to_dict())),
+                )
+                connection.executemany(
+                    "INSERT INTO transactions (applicant_id, statement_id, row_index, record) VALUES (?, ?, ?, ?)",
+                    [(applicant_id, statement_id, i, json.dumps(record)) for i, record in enumerate(records)],
+                )
+        return accumulator
+
+    def get_accumulators(self, applicant_id):
+        """
+        Returns the applicant's statement accumulators in the order the statements were added.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT accumulator FROM statements WHERE applicant_id = ? ORDER BY added_at, rowid", (applicant_id,)
+            ).fetchall()
+        return [MetricsAccumulator.from_dict(json.loads(state)) for (state,) in rows]
+
+    def load_transactions(self, applicant_id, statement_id=None):
+        """
+        Returns the stored rows of one statement, or of all the applicant's statements, as a DataFrame.
+        """
+        query = ("SELECT t.record FROM transactions t JOIN statements s "
+                 "ON s.applicant_id = t.applicant_id AND s.statement_id = t.statement_id WHERE t.applicant_id = ?")
+        params = [applicant_id]
+        if statement_id is not None:
+            query += " AND t.statement_id = ?"
+            params.append(statement_id)
+        query += " ORDER BY s.added_at, s.rowid, t.row_index"
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        df = pd.DataFrame([json.loads(record) for (record,) in rows])
+        if "Date" in df.columns:
+            df["Date"] = pd.Series([_parse_date(value) for value in df["Date"]], index=df.index, dtype=object)
+        return df
+
+    def statement_count(self, applicant_id):
+        with self._lock:
+            (count,) = self._connect().execute(
+                "SELECT COUNT(*) FROM statements WHERE applicant_id = ?", (applicant_id,)
+            ).fetchone()
+        return count
+
+
+def _parse_date(value):
+    # Dates are stored as ISO text (see add_statement).
+    if pd.isna(value):
+        return None
+    return pd.Timestamp(value).to_pydatetime()
+
+_default_store = None
+
+def get_default_store():
+    """
+    Returns the process-wide applicant store, creating it on first use.
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = ApplicantStore()
+    return _default_store
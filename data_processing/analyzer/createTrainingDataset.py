@@ -1,10 +1,19 @@
 import torch
 import torch.nn.functional as F
+import numpy as np
 import pandas as pd
-from transformers import AutoTokenizer, AutoModel
 import analyzer.default_classification_settings as default_classification_settings
+import analyzer.model_registry as model_registry
+import analyzer.embedding_cache as embedding_cache
+import analyzer.kmeans as kmeans
 
 DEFAULT_EMBEDDING_MODEL = default_classification_settings.DEFAULT_EMBEDDING_MODEL
+DEFAULT_EMBEDDING_BATCH_SIZE = default_classification_settings.DEFAULT_EMBEDDING_BATCH_SIZE
+DEFAULT_AUTO_K_MAX = default_classification_settings.DEFAULT_AUTO_K_MAX
+DEFAULT_AUTO_K_METHOD = default_classification_settings.DEFAULT_AUTO_K_METHOD
+DEFAULT_AUTO_K_TIME_BUDGET = default_classification_settings.DEFAULT_AUTO_K_TIME_BUDGET
+DEFAULT_KMEANS_N_INIT = default_classification_settings.DEFAULT_KMEANS_N_INIT
+DEFAULT_KMEANS_SEED = default_classification_settings.DEFAULT_KMEANS_SEED
 
 def _get_amount(row, debit_column="Debit", credit_column="Credit"):
     """
@@ -43,40 +52,91 @@ def export_transactions_for_labeling(dataDirectory, output_csv="transactions_for
     all_data.to_csv(output_csv, index=False)
     print(f"Exported data to {output_csv}")
 
-def get_embeddings(texts, model_name=DEFAULT_EMBEDDING_MODEL, device=None):
+def get_embeddings(texts, model_name=DEFAULT_EMBEDDING_MODEL, device=None, batch_size=DEFAULT_EMBEDDING_BATCH_SIZE, num_threads=None):
     """
     Converts a list of texts to embeddings using a pretrained transformer.
+
+    Texts are sorted by token length and embedded in batches of batch_size, so each batch is
+    only padded to its own longest text and peak memory does not grow with the number of texts.
     
     Parameters:
       texts (list of str): The transaction descriptions.
       model_name (str): The name of the pretrained model.
       device (str or torch.device): 'cuda' or 'cpu'. Automatically chosen if None.
+      batch_size (int): Number of texts per forward pass.
+      num_threads (int): Optional number of CPU threads torch may use for this call.
+      
+    Returns:
+      torch.Tensor: Embeddings tensor of shape (N, D), where N is the number of texts,
+                    in the same order as texts.
+    """
+    device = model_registry.resolve_device(device)
+    tokenizer, model = model_registry.get_embedding_model(model_name, device)
+
+    sentence_embeddings = torch.empty((len(texts), model.config.hidden_size), dtype=torch.float32)
+    if not texts:
+        return sentence_embeddings
+
+    # Bucket texts of similar length together to cut padding waste.
+    lengths = [len(ids) for ids in model_registry.tokenize(tokenizer, texts, truncation=True)["input_ids"]]
+    order = sorted(range(len(texts)), key=lambda i: lengths[i])
+
+    previous_threads = torch.get_num_threads()
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    try:
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                batch_indices = order[start:start + batch_size]
+                batch_texts = [texts[i] for i in batch_indices]
+                inputs = model_registry.tokenize(tokenizer, batch_texts, padding=True, truncation=True, return_tensors='pt').to(device)
+                outputs = model(**inputs)
+                # Mean Pooling: average word embeddings, weighted by attention mask.
+                embeddings = outputs.last_hidden_state  # shape (batch_size, seq_len, hidden_size)
+                attention_mask = inputs['attention_mask'].unsqueeze(-1)  # shape (batch_size, seq_len, 1)
+                masked_embeddings = embeddings * attention_mask.float()
+                summed = torch.sum(masked_embeddings, dim=1)
+                summed_mask = torch.clamp(attention_mask.sum(dim=1), min=1e-9)
+                # Write the batch back into the original row positions.
+                sentence_embeddings[batch_indices] = (summed / summed_mask).float().cpu()
+    finally:
+        if num_threads is not None:
+            torch.set_num_threads(previous_threads)
+    
+    return sentence_embeddings
+
+def get_cached_embeddings(texts, model_name=DEFAULT_EMBEDDING_MODEL, cache=None, **kwargs):
+    """
+    Same as get_embeddings, but descriptions are normalized and deduplicated first and only
+    descriptions missing from the embedding cache are run through the model.
+    
+    Parameters:
+      texts (list of str): The transaction descriptions.
+      model_name (str): The name of the pretrained model.
+      cache (EmbeddingCache): Cache to use. Defaults to the process-wide cache.
+      **kwargs: Passed to get_embeddings (device, batch_size, num_threads).
       
     Returns:
-      torch.Tensor: Embeddings tensor of shape (N, D), where N is the number of texts.
+      torch.Tensor: Embeddings tensor of shape (N, D), in the same order as texts.
     """
-    if device is None:
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModel.from_pretrained(model_name).to(device)
-    model.eval()
-
-    with torch.no_grad():
-        inputs = tokenizer(texts, padding=True, truncation=True, return_tensors='pt').to(device)
-        outputs = model(**inputs)
-        # Mean Pooling: average word embeddings, weighted by attention mask.
-        embeddings = outputs.last_hidden_state  # shape (batch_size, seq_len, hidden_size)
-        attention_mask = inputs['attention_mask'].unsqueeze(-1)  # shape (batch_size, seq_len, 1)
-        masked_embeddings = embeddings * attention_mask.float()
-        summed = torch.sum(masked_embeddings, dim=1)
-        summed_mask = torch.clamp(attention_mask.sum(dim=1), min=1e-9)
-        sentence_embeddings = summed / summed_mask
-    
-    return sentence_embeddings.cpu()
+    if cache is None:
+        cache = embedding_cache.get_default_cache()
+    normalized = [embedding_cache.normalize_description(text) for text in texts]
+    unique_texts = list(dict.fromkeys(normalized))
+
+    vectors = cache.get_many(model_name, unique_texts)
+    missing = [text for text in unique_texts if text not in vectors]
+    if missing:
+        new_vectors = get_embeddings(missing, model_name=model_name, **kwargs).numpy()
+        vectors.update(zip(missing, cache.put_many(model_name, missing, new_vectors)))
+
+    if not normalized:
+        return get_embeddings([], model_name=model_name, **kwargs)
+    return torch.from_numpy(np.stack([vectors[text] for text in normalized]))
 
 def kmeans_torch(embeddings, num_clusters, num_iters=100):
     """
-    Performs k-means clustering on the embeddings.
+    Performs k-means clustering on the embeddings (see analyzer.kmeans.kmeans).
     
     Parameters:
       embeddings (torch.Tensor): Tensor of shape (N, D)
@@ -87,28 +147,13 @@ def kmeans_torch(embeddings, num_clusters, num_iters=100):
       cluster_ids (torch.Tensor): Tensor of cluster assignments for each embedding.
       centroids (torch.Tensor): The final cluster centroids.
     """
-    N, D = embeddings.shape
-    # Randomly select initial centroids.
-    indices = torch.randperm(N)[:num_clusters]
-    centroids = embeddings[indices]
-
-    for it in range(num_iters):
-        # Compute pairwise Euclidean distances: shape (N, num_clusters)
-        distances = torch.cdist(embeddings, centroids)
-        # Assign clusters: index of the nearest centroid for each embedding.
-        cluster_ids = torch.argmin(distances, dim=1)
-        # Update centroids: average all embeddings in each cluster.
-        new_centroids = torch.stack([
-            embeddings[cluster_ids == k].mean(dim=0) if (cluster_ids == k).sum() > 0 else centroids[k]
-            for k in range(num_clusters)
-        ])
-        if torch.allclose(new_centroids, centroids, atol=1e-4):
-            break
-        centroids = new_centroids
-
+    cluster_ids, centroids, _ = kmeans.kmeans(embeddings, num_clusters, num_iters=num_iters)
     return cluster_ids, centroids
 
-def cluster_transaction_descriptions_pytorch(df, text_column="Transaction Description", num_clusters=[8,2]):
+def cluster_transaction_descriptions_pytorch(df, text_column="Transaction Description", num_clusters=[8,2],
+                                             kmeans_seed=DEFAULT_KMEANS_SEED, kmeans_n_init=DEFAULT_KMEANS_N_INIT, kmeans_mini_batch=None,
+                                             auto_k_max=DEFAULT_AUTO_K_MAX, auto_k_method=DEFAULT_AUTO_K_METHOD,
+                                             auto_k_time_budget=DEFAULT_AUTO_K_TIME_BUDGET):
     """
     Splits the input DataFrame into subsets:
       - Rows with a non-null 'Debit'
@@ -121,11 +166,20 @@ def cluster_transaction_descriptions_pytorch(df, text_column="Transaction Descri
       df (pd.DataFrame): The input DataFrame, which is assumed to contain at least the following columns:
                           'Transaction Description', 'Debit', and 'Credit'
       text_column (str): The column containing transaction description texts.
-      num_clusters (int): The number of clusters for each subset.
+      num_clusters (list): The number of clusters for each subset. An entry (or the whole argument)
+                           may be "auto" to choose it with analyzer.kmeans.select_num_clusters.
+      kmeans_seed (int): Seed for k-means; None for a different clustering on every run.
+      kmeans_n_init (int): Number of k-means++ restarts.
+      kmeans_mini_batch (bool): Force mini-batch k-means on or off; None decides by subset size.
+      auto_k_max (int): Largest cluster count tried for "auto".
+      auto_k_method (str): "silhouette" or "elbow".
+      auto_k_time_budget (float): Seconds spent choosing each "auto" cluster count.
     
     Returns:
       pd.DataFrame: The DataFrame with an added 'Cluster' column.
     """
+    if num_clusters == "auto":
+        num_clusters = ["auto", "auto"]
     if not isinstance(num_clusters, list) or len(num_clusters)!=2:
         print("Invalid input for num_clusters-must be list of length 2")
         return None
@@ -133,7 +187,11 @@ def cluster_transaction_descriptions_pytorch(df, text_column="Transaction Descri
     def cluster_subset(sub_df, text_col, num_clusters):
         texts = sub_df[text_col].tolist()
         embeddings = get_embeddings(texts)  # (N, D) tensor of sentence embeddings.
-        cluster_ids, _ = kmeans_torch(embeddings, num_clusters=num_clusters)
+        if num_clusters == "auto":
+            num_clusters, _ = kmeans.select_num_clusters(embeddings, k_max=auto_k_max, method=auto_k_method,
+                                                         time_budget=auto_k_time_budget, seed=kmeans_seed)
+        cluster_ids, _, _ = kmeans.kmeans(embeddings, num_clusters, n_init=kmeans_n_init, seed=kmeans_seed,
+                                          mini_batch=kmeans_mini_batch)
         sub_df = sub_df.copy()
         sub_df["Cluster"] = cluster_ids.numpy()
         return sub_df
@@ -164,6 +222,14 @@ def cluster_transaction_descriptions_with_amounts_split_pytorch(
     num_clusters=[8, 2], 
     amount_scale=1.0,
     embedding_model_name = DEFAULT_EMBEDDING_MODEL,
+    embedding_batch_size = DEFAULT_EMBEDDING_BATCH_SIZE,
+    use_embedding_cache = True,
+    kmeans_seed = DEFAULT_KMEANS_SEED,
+    kmeans_n_init = DEFAULT_KMEANS_N_INIT,
+    kmeans_mini_batch = None,
+    auto_k_max = DEFAULT_AUTO_K_MAX,
+    auto_k_method = DEFAULT_AUTO_K_METHOD,
+    auto_k_time_budget = DEFAULT_AUTO_K_TIME_BUDGET,
     **kwargs
 ):
     """
@@ -182,18 +248,32 @@ def cluster_transaction_descriptions_with_amounts_split_pytorch(
       credit_column (str): Name of the credit amount column.
       num_clusters (list or tuple): A two-element list/tuple where the first element is the number of clusters
                                     for the debit subset, and the second is for the credit subset.
+                                    An entry (or the whole argument) may be "auto" to choose it per statement
+                                    with analyzer.kmeans.select_num_clusters.
       amount_scale (float): Scaling factor for the numeric amount.
       model_name (str): The name of the pretrained model.
+      embedding_batch_size (int): Number of descriptions embedded per forward pass.
+      use_embedding_cache (bool): Reuse cached embeddings for descriptions seen before.
+      kmeans_seed (int): Seed for k-means; None for a different clustering on every run.
+      kmeans_n_init (int): Number of k-means++ restarts.
+      kmeans_mini_batch (bool): Force mini-batch k-means on or off; None decides by subset size.
+      auto_k_max (int): Largest cluster count tried for "auto".
+      auto_k_method (str): "silhouette" or "elbow".
+      auto_k_time_budget (float): Seconds spent choosing each "auto" cluster count.
     
     Returns:
       pd.DataFrame: The original DataFrame with an added 'Cluster' column for clustered transactions.
                   Rows that have neither debit nor credit remain unclustered.
     """
+    if num_clusters == "auto":
+        num_clusters = ["auto", "auto"]
+
     # Define a helper function to cluster a given subset
     def cluster_subset(sub_df, n_clusters):
         # Ensure text descriptions are available.
         texts = sub_df[text_column].fillna("").tolist()
-        text_embeddings = get_embeddings(texts, model_name=embedding_model_name)  # shape: (N, D)
+        embed = get_cached_embeddings if use_embedding_cache else get_embeddings
+        text_embeddings = embed(texts, model_name=embedding_model_name, batch_size=embedding_batch_size)  # shape: (N, D)
         
         # Extract the numeric amount for each row.
         amounts = sub_df.apply(lambda row: _get_amount(row, debit_column, credit_column), axis=1)
@@ -203,8 +283,13 @@ def cluster_transaction_descriptions_with_amounts_split_pytorch(
         # Concatenate text embeddings and amounts into a combined feature vector.
         combined_features = torch.cat([text_embeddings, amounts], dim=1)  # shape: (N, D+1)
         
+        if n_clusters == "auto":
+            n_clusters, _ = kmeans.select_num_clusters(combined_features, k_max=auto_k_max, method=auto_k_method,
+                                                       time_budget=auto_k_time_budget, seed=kmeans_seed)
+        
         # Run k-means clustering on the combined features.
-        cluster_ids, _ = kmeans_torch(combined_features, num_clusters=n_clusters)
+        cluster_ids, _, _ = kmeans.kmeans(combined_features, n_clusters, n_init=kmeans_n_init, seed=kmeans_seed,
+                                          mini_batch=kmeans_mini_batch)
         
         # Assign cluster labels to the subset.
         sub_df = sub_df.copy()
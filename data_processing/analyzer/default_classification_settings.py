@@ -1,9 +1,41 @@
+import os
+
+DEFAULT_APPLICANT_STORE_PATH = os.environ.get(
+    "APPLICANT_STORE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "lending_insights", "applicants.sqlite3"))
+DEFAULT_AUTO_K_MAX = 12  # largest cluster count tried when num_clusters is "auto"
+DEFAULT_AUTO_K_METHOD = "silhouette"  # or "elbow"
+DEFAULT_AUTO_K_SAMPLE_SIZE = 1000  # rows used to score candidate cluster counts
+DEFAULT_AUTO_K_TIME_BUDGET = 2.0  # seconds per subset; the best k found so far is used when it runs out
+DEFAULT_CASCADE_EMBEDDING_THRESHOLD = 0.5  # cosine similarity the cascade's embedding tier needs to label a row
+DEFAULT_CASCADE_RULE_THRESHOLD = 0.8  # rule/merchant confidence the cascade's first tier needs to label a row
+DEFAULT_CATEGORY_RULES_PATH = os.environ.get(
+    "CATEGORY_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_rules.json"))
 DEFAULT_CLASSIFICATION_MODEL = "valhalla/distilbart-mnli-12-3"
 DEFAULT_CANDIDATE_LABELS = ["Rent", "Salary", "Utilities", "Bill payment", "Transfer", "Entertainment", "Food", "Medical", "Other Bills", "Other"]
+DEFAULT_CLUSTER_SAMPLE_FREQUENT = 4  # most frequent descriptions sampled per cluster for zero-shot labeling
+DEFAULT_CLUSTER_SAMPLE_NEAREST = 8  # descriptions nearest the cluster centroid sampled per cluster
+DEFAULT_CLUSTER_TOKEN_BUDGET = 128  # tokens of sampled text per cluster
 DEFAULT_CONTEXT = 'These are bank transaction statements: '
+DEFAULT_HYPOTHESIS_TEMPLATE = "This bank transaction is about {}."
 DEFAULT_DISCRETIONARY_CATEGORIES = {"Food", "Medical", "Entertainment"}
 DEFAULT_EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+DEFAULT_EMBEDDING_BATCH_SIZE = 64
+DEFAULT_EMBEDDING_CACHE_DIR = os.environ.get(
+    "EMBEDDING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "lending_insights", "embeddings"))
+DEFAULT_EMBEDDING_CACHE_SIZE = 20000  # descriptions kept in the in-memory tier
+DEFAULT_LABEL_CACHE_PATH = os.environ.get(
+    "LABEL_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "lending_insights", "labels.sqlite3"))
 DEFAULT_ESSENTIAL_CATEGORIES = {"Rent", "Utilities", "Bill Payment"}
+DEFAULT_KMEANS_MAX_ITER = 100
+DEFAULT_KMEANS_MINIBATCH_SIZE = 1024
+DEFAULT_KMEANS_MINIBATCH_THRESHOLD = 10000  # subsets with more rows use mini-batch k-means
+DEFAULT_KMEANS_N_INIT = 4  # k-means++ restarts; the lowest-inertia run wins
+DEFAULT_KMEANS_SEED = 0  # None for a different clustering on every run
+DEFAULT_KEYWORD_RULE_CONFIDENCE = 0.9  # confidence of a keyword rule match when the rule does not set one
+DEFAULT_MERCHANT_DICTIONARY_PATH = os.environ.get("MERCHANT_DICTIONARY_PATH") or None  # CSV of pattern,category,confidence; None disables merchant matching
+DEFAULT_MERCHANT_MIN_CONFIDENCE = 0.5  # matches below this fall through to the classifiers
+DEFAULT_MAX_RESIDENT_MODELS = 3  # models kept loaded by analyzer.model_registry
+DEFAULT_ZERO_SHOT_BATCH_SIZE = 32  # premise/hypothesis pairs per NLI forward pass
 
 DEFAULT_METRICS_DICTIONARY = {
     "balance_increase": 20,   # if ending_balance >= starting_balance
@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import fcntl
+import hashlib
+import threading
+import warnings
+from collections import OrderedDict
+import numpy as np
+import analyzer.default_classification_settings as default_classification_settings
+
+DEFAULT_EMBEDDING_CACHE_DIR = default_classification_settings.DEFAULT_EMBEDDING_CACHE_DIR
+DEFAULT_EMBEDDING_CACHE_SIZE = default_classification_settings.DEFAULT_EMBEDDING_CACHE_SIZE
+
+
+def normalize_description(text):
+    """
+    Lowercases a description and collapses whitespace so that trivially different
+    copies of the same description share one cache entry.
+    """
+    if not isinstance(text, str):
+        text = "" if text is None else str(text)
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def _hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    """
+    On-disk embeddings for one model: a float16 matrix in vectors.f16 (read through a
+    memory map) plus index.json mapping description hashes to rows. Writers append under
+    an exclusive file lock, so several worker processes can share one directory.
+    """
+    def __init__(self, model_dir):
+        self.model_dir = model_dir
+        self.vectors_path = os.path.join(model_dir, "vectors.f16")
+        self.index_path = os.path.join(model_dir, "index.json")
+        self.lock_path = os.path.join(model_dir, ".lock")
+        self.rows = {}
+        self.dim = None
+        self.matrix = None
+        self._index_stamp = None
+
+    def _index_changed(self):
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) != self._index_stamp
+
+    def load(self):
+        try:
+            stat = os.stat(self.index_path)
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        self.dim = index["dim"]
+        self.rows = index["rows"]
+        self._index_stamp = (stat.st_mtime_ns, stat.st_size)
+        if self.rows:
+            self.matrix = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(len(self.rows), self.dim))
+        else:
+            self.matrix = None
+
+    def lookup(self, hashes):
+        # Another process may have appended since we last read the index.
+        if any(h not in self.rows for h in hashes) and self._index_changed():
+            self.load()
+        found = {}
+        for h in hashes:
+            row = self.rows.get(h)
+            if row is not None:
+                found[h] = np.asarray(self.matrix[row], dtype=np.float32)
+        return found
+
+    def append(self, hashes, vectors):
+        os.makedirs(self.model_dir, exist_ok=True)
+        with open(self.lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.load()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            new = [(h, v) for h, v in zip(hashes, vectors) if h not in self.rows]
+            if not new:
+                return
+            n_rows = len(self.rows)
+            with open(self.vectors_path, "ab") as f:
+                # Drop any rows written by an interrupted append that never made it into the index.
+                f.truncate(n_rows * self.dim * 2)
+                f.write(np.stack([v for _, v in new]).astype(np.float16).tobytes())
+            rows = dict(self.rows)
+            for offset, (h, _) in enumerate(new):
+                rows[h] = n_rows + offset
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"dim": self.dim, "rows": rows}, f)
+            os.replace(tmp_path, self.index_path)
+            self.load()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of description embeddings keyed on (model name, normalized description).
+
+    The memory tier is an LRU of at most memory_size vectors. The disk tier persists across
+    runs under cache_dir, one subdirectory per model. Pass cache_dir=None for memory only.
+    Vectors are stored at float16 precision in both tiers so cached and fresh results match.
+
+    Parameters:
+      cache_dir (str): Directory for the on-disk tier, or None.
+      memory_size (int): Maximum number of vectors in the in-memory tier.
+    """
+    def __init__(self, cache_dir=DEFAULT_EMBEDDING_CACHE_DIR, memory_size=DEFAULT_EMBEDDING_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._disk = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_tier(self, model_name):
+        if self.cache_dir is None:
+            return None
+        if model_name not in self._disk:
+            tier = _DiskTier(os.path.join(self.cache_dir, _hash(model_name)[:16]))
+            tier.load()
+            self._disk[model_name] = tier
+        return self._disk[model_name]
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model_name, texts):
+        """
+        Looks up normalized descriptions. Returns a dict text -> np.ndarray (float32) of the hits.
+        """
+        found = {}
+        with self._lock:
+            remaining = []
+            for text in texts:
+                key = (model_name, text)
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[text] = self._memory[key]
+                else:
+                    remaining.append(text)
+
+            disk = self._disk_tier(model_name)
+            if remaining and disk is not None:
+                hashes = {_hash(text): text for text in remaining}
+                for h, vector in disk.lookup(list(hashes)).items():
+                    text = hashes[h]
+                    self._remember((model_name, text), vector)
+                    found[text] = vector
+
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, model_name, texts, vectors):
+        """
+        Stores embeddings for normalized descriptions in both tiers.
+        Returns the vectors as stored (rounded to float16 precision).
+        """
+        vectors = np.asarray(vectors, dtype=np.float16).astype(np.float32)
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._remember((model_name, text), vector)
+            disk = self._disk_tier(model_name)
+            if disk is not None and len(texts):
+                try:
+                    disk.append([_hash(text) for text in texts], vectors)
+                except OSError as e:
+                    warnings.warn(f"Embedding cache disk tier disabled: {e}")
+                    self.cache_dir = None
+        return vectors
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+_default_cache = None
+
+def get_default_cache():
+    """
+    Returns the process-wide embedding cache, creating it on first use.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = EmbeddingCache()
+    return _default_cache
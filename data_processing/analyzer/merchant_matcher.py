@@ -0,0 +1,207 @@
+import os
+import re
+import csv
+from collections import deque
+import numpy as np
+import pandas as pd
+import analyzer.default_classification_settings as default_classification_settings
+
+DEFAULT_MERCHANT_DICTIONARY_PATH = default_classification_settings.DEFAULT_MERCHANT_DICTIONARY_PATH
+DEFAULT_MERCHANT_MIN_CONFIDENCE = default_classification_settings.DEFAULT_MERCHANT_MIN_CONFIDENCE
+
+_matchers = {}
+
+
+def normalize_merchant_text(text):
+    """
+    Lowercases a description or merchant pattern, turns every run of punctuation and
+    whitespace into one space and pads the result with a space on each side, so that
+    patterns only match whole words.
+    """
+    if not isinstance(text, str):
+        text = "" if text is None else str(text)
+    return " " + re.sub(r"[\W_]+", " ", text.lower()).strip() + " "
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over characters. Finds every occurrence of every pattern in a
+    text in one pass, whatever the number of patterns.
+
+    iter() yields (end_index, value) like pyahocorasick's Automaton.iter, which
+    MerchantMatcher uses instead when it is installed.
+    """
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+
+    def add_word(self, pattern, value):
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append(value)
+
+    def make_automaton(self):
+        # Breadth-first, so each state's failure link is final before its children need it.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+                queue.append(child)
+
+    def iter(self, text):
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for index, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for value in outputs[state]:
+                yield index, value
+
+
+def _new_automaton():
+    try:
+        import ahocorasick  # Optional C implementation (pyahocorasick); same interface.
+    except ImportError:
+        return AhoCorasick()
+    return ahocorasick.Automaton()
+
+
+class MerchantMatcher:
+    """
+    Row-level categorization from a dictionary of known merchant or keyword patterns,
+    compiled into an Aho-Corasick automaton.
+
+    A description may contain several patterns. Matches inside a longer match are ignored
+    (" uber eats " wins over " uber "). The remaining matches vote for their category with
+    confidence x pattern length. The winning category's confidence is its best pattern's
+    confidence, scaled by its share of the votes, so conflicting matches lower it.
+
+    Parameters:
+      entries (list): (pattern, category, confidence) tuples; confidence in [0, 1].
+    """
+    def __init__(self, entries):
+        self.patterns = []
+        self.categories = []
+        self.confidences = []
+        self._automaton = _new_automaton()
+        seen = {}
+        for pattern, category, confidence in entries:
+            pattern = normalize_merchant_text(pattern)
+            if pattern.strip() == "":
+                continue
+            if pattern in seen:
+                # pyahocorasick keeps one value per pattern; the first entry wins.
+                continue
+            seen[pattern] = len(self.patterns)
+            self.patterns.append(pattern)
+            self.categories.append(category)
+            self.confidences.append(float(confidence))
+        for index, pattern in enumerate(self.patterns):
+            self._automaton.add_word(pattern, index)
+        if self.patterns:
+            self._automaton.make_automaton()
+
+    @classmethod
+    def from_csv(cls, path):
+        """
+        Loads a merchant dictionary from a CSV file with a header row and the columns
+        pattern, category and (optionally) confidence, which defaults to 1.0.
+        """
+        with open(path, newline="") as f:
+            entries = [(row["pattern"], row["category"], row.get("confidence") or 1.0) for row in csv.DictReader(f)]
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def _resolve(self, matches):
+        # matches: (start, end, entry index) of one description.
+        kept = [m for m in matches
+                if not any(o[0] <= m[0] and m[1] <= o[1] and (o[1] - o[0]) > (m[1] - m[0]) for o in matches)]
+        votes = {}
+        best = {}
+        for start, end, index in kept:
+            category = self.categories[index]
+            votes[category] = votes.get(category, 0.0) + self.confidences[index] * (end - start)
+            best[category] = max(best.get(category, 0.0), self.confidences[index])
+        total = sum(votes.values())
+        category = max(votes, key=votes.get)
+        share = votes[category] / total if total > 0 else 1.0
+        return category, best[category] * share
+
+    def match(self, texts):
+        """
+        Matches descriptions against the dictionary. Distinct descriptions are joined and
+        scanned in one pass over the automaton.
+
+        Parameters:
+          texts (iterable of str): The transaction descriptions.
+
+        Returns:
+          tuple: (pd.Series of categories, None where nothing matched; pd.Series of
+                 confidences, 0.0 where nothing matched), in the order of texts.
+        """
+        codes, distinct = pd.factorize(pd.Series([normalize_merchant_text(text) for text in texts], dtype=object))
+        categories = np.full(len(distinct), None, dtype=object)
+        confidences = np.zeros(len(distinct))
+        if len(distinct) and self.patterns:
+            # Patterns start and end with a space, so none can span the newline separators.
+            joined = "\n".join(distinct)
+            starts = np.cumsum([0] + [len(text) + 1 for text in distinct[:-1]])
+            found = list(self._automaton.iter(joined))
+            rows = np.searchsorted(starts, [end for end, _ in found], side="right") - 1
+            matches = {}
+            for row, (end, index) in zip(rows.tolist(), found):
+                matches.setdefault(row, []).append((end - len(self.patterns[index]) + 1, end, index))
+            for row, row_matches in matches.items():
+                categories[row], confidences[row] = self._resolve(row_matches)
+        return pd.Series(categories[codes], dtype=object), pd.Series(confidences[codes])
+
+
+def get_matcher(merchant_dictionary=DEFAULT_MERCHANT_DICTIONARY_PATH):
+    """
+    Returns a MerchantMatcher for merchant_dictionary: a MerchantMatcher (returned as is) or
+    the path of a CSV dictionary, compiled once per process and again when the file changes.
+    """
+    if isinstance(merchant_dictionary, MerchantMatcher):
+        return merchant_dictionary
+    stamp = os.stat(merchant_dictionary).st_mtime_ns
+    cached = _matchers.get(merchant_dictionary)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, MerchantMatcher.from_csv(merchant_dictionary))
+        _matchers[merchant_dictionary] = cached
+    return cached[1]
+
+def categorize_by_merchant(df, text_column="Transaction Description", debit_column="Debit", credit_column="Credit",
+                           merchant_dictionary=DEFAULT_MERCHANT_DICTIONARY_PATH, min_confidence=DEFAULT_MERCHANT_MIN_CONFIDENCE):
+    """
+    Categorizes the rows whose description matches the merchant dictionary with at least
+    min_confidence. Rows with neither debit nor credit are never matched.
+
+    Returns:
+      tuple: (pd.Series of categories with None for unmatched rows, pd.Series of
+             confidences), both indexed like df.
+    """
+    matcher = get_matcher(merchant_dictionary)
+    categories, confidences = matcher.match(df[text_column].tolist())
+    categories.index = df.index
+    confidences.index = df.index
+    has_amount = df[debit_column].notnull() | df[credit_column].notnull()
+    unmatched = categories.isnull() | (confidences < min_confidence) | ~has_amount
+    categories[unmatched] = None
+    return categories, confidences
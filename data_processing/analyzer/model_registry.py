@@ -0,0 +1,164 @@
+import time
+import weakref
+import threading
+from collections import OrderedDict
+import torch
+from transformers import AutoTokenizer, AutoModel, pipeline
+import analyzer.default_classification_settings as default_classification_settings
+
+DEFAULT_EMBEDDING_MODEL = default_classification_settings.DEFAULT_EMBEDDING_MODEL
+DEFAULT_CLASSIFICATION_MODEL = default_classification_settings.DEFAULT_CLASSIFICATION_MODEL
+DEFAULT_MAX_RESIDENT_MODELS = default_classification_settings.DEFAULT_MAX_RESIDENT_MODELS
+
+EMBEDDING = "embedding"
+ZERO_SHOT = "zero-shot-classification"
+
+
+def resolve_device(device=None):
+    """
+    Returns the device name to load a model on: 'cuda' if available, otherwise 'cpu'.
+    An explicitly provided device is passed through as a string.
+    """
+    if device is None:
+        return 'cuda' if torch.cuda.is_available() else 'cpu'
+    return str(device)
+
+def _load_embedding_model(model_name, device):
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).to(device)
+    model.eval()
+    return tokenizer, model
+
+def _load_zero_shot_classifier(model_name, device):
+    return pipeline("zero-shot-classification", model=model_name, device=device)
+
+DEFAULT_LOADERS = {
+    EMBEDDING: _load_embedding_model,
+    ZERO_SHOT: _load_zero_shot_classifier,
+}
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models, keyed by (kind, model name, device).
+
+    Models are loaded lazily on first request and kept resident afterwards. When more than
+    max_models are loaded, the least recently used one is dropped.
+
+    Parameters:
+      max_models (int): Maximum number of models kept in memory at once.
+      loaders (dict): Maps a model kind to a function (model_name, device) -> loaded model.
+    """
+    def __init__(self, max_models=DEFAULT_MAX_RESIDENT_MODELS, loaders=None):
+        self.max_models = max_models
+        self.loaders = dict(DEFAULT_LOADERS if loaders is None else loaders)
+        self._models = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "load_seconds": {}}
+
+    def get(self, kind, model_name, device=None):
+        """
+        Returns the model of the given kind, loading it if it is not resident yet.
+        """
+        if kind not in self.loaders:
+            raise ValueError(f"Unknown model kind: {kind}")
+        key = (kind, model_name, resolve_device(device))
+        with self._lock:
+            if key in self._models:
+                self._stats["hits"] += 1
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            self._stats["misses"] += 1
+            start = time.perf_counter()
+            model = self.loaders[kind](model_name, key[2])
+            self._stats["load_seconds"][key] = time.perf_counter() - start
+
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+                self._stats["evictions"] += 1
+            return model
+
+    def warm_up(self, specs):
+        """
+        Loads models ahead of time.
+
+        Parameters:
+          specs (list): Tuples of (kind, model_name) or (kind, model_name, device).
+        """
+        for spec in specs:
+            self.get(*spec)
+
+    def resident(self):
+        """
+        Returns the keys of the loaded models, least recently used first.
+        """
+        with self._lock:
+            return list(self._models.keys())
+
+    def stats(self):
+        """
+        Returns a snapshot of the hit/miss/eviction counters and per-model load times in seconds.
+        """
+        with self._lock:
+            return {
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "evictions": self._stats["evictions"],
+                "load_seconds": dict(self._stats["load_seconds"]),
+                "resident": len(self._models),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+_registry = ModelRegistry()
+
+def get_registry():
+    return _registry
+
+def get_embedding_model(model_name=DEFAULT_EMBEDDING_MODEL, device=None):
+    """
+    Returns the (tokenizer, model) pair for a sentence-embedding model.
+    """
+    return _registry.get(EMBEDDING, model_name, device)
+
+def get_zero_shot_classifier(model_name=DEFAULT_CLASSIFICATION_MODEL, device=None):
+    """
+    Returns a zero-shot-classification pipeline for the given model.
+    """
+    return _registry.get(ZERO_SHOT, model_name, device)
+
+def warm_up(embedding_model_name=DEFAULT_EMBEDDING_MODEL, classification_model_name=DEFAULT_CLASSIFICATION_MODEL, device=None):
+    """
+    Loads the default embedding and zero-shot models so that the first statement does not pay for it.
+    Either model can be skipped by passing None.
+    """
+    specs = []
+    if embedding_model_name is not None:
+        specs.append((EMBEDDING, embedding_model_name, device))
+    if classification_model_name is not None:
+        specs.append((ZERO_SHOT, classification_model_name, device))
+    _registry.warm_up(specs)
+
+def get_stats():
+    return _registry.stats()
+
+_tokenizer_locks = weakref.WeakKeyDictionary()
+_tokenizer_locks_guard = threading.Lock()
+
+def tokenize(tokenizer, *args, **kwargs):
+    """
+    Calls tokenizer(*args, **kwargs) while holding a lock for that tokenizer. Fast tokenizers
+    change their padding and truncation settings on every call, so a tokenizer shared by
+    several threads must not be called concurrently.
+    """
+    with _tokenizer_locks_guard:
+        lock = _tokenizer_locks.get(tokenizer)
+        if lock is None:
+            lock = _tokenizer_locks[tokenizer] = threading.Lock()
+    with lock:
+        return tokenizer(*args, **kwargs)
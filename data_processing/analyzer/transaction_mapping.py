@@ -3,6 +3,15 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from collections import Counter
 import numpy as np
 import re
+import os
+import json
+import analyzer.default_classification_settings as default_classification_settings
+
+DEFAULT_CATEGORY_RULES_PATH = default_classification_settings.DEFAULT_CATEGORY_RULES_PATH
+DEFAULT_KEYWORD_RULE_CONFIDENCE = default_classification_settings.DEFAULT_KEYWORD_RULE_CONFIDENCE
+DEFAULT_RULE_CATEGORY = "Other"
+
+_keyword_tables = {}
 
 def preprocess_text(text):
     """
@@ -29,50 +38,183 @@ def get_cluster_keywords(df, cluster_label, text_column="Transaction Description
     # Return the top_n most common words.
     return [word for word, count in word_counts.most_common(top_n)]
 
-def map_cluster_to_category(keywords):
+def load_category_rules(path=DEFAULT_CATEGORY_RULES_PATH):
+    """
+    Loads category rules from a JSON file: a list of {"category": ..., "keywords": [...]}
+    objects in priority order (the first rule with a matching keyword wins). A rule may
+    also give the "confidence" of its matches (default DEFAULT_KEYWORD_RULE_CONFIDENCE).
+    """
+    with open(path, "r") as f:
+        return json.load(f)
+
+def compile_category_rules(rules):
+    """
+    Compiles rules into a single keyword -> (priority, category, confidence) lookup, where
+    priority is the position of the rule. A keyword listed under several rules keeps its
+    first one. Keywords are single words, preprocessed like the descriptions they are
+    matched against.
+    """
+    table = {}
+    for priority, rule in enumerate(rules):
+        confidence = float(rule.get("confidence", DEFAULT_KEYWORD_RULE_CONFIDENCE))
+        for keyword in rule["keywords"]:
+            table.setdefault(preprocess_text(keyword), (priority, rule["category"], confidence))
+    return table
+
+def get_keyword_table(rules=None):
+    """
+    Returns the compiled keyword lookup for rules: a list of rules, a path to a rules file,
+    or None for the default rules file. Files are compiled once and again only when they change.
+    """
+    if rules is not None and not isinstance(rules, str):
+        return compile_category_rules(rules)
+    path = rules or DEFAULT_CATEGORY_RULES_PATH
+    stamp = os.stat(path).st_mtime_ns
+    cached = _keyword_tables.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, compile_category_rules(load_category_rules(path)))
+        _keyword_tables[path] = cached
+    return cached[1]
+
+def tokenize_descriptions(texts):
+    """
+    Tokenizes descriptions the way preprocess_text does, in one vectorized pass over the
+    distinct descriptions only.
+
+    Returns:
+      tuple: (codes, tokens) where codes gives, for each input position, the index of its
+             distinct description (-1 for missing ones), and tokens is a Series with one
+             row per token, indexed by distinct description.
+    """
+    codes, uniques = pd.factorize(pd.Series(np.asarray(texts, dtype=object)), use_na_sentinel=True)
+    uniques = pd.Series(np.asarray(uniques, dtype=object)).astype(str)
+    tokens = uniques.str.lower().str.replace(r'[^\w\s]', '', regex=True).str.split().explode()
+    return codes, tokens.dropna()
+
+def _best_priorities(keys, words, table):
+    # Priority of the highest-priority rule matched by any of each key's words.
+    priorities = pd.Series(words).map({word: priority for word, (priority, _, _) in table.items()})
+    matched = priorities.notnull().values
+    best = pd.Series(priorities.values[matched]).groupby(np.asarray(keys)[matched]).min()
+    return {key: int(priority) for key, priority in best.items()}
+
+def _best_categories(keys, words, table, default):
+    # Highest-priority category per key among its words, or default when none matches.
+    categories = {priority: category for priority, category, _ in table.values()}
+    return {key: categories.get(priority, default) for key, priority in _best_priorities(keys, words, table).items()}
+
+def get_all_cluster_keywords(df, text_column="Transaction Description", top_n=10):
+    """
+    Same as calling get_cluster_keywords for every cluster, in a single pass: distinct
+    descriptions are tokenized once and term counts come from one groupby over
+    (cluster, word), weighted by how often each description occurs in the cluster.
+
+    Returns:
+      pd.DataFrame: Columns 'Cluster', 'word' and 'count', at most top_n rows per cluster,
+                    most frequent first (ties in order of first appearance).
+    """
+    codes, tokens = tokenize_descriptions(df[text_column].values)
+    cluster_ids, cluster_labels = pd.factorize(df["Cluster"].values)
+    valid = (codes >= 0) & (cluster_ids >= 0)
+    if not valid.any() or tokens.empty:
+        return pd.DataFrame({"Cluster": [], "word": [], "count": []})
+    num_descriptions = codes.max() + 1
+
+    # Distinct (cluster, description) pairs with their row counts, in order of first appearance.
+    pair_codes, pairs = pd.factorize(cluster_ids[valid].astype(np.int64) * num_descriptions + codes[valid])
+    pair_counts = np.bincount(pair_codes)
+    pair_clusters, pair_descriptions = pairs // num_descriptions, pairs % num_descriptions
+
+    # Expand every pair into its description's tokens (tokens are grouped by description, in order).
+    word_ids, vocabulary = pd.factorize(tokens.values)
+    lengths = np.bincount(tokens.index.values, minlength=num_descriptions)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    repeats = lengths[pair_descriptions]
+    pair_of_token = np.repeat(np.arange(len(pairs)), repeats)
+    offset_in_description = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    words = word_ids[starts[pair_descriptions][pair_of_token] + offset_in_description]
+
+    # Term counts per (cluster, word), again in order of first appearance.
+    term_codes, terms = pd.factorize(pair_clusters[pair_of_token] * len(vocabulary) + words)
+    term_counts = np.bincount(term_codes, weights=pair_counts[pair_of_token]).astype(np.int64)
+    counts = pd.DataFrame({
+        "Cluster": cluster_labels[terms // len(vocabulary)],
+        "word": vocabulary[terms % len(vocabulary)],
+        "count": term_counts,
+    })
+    counts = counts.sort_values("count", ascending=False, kind="stable")
+    return counts.groupby("Cluster", sort=False).head(top_n).reset_index(drop=True)
+
+def map_cluster_to_category(keywords, rules=None):
     """
     Given a list of keywords from a cluster, assign a category.
-    This mapping is heuristic and can be refined over time.
-    """
-    # Example mapping rules
-    if any(word in keywords for word in ["rent", "apartment", "lease"]):
-        return "Rent"
-    elif any(word in keywords for word in ["salary", "payroll", "credited", "cred"]):
-        return "Salary"
-    elif any(word in keywords for word in ["bill", "bpay", "utility", "electricity", "water", "phone", "fone"]):
-        return "Utilities"
-    elif any(word in keywords for word in ["transfer"]):
-        return "Transfer"
-    elif any(word in keywords for word in ["food", "grocery", "groceries", "ubereats"]):
-        return "Food"
-    elif any(word in keywords for word in ["movie", "uber", "lyft", "wine", "beer", "ticket"]):
-        return "Entertainment"
-    elif any(word in keywords for word in ["doctor", "hospital", "insurance", "medical", "drug", "pharmacy"]):
-        return "Medical"
-    # You can add more rules as needed.
-    elif any(word in keywords for word in ["withdrawal", "cash", "wd"]):
-        return "Withdrawal"
-    else:
-        return "Other"
-
-def assign_categories_to_clusters(df, text_column="Transaction Description", **kwargs):
+    This mapping is heuristic and can be refined over time: the rules are read from
+    category_rules.json (see get_keyword_table) and the highest-priority rule with a
+    matching keyword wins.
+    """
+    table = get_keyword_table(rules)
+    matches = [table[word] for word in keywords if word in table]
+    return min(matches)[1] if matches else DEFAULT_RULE_CATEGORY
+
+def assign_categories_to_clusters(df, text_column="Transaction Description", category_rules=None, top_n=10, **kwargs):
     """
     For each unique cluster in the DataFrame, determine a category using the keywords
     extracted from that cluster. Then, assign the corresponding category to all rows
     in that cluster.
+
+    Keywords for all clusters come from one pass over the descriptions
+    (get_all_cluster_keywords) and are looked up in the compiled rules.
     
     Returns: A new DataFrame with a 'Category' column.
     """
     df = df.copy()
-    clusters = df["Cluster"].unique()
-    cluster_to_category = {}
-    
-    for cluster_label in clusters:
-        keywords = get_cluster_keywords(df, cluster_label, text_column=text_column, top_n=10)
-        category = map_cluster_to_category(keywords)
-        cluster_to_category[cluster_label] = category
-        #print(f"Cluster {cluster_label} keywords: {keywords} → Mapped Category: {category}")
+    table = get_keyword_table(category_rules)
+    cluster_to_category = {cluster_label: DEFAULT_RULE_CATEGORY for cluster_label in df["Cluster"].unique()}
+    keywords = get_all_cluster_keywords(df, text_column=text_column, top_n=top_n)
+    cluster_to_category.update(_best_categories(keywords["Cluster"].values, keywords["word"].values, table, DEFAULT_RULE_CATEGORY))
     
     # Create a Category column based on the mapping.
     df["Category"] = df["Cluster"].map(cluster_to_category)
     return df
+
+def classify_transactions_by_rules(df, text_column="Transaction Description", debit_column="Debit", credit_column="Credit",
+                                   category_rules=None, **kwargs):
+    """
+    Row-level rule classification without clustering: every word of a description is
+    looked up in the compiled rules and the highest-priority match wins. Use it as
+    cluster_func with assign_func=None.
+
+    Parameters:
+      df (pd.DataFrame): Input DataFrame containing at least the columns
+                         'Transaction Description', 'Debit', and 'Credit'.
+      text_column (str): Column name for transaction descriptions.
+      debit_column (str): Column name for the Debit values.
+      credit_column (str): Column name for the Credit values.
+      category_rules: Rules list, rules file path, or None for the default rules file.
+
+    Returns:
+      pd.DataFrame: The original DataFrame with an added 'Category' column. Rows without
+                    a matching keyword are 'Other'; rows with neither debit nor credit
+                    are 'Unclassified'.
+    """
+    df = df.copy()
+    categories, _ = match_transactions_by_rules(df[text_column].values, category_rules)
+    has_amount = (df[debit_column].notnull() | df[credit_column].notnull()).values
+    df["Category"] = np.where(has_amount, categories.fillna(DEFAULT_RULE_CATEGORY).values, "Unclassified")
+    return df
+
+def match_transactions_by_rules(texts, category_rules=None):
+    """
+    Looks up every word of each description in the compiled rules; the highest-priority
+    match wins.
+
+    Returns:
+      tuple: (pd.Series of categories, missing where no keyword matched; pd.Series of the
+             winning rule's confidence, 0.0 where no keyword matched), in the order of texts.
+    """
+    table = get_keyword_table(category_rules)
+    codes, tokens = tokenize_descriptions(texts)
+    priorities = pd.Series(codes).map(_best_priorities(tokens.index.values, tokens.values, table))
+    categories = priorities.map({priority: category for priority, category, _ in table.values()})
+    confidences = priorities.map({priority: confidence for priority, _, confidence in table.values()})
+    return categories, confidences.fillna(0.0).astype(float)
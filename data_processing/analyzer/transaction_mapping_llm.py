@@ -1,13 +1,27 @@
-from transformers import pipeline
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
 import analyzer.default_classification_settings as default_classification_settings
+import analyzer.model_registry as model_registry
+from .createTrainingDataset import get_cached_embeddings
+from .transaction_mapping_llm_direct import classify_zero_shot_batched
 
 DEFAULT_MODEL = default_classification_settings.DEFAULT_CLASSIFICATION_MODEL
 DEFAULT_CANDIDATE_LABELS = default_classification_settings.DEFAULT_CANDIDATE_LABELS
 DEFAULT_CONTEXT = default_classification_settings.DEFAULT_CONTEXT
+DEFAULT_EMBEDDING_MODEL = default_classification_settings.DEFAULT_EMBEDDING_MODEL
+DEFAULT_ZERO_SHOT_BATCH_SIZE = default_classification_settings.DEFAULT_ZERO_SHOT_BATCH_SIZE
+DEFAULT_CLUSTER_SAMPLE_NEAREST = default_classification_settings.DEFAULT_CLUSTER_SAMPLE_NEAREST
+DEFAULT_CLUSTER_SAMPLE_FREQUENT = default_classification_settings.DEFAULT_CLUSTER_SAMPLE_FREQUENT
+DEFAULT_CLUSTER_TOKEN_BUDGET = default_classification_settings.DEFAULT_CLUSTER_TOKEN_BUDGET
 
-# Initialize the zero-shot classifier.
+# The zero-shot pipeline's own default template, which cluster labeling has always used.
+PIPELINE_HYPOTHESIS_TEMPLATE = "This example is {}."
+
+# Get the zero-shot classifier (loaded once per process by the model registry).
 def create_classifier_pipeline(model_name = DEFAULT_MODEL):
-    classifier = pipeline("zero-shot-classification", model=DEFAULT_MODEL)
+    classifier = model_registry.get_zero_shot_classifier(model_name)
     return classifier
 
 def classify_cluster_description(description, candidate_labels, model_name = DEFAULT_MODEL):
@@ -26,33 +40,104 @@ def classify_cluster_description(description, candidate_labels, model_name = DEF
     result = classifier(description, candidate_labels, multi_label=False)
     return result["labels"][0]
 
+def select_cluster_representatives(df, text_column="Transaction Description", tokenizer=None,
+                                   embedding_model_name=DEFAULT_EMBEDDING_MODEL, nearest=DEFAULT_CLUSTER_SAMPLE_NEAREST,
+                                   frequent=DEFAULT_CLUSTER_SAMPLE_FREQUENT, token_budget=DEFAULT_CLUSTER_TOKEN_BUDGET):
+    """
+    Picks a few representative descriptions per cluster, so that the text classified for a
+    cluster stays about the same length however large the cluster is.
+
+    The candidates are the `nearest` unique descriptions closest to the cluster's mean
+    embedding, followed by its `frequent` most frequent ones. They are kept in that order
+    while they fit in token_budget tokens; the first one is always kept. Embeddings are read
+    through the embedding cache, so descriptions embedded while clustering are not run
+    through the model again.
+
+    Parameters:
+      df (pd.DataFrame): DataFrame with a 'Cluster' column.
+      text_column (str): Column with the transaction description.
+      tokenizer: Tokenizer used to measure descriptions; None counts words instead.
+      embedding_model_name (str): The sentence-embedding model used for clustering.
+      nearest (int): Descriptions taken by closeness to the centroid.
+      frequent (int): Descriptions taken by frequency.
+      token_budget (int): Maximum tokens of sampled text per cluster.
+
+    Returns:
+      dict: Cluster label -> list of representative descriptions, for every cluster in
+            df (empty for clusters without any description).
+    """
+    representatives = {cluster: [] for cluster in df["Cluster"].unique()}
+    texts = df.loc[df["Cluster"].notnull(), text_column].dropna().astype(str)
+    texts = texts[texts.str.strip() != ""]
+    if texts.empty:
+        return representatives
+
+    # Unique (cluster, description) pairs with their row counts, in order of first appearance.
+    pairs = pd.DataFrame({"Cluster": df.loc[texts.index, "Cluster"].values, "text": texts.values})
+    counts = pairs.groupby(["Cluster", "text"], sort=False).size().reset_index(name="count")
+    codes, cluster_labels = pd.factorize(counts["Cluster"])
+
+    # Count-weighted mean embedding per cluster, then each description's cosine similarity to it.
+    embeddings = F.normalize(get_cached_embeddings(counts["text"].tolist(), model_name=embedding_model_name), dim=1)
+    codes_tensor = torch.as_tensor(codes, dtype=torch.long)
+    weights = torch.tensor(counts["count"].values, dtype=torch.float32).unsqueeze(1)
+    centroids = torch.zeros(len(cluster_labels), embeddings.shape[1]).index_add_(0, codes_tensor, embeddings * weights)
+    similarity = (embeddings * F.normalize(centroids, dim=1)[codes_tensor]).sum(dim=1).numpy()
+    frequency = counts["count"].values
+
+    candidates = {}
+    for code, positions in pd.Series(np.arange(len(codes))).groupby(codes).groups.items():
+        positions = np.asarray(positions)
+        by_similarity = positions[np.argsort(-similarity[positions], kind="stable")][:nearest]
+        by_frequency = positions[np.argsort(-frequency[positions], kind="stable")][:frequent]
+        candidates[cluster_labels[code]] = list(dict.fromkeys([*by_similarity.tolist(), *by_frequency.tolist()]))
+
+    # Measure every candidate in one tokenizer call.
+    candidate_positions = sorted({p for positions in candidates.values() for p in positions})
+    candidate_texts = counts["text"].values[candidate_positions].tolist()
+    if tokenizer is not None:
+        lengths = [len(ids) for ids in model_registry.tokenize(tokenizer, candidate_texts, add_special_tokens=False)["input_ids"]]
+    else:
+        lengths = [len(text.split()) for text in candidate_texts]
+    length_of = dict(zip(candidate_positions, lengths))
+
+    for cluster, positions in candidates.items():
+        used = 0
+        for p in positions:
+            if representatives[cluster] and used + length_of[p] > token_budget:
+                continue
+            representatives[cluster].append(counts["text"].values[p])
+            used += length_of[p]
+    return representatives
+
 def assign_categories_to_clusters(df, text_column="Transaction Description", context = DEFAULT_CONTEXT,
-                                  candidate_labels = DEFAULT_CANDIDATE_LABELS, model_name = DEFAULT_MODEL, **kwargs):
+                                  candidate_labels = DEFAULT_CANDIDATE_LABELS, model_name = DEFAULT_MODEL,
+                                  embedding_model_name = DEFAULT_EMBEDDING_MODEL, zero_shot_batch_size = DEFAULT_ZERO_SHOT_BATCH_SIZE,
+                                  cluster_sample_nearest = DEFAULT_CLUSTER_SAMPLE_NEAREST,
+                                  cluster_sample_frequent = DEFAULT_CLUSTER_SAMPLE_FREQUENT,
+                                  cluster_token_budget = DEFAULT_CLUSTER_TOKEN_BUDGET, **kwargs):
     """
-    For each unique cluster in the DataFrame, determine a category using the keywords
-    extracted from that cluster. Then, assign the corresponding category to all rows
-    in that cluster.
+    For each unique cluster in the DataFrame, determine a category from a representative
+    sample of its descriptions (see select_cluster_representatives). The samples of all
+    clusters are classified together in one batched zero-shot call. Then, assign the
+    corresponding category to all rows in that cluster.
     
     Returns: A new DataFrame with a 'Category' column.
     """
-    cluster_to_category = {}
-    clusters = df["Cluster"].unique()
-    
-    for cluster_label in clusters:
-        # Aggregate the texts for the cluster.
-        cluster_texts = df[df["Cluster"] == cluster_label][text_column].dropna().tolist()
-        # Combine a representative sample into one string. 
-        aggregated_text = " ".join(cluster_texts)
-        # Classify the aggregated text.
-        if not aggregated_text:
-            category = "Other"
-        else:
-            category = classify_cluster_description(aggregated_text, candidate_labels, model_name)
-        cluster_to_category[cluster_label] = category
-        #print(f"Cluster {cluster_label} mapped to Category: {category}")
+    cluster_to_category = {cluster: "Other" for cluster in df["Cluster"].unique()}
+    if df["Cluster"].notnull().any():
+        classifier = create_classifier_pipeline(model_name = model_name)
+        representatives = select_cluster_representatives(
+            df, text_column, tokenizer=classifier.tokenizer, embedding_model_name=embedding_model_name,
+            nearest=cluster_sample_nearest, frequent=cluster_sample_frequent, token_budget=cluster_token_budget)
+        # Combine each cluster's sample into one string.
+        sampled = [(cluster, " ".join(texts)) for cluster, texts in representatives.items() if texts]
+        categories = classify_zero_shot_batched([text for _, text in sampled], candidate_labels, classifier,
+                                                hypothesis_template=PIPELINE_HYPOTHESIS_TEMPLATE,
+                                                batch_size=zero_shot_batch_size)
+        cluster_to_category.update(zip([cluster for cluster, _ in sampled], categories))
     
     # Create a new column in the DataFrame based on the cluster to category mapping.
     df = df.copy()
     df["Category"] = df["Cluster"].map(cluster_to_category)
     return df
-    
\ No newline at end of file
@@ -2,8 +2,10 @@ import pdfplumber
 import pandas as pd
 import sys
 import numpy as np
-from .extract_data_row import extract_table_from_pdf, fix_transaction_description, merge_split_rows, remove_empty_columns
+from .extract_data_row import extract_table_from_pdf, fix_transaction_description, merge_split_rows, remove_empty_columns, DEFAULT_EXTRACTION_WORKERS, DEFAULT_PAGE_CHUNK_SIZE
+from .extract_data_row import iter_table_rows_from_pdf, iter_fix_transaction_description, iter_merge_split_rows, iter_remove_empty_columns
 from .clean_data_utils import merge_dollar_cr_cells, clean_cell_dollar_cr, create_dataset
+from .clean_data_utils import iter_merge_dollar_cr_cells, iter_clean_cell_dollar_cr
 
 DEFAULT_EXTRACTION_SETTINGS = {
     "vertical_strategy": "text",    
@@ -13,7 +15,8 @@ DEFAULT_EXTRACTION_SETTINGS = {
 }
 
 
-def data_extract_and_clean_pipeline(pdf_file, extract_settings = DEFAULT_EXTRACTION_SETTINGS):
+def data_extract_and_clean_pipeline(pdf_file, extract_settings = DEFAULT_EXTRACTION_SETTINGS, workers = DEFAULT_EXTRACTION_WORKERS,
+                                    chunk_size = DEFAULT_PAGE_CHUNK_SIZE):
     """
     Runs the entire data extraction and cleaning pipeline:
       1. Extract raw data from the PDF.
@@ -27,12 +30,14 @@ def data_extract_and_clean_pipeline(pdf_file, extract_settings = DEFAULT_EXTRACT
     Parameters:
       pdf_file (str): Path to the PDF file.
       fix_transaction_description (bool): Whether to fix transaction descriptions.
+      workers (int): Number of processes used to extract pages; 1 extracts serially.
+      chunk_size (int): Number of pages per extraction task when workers > 1.
       
     Returns:
       pd.DataFrame: The final cleaned dataset.
     """
     # Step 1: Extract raw data from PDF.
-    raw_data = extract_table_from_pdf(pdf_file, extract_settings)
+    raw_data = extract_table_from_pdf(pdf_file, extract_settings, workers=workers, chunk_size=chunk_size)
     
     # Step 2: Optionally fix transaction description issues.
     
@@ -56,6 +61,27 @@ def data_extract_and_clean_pipeline(pdf_file, extract_settings = DEFAULT_EXTRACT
     return final_dataset
 
 
+def streaming_data_extract_and_clean_pipeline(pdf_file, extract_settings = DEFAULT_EXTRACTION_SETTINGS, workers = DEFAULT_EXTRACTION_WORKERS,
+                                              chunk_size = DEFAULT_PAGE_CHUNK_SIZE):
+    """
+    Same steps and output as data_extract_and_clean_pipeline, but the stages are chained
+    generators: rows flow from each PDF page through fixing, split-row merging, '$'/'CR'
+    handling, cleaning and row parsing without a full copy of the document per stage.
+    State that spans rows (a pending split row, the previous balance) carries across pages.
+
+    Removing mostly-empty columns needs counts over every row, so that step counts in a
+    first pass while spilling rows to a temporary file and projects them in a second pass.
+      
+    Returns:
+      pd.DataFrame: The final cleaned dataset.
+    """
+    raw_rows = iter_table_rows_from_pdf(pdf_file, extract_settings, workers=workers, chunk_size=chunk_size)
+    merged_rows = iter_merge_split_rows(iter_fix_transaction_description(raw_rows))
+    no_empty_cols = iter_remove_empty_columns(merged_rows, empty_threshold=0.9)
+    cleaned_rows = iter_clean_cell_dollar_cr(iter_merge_dollar_cr_cells(no_empty_cols))
+    return create_dataset(cleaned_rows)
+
+
 if __name__ == '__main__':
     arg1 = sys.argv[1]
     if arg1 == "all":
@@ -1,6 +1,9 @@
 import pdfplumber
 import pandas as pd
 import numpy as np
+import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
 
 DEFAULT_EXTRACTION_SETTINGS = {
@@ -9,35 +12,83 @@ DEFAULT_EXTRACTION_SETTINGS = {
     "intersection_tolerance": 20, 
     "snap_tolerance" : 1
 }
+DEFAULT_EXTRACTION_WORKERS = 1
+DEFAULT_PAGE_CHUNK_SIZE = 4  # pages handed to each extraction worker at a time
 
 
 
 
-def extract_table_from_pdf(pdf_path, settings = DEFAULT_EXTRACTION_SETTINGS):
+def _extract_rows_from_pages(pages, settings):
     data = []
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            # Extract table(s) from the current page. 
-            # You may need to adjust table settings depending on the PDF layout.
-            tables = page.extract_tables(table_settings=settings)
-            for table in tables:
-                for row in table:
-                    #print(row)
-                    data.append(row)
-            
-            
-            
+    for page in pages:
+        # Extract table(s) from the current page. 
+        # You may need to adjust table settings depending on the PDF layout.
+        tables = page.extract_tables(table_settings=settings)
+        for table in tables:
+            for row in table:
+                #print(row)
+                data.append(row)
+        # Release the page's parsed objects once its rows are out.
+        page.close()
     return data
 
-def merge_split_rows(table_rows):
+def _extract_page_range(pdf_path, settings, start, stop):
     """
-    Merges rows that appear to be broken-up parts of a single logical row.
-    If a row has only one non-empty element, merge that content into the previous row
-    and do not add the current row to the output dataset.
-    This version handles NoneType cells.
+    Worker entry point: opens the PDF in this process and extracts rows from pages [start, stop).
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        return _extract_rows_from_pages(pdf.pages[start:stop], settings)
+
+def iter_table_rows_from_pdf(pdf_path, settings = DEFAULT_EXTRACTION_SETTINGS, workers = DEFAULT_EXTRACTION_WORKERS,
+                             chunk_size = DEFAULT_PAGE_CHUNK_SIZE):
     """
-    merged_rows = []
+    Yields the table rows of the PDF in page order, one page at a time.
+
+    With workers > 1, the pages are split into chunks of chunk_size pages that are extracted
+    by a process pool, and the rows are yielded in page order. Documents that fit in a
+    single chunk are extracted serially.
+
+    Parameters:
+      pdf_path (str): Path to the PDF file.
+      settings (dict): pdfplumber table settings.
+      workers (int): Number of extraction processes.
+      chunk_size (int): Number of pages per task.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        num_pages = len(pdf.pages)
+        if workers <= 1 or num_pages <= chunk_size:
+            for page in pdf.pages:
+                yield from _extract_rows_from_pages([page], settings)
+            return
+
+    starts = list(range(0, num_pages, chunk_size))
+    with ProcessPoolExecutor(max_workers=min(workers, len(starts))) as executor:
+        chunks = executor.map(
+            _extract_page_range,
+            [pdf_path] * len(starts),
+            [settings] * len(starts),
+            starts,
+            [start + chunk_size for start in starts],
+        )
+        for rows in chunks:
+            yield from rows
+
+def extract_table_from_pdf(pdf_path, settings = DEFAULT_EXTRACTION_SETTINGS, workers = DEFAULT_EXTRACTION_WORKERS,
+                           chunk_size = DEFAULT_PAGE_CHUNK_SIZE):
+    """
+    Extracts all table rows from the PDF. See iter_table_rows_from_pdf for the parameters.
+
+    Returns:
+      list of list: The raw table rows.
+    """
+    return list(iter_table_rows_from_pdf(pdf_path, settings, workers=workers, chunk_size=chunk_size))
+
+def iter_merge_split_rows(table_rows):
+    """
+    Generator version of merge_split_rows. A merged row is held back until the next
+    non-continuation row arrives, so continuations are merged across page boundaries too.
+    """
+    previous_row = None
     for row in table_rows:
         # Replace None with an empty string
         
@@ -47,47 +98,154 @@ def merge_split_rows(table_rows):
         non_empty_cells = [cell for cell in row if cell.strip()]
         
         # If the row appears to be a continuation (only one non-empty cell)
-        # and there's already a previous row, merge its content and DO NOT append this row.
-        if len(non_empty_cells) == 1 and merged_rows:
+        # and there's already a previous row, merge its content and DO NOT yield this row.
+        if len(non_empty_cells) == 1 and previous_row is not None:
             for i, cell in enumerate(row):
                 if cell.strip():
-                    prev_cell = merged_rows[-1][i].strip()
-                    merged_rows[-1][i] = (prev_cell + " " if prev_cell else "") + cell.strip()
-            # Skip appending this row entirely.
+                    prev_cell = previous_row[i].strip()
+                    previous_row[i] = (prev_cell + " " if prev_cell else "") + cell.strip()
+            # Skip this row entirely.
         elif len(non_empty_cells) > 0:
-            # Otherwise, clean up the row (strip each cell) and append as a new row.
-            cleaned_row = [cell.strip() for cell in row]
-            merged_rows.append(cleaned_row)
-    return merged_rows
+            # Otherwise, the previous row is complete; clean up this row (strip each cell) and hold it.
+            if previous_row is not None:
+                yield previous_row
+            previous_row = [cell.strip() for cell in row]
+    if previous_row is not None:
+        yield previous_row
+
+def merge_split_rows(table_rows):
+    """
+    Merges rows that appear to be broken-up parts of a single logical row.
+    If a row has only one non-empty element, merge that content into the previous row
+    and do not add the current row to the output dataset.
+    This version handles NoneType cells.
+    """
+    return list(iter_merge_split_rows(table_rows))
 
 
+def count_non_empty_cells(table_rows):
+    """
+    Counts, in one pass, how many rows have a non-empty cell in each column.
+    Rows of varying lengths are handled without padding.
+    
+    Returns:
+      tuple: (number of rows, list of non-empty counts per column).
+    """
+    n_rows = 0
+    counts = []
+    for row in table_rows:
+        n_rows += 1
+        if len(row) > len(counts):
+            counts.extend([0] * (len(row) - len(counts)))
+        for col, cell in enumerate(row):
+            if cell and cell.strip():
+                counts[col] += 1
+    return n_rows, counts
+
+def _columns_to_keep(n_rows, counts, empty_threshold):
+    # Keep a column if the fraction of empty cells is below the empty_threshold.
+    return [col for col, count in enumerate(counts) if (n_rows - count) / n_rows < empty_threshold]
+
+def iter_project_columns(table_rows, columns):
+    """
+    Yields each row reduced to the given columns, treating cells past the end of a short row as empty.
+    """
+    for row in table_rows:
+        yield [row[col] if col < len(row) else "" for col in columns]
+
 def remove_empty_columns(table_rows, empty_threshold=0.9):
     """
     Removes columns that are empty in at least `empty_threshold` fraction of rows.
-    Handles rows with varying lengths by first padding shorter rows with empty strings.
+    Handles rows with varying lengths by treating missing trailing cells as empty.
     """
-    # Determine maximum row length
-    max_length = max(len(row) for row in table_rows)
-    
-    # Pad rows that are shorter than max_length
-    padded_rows = [row + [""] * (max_length - len(row)) for row in table_rows]
-    
-    # Convert to numpy array for easier column-wise operations
-    arr = np.array(padded_rows, dtype=object)
-    n_rows = arr.shape[0]
-    
-    # Determine which columns to keep
-    columns_to_keep = []
-    for col in range(arr.shape[1]):
-        # Count empty cells after stripping whitespace in this column
-        empty_count = sum(1 for cell in arr[:, col] if not (cell and cell.strip()))
-        # If the fraction of empty cells is below the empty_threshold, keep the column
-        if empty_count / n_rows < empty_threshold:
-            columns_to_keep.append(col)
+    n_rows, counts = count_non_empty_cells(table_rows)
+    if n_rows == 0:
+        return []
+    columns_to_keep = _columns_to_keep(n_rows, counts, empty_threshold)
     
     # Reconstruct the table using only the columns to keep
-    cleaned_table = [[row[col] for col in columns_to_keep] for row in padded_rows]
-    return cleaned_table
+    return list(iter_project_columns(table_rows, columns_to_keep))
+
+def iter_remove_empty_columns(table_rows, empty_threshold=0.9):
+    """
+    Streaming version of remove_empty_columns. The first pass counts non-empty cells per
+    column while spilling rows to a temporary file; the second pass reads the rows back
+    one at a time and projects them onto the kept columns, so memory stays at one row.
+    """
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as spill:
+        def spilled(rows):
+            for row in rows:
+                spill.write(json.dumps(row) + "\n")
+                yield row
+
+        n_rows, counts = count_non_empty_cells(spilled(table_rows))
+        if n_rows == 0:
+            return
+        columns_to_keep = _columns_to_keep(n_rows, counts, empty_threshold)
+
+        spill.seek(0)
+        yield from iter_project_columns((json.loads(line) for line in spill), columns_to_keep)
+
+def _split_description_groups(cell):
+    """
+    Splits a long description into groups, each ending right after its second newline.
+    Any remaining text forms the final group.
+    """
+    groups = []
+    current_group = ""
+    newline_count = 0
+    for ch in cell:
+        current_group += ch
+        if ch == "\n":
+            newline_count += 1
+            if newline_count == 2:
+                groups.append(current_group)
+                current_group = ""
+                newline_count = 0
+    # Append any remaining text as the final group (if not empty).
+    if current_group:
+        groups.append(current_group)
+    return groups
+
+def iter_fix_transaction_description(rows):
+    """
+    Generator version of fix_transaction_description. Rows following a long description
+    are buffered only until the next row with a non-empty column 2, so the lookahead can
+    span page boundaries without holding the whole document.
+    """
+    end = object()
+    rows = iter(rows)
+    row = next(rows, end)
+    while row is not end:
+        # Normalize the entry in column 2 for the current row.
+        cell = row[1] if row[1] is not None else ""
+        cell = cell.strip()
+        # Check if there are more than 2 newline characters.
+        if cell.count("\n") > 2:
+            # Collect the following rows that have an empty entry in column 2.
+            rows_to_fix = []
+            next_row = next(rows, end)
+            while next_row is not end and (next_row[1] is None or next_row[1].strip() == ""):
+                rows_to_fix.append(next_row)
+                next_row = next(rows, end)
+
+            groups = _split_description_groups(cell)
+
+            # Keep the first grouping in the original row.
+            # Then, assign the next groupings (up to the number of rows to fix) to the subsequent rows.
+            if groups:
+                row[1] = groups[0]
+                for k in range(1, min(len(rows_to_fix) + 1, len(groups))):
+                    rows_to_fix[k - 1][1] = groups[k]
+            # If there are more groups than rows to fix, you can decide whether to merge them
+            # into the original row (after a separator) or ignore them.
+
+            yield row
+            yield from rows_to_fix
+            row = next_row
+        else:
+            yield row
+            row = next(rows, end)
 
 # ----- Example usage -----
 def fix_transaction_description(rows):
@@ -105,52 +263,5 @@ def fix_transaction_description(rows):
     
     Returns a new list of rows with the fixed descriptions.
     """
-    fixed_rows = list(rows)  # shallow copy is enough if inner lists are replaced
-    num_rows = len(fixed_rows)
-    i = 0
-    while i < num_rows:
-        # Normalize the entry in column 2 for the current row.
-        cell = fixed_rows[i][1] if fixed_rows[i][1] is not None else ""
-        cell = cell.strip()
-        # Check if there are more than 2 newline characters.
-        if cell.count("\n") > 2:
-            # Count how many following rows have an empty entry in column 2.
-            num_transactions_to_fix = 0
-            j = i + 1
-            while j < num_rows and (fixed_rows[j][1] is None or fixed_rows[j][1].strip() == ""):
-                num_transactions_to_fix += 1
-                j += 1
-
-            # Split the long text from cell into groups.
-            # We will iterate over the characters and break as soon as we see the second newline.
-            groups = []
-            current_group = ""
-            newline_count = 0
-            for ch in cell:
-                current_group += ch
-                if ch == "\n":
-                    newline_count += 1
-                    if newline_count == 2:
-                        groups.append(current_group)
-                        current_group = ""
-                        newline_count = 0
-            # Append any remaining text as the final group (if not empty).
-            if current_group:
-                groups.append(current_group)
-
-            # Keep the first grouping in the original row.
-            # Then, assign the next groupings (up to num_transactions_to_fix) to the subsequent rows.
-            if groups:
-                fixed_rows[i][1] = groups[0]
-                for k in range(1, min(num_transactions_to_fix + 1, len(groups))):
-                    fix_row_index = i + k
-                    fixed_rows[fix_row_index][1] = groups[k]
-            # If there are more groups than rows to fix, you can decide whether to merge them
-            # into the original row (after a separator) or ignore them.
-            
-            # Skip ahead past the rows we just processed.
-            i = j
-        else:
-            i += 1
-    return fixed_rows
+    return list(iter_fix_transaction_description(rows))
 
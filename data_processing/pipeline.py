@@ -1,29 +1,212 @@
 import pandas as pd
+import os
 import sys
 import json
+import math
 from data_parser import extract_data
-from analyzer import classification, metrics, createTrainingDataset, transaction_mapping, transaction_mapping_llm, transaction_mapping_llm_direct
+from analyzer import classification, metrics, createTrainingDataset, transaction_mapping, transaction_mapping_llm, transaction_mapping_llm_direct, model_registry, applicant_store
 
-def document_to_loan_evaluation_pipeline(
-    pdf_file, 
+COLUMNAR_FORMATS = ("arrow", "parquet")
+
+def evaluate_document(
+    pdf_file,
     cluster_func=createTrainingDataset.cluster_transaction_descriptions_with_amounts_split_pytorch,
-    assign_func=transaction_mapping_llm.assign_categories_to_clusters
+    assign_func=transaction_mapping_llm.assign_categories_to_clusters,
+    applicant_id=None,
+    store=None,
+    output_format="json",
+    transactions_path=None
 ):
-    extract_df = extract_data.data_extract_and_clean_pipeline(pdf_file)
-    labeled_df = classification.classification_pipeline(extract_df, cluster_func=cluster_func, assign_func=assign_func)
-    metrics_dict = metrics.aggregate_metrics(labeled_df)
+    """
+    Runs extraction, classification and scoring on one PDF and returns the result dict
+    (transactions, metrics, loan_eligibility_score, message).
+
+    With output_format "arrow" or "parquet" the transaction table is written to
+    transactions_path (a file or a named pipe) in that columnar format instead, and the
+    result is a small envelope: transactions_path, transactions_format and
+    transaction_count take the place of the transactions.
+
+    With an applicant_id the PDF is treated as one more statement of that applicant: only
+    its rows are extracted and classified (a statement seen before is not processed again),
+    they are added to the applicant store, and the metrics and score cover all of the
+    applicant's statements, merged from the stored per-statement aggregates. The
+    transactions returned (or written) are then all of the applicant's stored rows, so
+    they match the metrics and score.
+    """
+    if applicant_id is None:
+        labeled_df = _extract_and_classify(pdf_file, cluster_func, assign_func)
+        metrics_dict = metrics.aggregate_metrics(labeled_df)
+    else:
+        store = store or applicant_store.get_default_store()
+        statement_id = applicant_store.statement_fingerprint(pdf_file)
+        if not store.has_statement(applicant_id, statement_id):
+            statement_df = _extract_and_classify(pdf_file, cluster_func, assign_func)
+            store.add_statement(applicant_id, statement_id, statement_df, filename=os.path.basename(pdf_file))
+        labeled_df = store.load_transactions(applicant_id)
+        metrics_dict = metrics.merge_accumulators(store.get_accumulators(applicant_id), order_by_date=True).finalize()
     loan_eligibility_score, msg = metrics.calculate_loan_eligibility_score(metrics=metrics_dict)
-    
-    result = {
-        "transactions": labeled_df.to_dict(orient="records"),
+
+    if output_format == "json":
+        result = {"transactions": _transaction_records(labeled_df)}
+    else:
+        write_transactions(labeled_df, transactions_path, output_format)
+        result = {
+            "transactions_path": transactions_path,
+            "transactions_format": output_format,
+            "transaction_count": len(labeled_df)
+        }
+    result.update({
         "metrics": metrics_dict,
         "loan_eligibility_score": loan_eligibility_score,
         "message": msg
-    }
-    print(json.dumps(result, default=str))
+    })
+    if applicant_id is not None:
+        result["applicant_id"] = applicant_id
+        result["statement_count"] = store.statement_count(applicant_id)
+    return result
+
+def write_transactions(df, path, output_format="arrow"):
+    """
+    Writes the transaction table to path in a columnar format, without going through
+    per-row JSON.
+
+    Parameters:
+      df (pd.DataFrame): The classified transactions.
+      path (str): Output file, or a named pipe for "arrow".
+      output_format (str): "arrow" for an Arrow IPC stream (readable with
+                           pyarrow.ipc.open_stream; it can be consumed while it is written),
+                           or "parquet" for a Parquet file.
+    """
+    if output_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if not path:
+        raise ValueError(f"A transactions path is required for {output_format} output")
+    import pyarrow as pa  # Only needed for columnar output.
+    table = _to_arrow_table(df)
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def _to_arrow_table(df):
+    import pyarrow as pa
+    columns = {}
+    for name in df.columns:
+        try:
+            columns[str(name)] = pa.array(df[name], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed object columns (e.g. numbers and text) are kept as text, with missing values as nulls.
+            columns[str(name)] = pa.array(df[name].map(lambda v: None if pd.isna(v) else str(v)), type=pa.string())
+    return pa.table(columns)
+
+def _transaction_records(df):
+    # Dates go out as ISO 8601 text (e.g. 2023-03-12T00:00:00), so consumers read the
+    # calendar date from its first 10 characters instead of parsing display text.
+    records = df.to_dict(orient="records")
+    for record in records:
+        date = record.get("Date")
+        if date is not None and not isinstance(date, str):
+            record["Date"] = None if pd.isna(date) else date.isoformat()
+    return records
+
+def _extract_and_classify(pdf_file, cluster_func, assign_func):
+    extract_df = extract_data.data_extract_and_clean_pipeline(pdf_file)
+    return classification.classification_pipeline(extract_df, cluster_func=cluster_func, assign_func=assign_func)
+
+def document_to_loan_evaluation_pipeline(
+    pdf_file,
+    cluster_func=createTrainingDataset.cluster_transaction_descriptions_with_amounts_split_pytorch,
+    assign_func=transaction_mapping_llm.assign_categories_to_clusters,
+    applicant_id=None,
+    output_format="json",
+    transactions_path=None
+):
+    result = evaluate_document(pdf_file, cluster_func=cluster_func, assign_func=assign_func, applicant_id=applicant_id,
+                               output_format=output_format, transactions_path=transactions_path)
+    print(_to_json(result))
+
+def _to_json(value):
+    """
+    Serializes value as JSON with NaN and infinite floats written as null, since the Node
+    side's JSON.parse rejects them (finalize returns NaN e.g. for spending_std of a
+    statement with one debit).
+    """
+    try:
+        return json.dumps(value, default=str, allow_nan=False)
+    except ValueError:
+        return json.dumps(_replace_non_finite(value), default=str, allow_nan=False)
+
+def _replace_non_finite(value):
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _replace_non_finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_non_finite(item) for item in value]
+    return value
+
+def run_worker(warm_up=True):
+    """
+    Runs a resident worker that reads one JSON job per line from stdin and writes one JSON
+    response per line to stdout, so imports and model loading are paid once per process.
+
+    Protocol:
+      - On startup (after warm-up) the worker writes {"type": "ready", "pid": <pid>}.
+      - Job:      {"id": <request id>, "pdf_file": <path>, "applicant_id": <optional applicant id>,
+                   "output_format": <optional "json" | "arrow" | "parquet">, "transactions_path": <path for columnar output>}
+      - Response: {"type": "result", "id": <request id>, "ok": true, "result": {...}}
+                  {"type": "result", "id": <request id>, "ok": false, "error": "<message>"}
+    The worker exits when stdin is closed.
+    """
+    protocol_out = sys.stdout
+    # Anything else printed while processing goes to stderr so it cannot corrupt the protocol stream.
+    sys.stdout = sys.stderr
+
+    def send(message):
+        protocol_out.write(_to_json(message) + "\n")
+        protocol_out.flush()
+
+    if warm_up:
+        try:
+            model_registry.warm_up()
+        except Exception as e:
+            # Models are loaded lazily on the first job instead.
+            print(f"Model warm-up failed: {type(e).__name__}: {e}", file=sys.stderr)
+    send({"type": "ready", "pid": os.getpid()})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get("id")
+            result = evaluate_document(job["pdf_file"], applicant_id=job.get("applicant_id"),
+                                       output_format=job.get("output_format", "json"),
+                                       transactions_path=job.get("transactions_path"))
+            send({"type": "result", "id": job_id, "ok": True, "result": result})
+        except Exception as e:
+            send({"type": "result", "id": job_id, "ok": False, "error": f"{type(e).__name__}: {e}"})
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        sys.exit("Usage: python -m data_processing.pipeline.pipeline <pdf_file>")
-    pdf_file = sys.argv[1]
-    document_to_loan_evaluation_pipeline(pdf_file)
+        sys.exit("Usage: python pipeline.py <pdf_file> [--applicant <id>] [--format arrow|parquet --transactions-out <path>]"
+                 " | python pipeline.py --worker [--no-warmup]")
+    if sys.argv[1] == "--worker":
+        run_worker(warm_up="--no-warmup" not in sys.argv[2:])
+    else:
+        pdf_file = sys.argv[1]
+        options = sys.argv[2:]
+        def option(name, default=None):
+            return options[options.index(name) + 1] if name in options else default
+        output_format = option("--format", "json")
+        if output_format != "json" and output_format not in COLUMNAR_FORMATS:
+            sys.exit(f"Unknown output format: {output_format}")
+        transactions_path = option("--transactions-out")
+        if output_format != "json" and transactions_path is None:
+            transactions_path = os.path.splitext(pdf_file)[0] + (".arrows" if output_format == "arrow" else ".parquet")
+        document_to_loan_evaluation_pipeline(pdf_file, applicant_id=option("--applicant"),
+                                             output_format=output_format, transactions_path=transactions_path)
@@ -0,0 +1,150 @@
+import os
+import io
+import csv
+import sys
+import json
+import math
+import time
+import sqlite3
+import argparse
+from analyzer import metrics
+
+DEFAULT_RESCORE_BATCH_SIZE = 5000
+
+
+def connect_postgres():
+    """
+    Connects to the evaluations database with the same environment variables as the backend.
+    """
+    import psycopg2  # Only needed for Postgres; the SQLite stand-in uses the standard library.
+    return psycopg2.connect(
+        host=os.environ.get("DB_HOST", "localhost"),
+        port=os.environ.get("DB_PORT", "5432"),
+        user=os.environ.get("DB_USER", "dhruvajb"),
+        password=os.environ.get("DB_PASSWORD", "password"),
+        dbname=os.environ.get("DB_NAME", "loan_evaluator_db"),
+    )
+
+def _is_sqlite(connection):
+    return isinstance(connection, sqlite3.Connection)
+
+def _iter_batches(connection, batch_size):
+    # Yields lists of (id, metrics dict) without loading the whole table.
+    if _is_sqlite(connection):
+        cursor = connection.execute("SELECT id, metrics FROM evaluations ORDER BY id")
+    else:
+        # A named cursor is a server-side cursor: rows arrive batch_size at a time.
+        cursor = connection.cursor(name="rescore_evaluations")
+        cursor.itersize = batch_size
+        cursor.execute("SELECT id, metrics FROM evaluations ORDER BY id")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield [(row_id, json.loads(m) if isinstance(m, str) else (m or {})) for row_id, m in rows]
+    cursor.close()
+
+def _create_staging(connection):
+    if _is_sqlite(connection):
+        connection.execute("DROP TABLE IF EXISTS temp.rescore_staging")
+        connection.execute("CREATE TEMP TABLE rescore_staging (id INTEGER PRIMARY KEY, score REAL, message TEXT)")
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TEMP TABLE rescore_staging (id INTEGER PRIMARY KEY, score DOUBLE PRECISION, message TEXT) "
+                           "ON COMMIT DROP")
+
+def _stage(connection, rows):
+    if _is_sqlite(connection):
+        connection.executemany("INSERT INTO rescore_staging (id, score, message) VALUES (?, ?, ?)", rows)
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row_id, score, message in rows:
+        writer.writerow([row_id, "" if score is None else repr(score), message])
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert("COPY rescore_staging (id, score, message) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def _apply_staging(connection):
+    # One UPDATE joins the staged scores back into the evaluations.
+    query = ("UPDATE evaluations SET loan_eligibility_score = s.score, message = s.message "
+             "FROM rescore_staging s WHERE evaluations.id = s.id")
+    if _is_sqlite(connection):
+        return connection.execute(query).rowcount
+    with connection.cursor() as cursor:
+        cursor.execute(query)
+        return cursor.rowcount
+
+def rescore_evaluations(connection, weights=metrics.DEFAULT_METRICS_DICTIONARY, batch_size=DEFAULT_RESCORE_BATCH_SIZE,
+                        dry_run=False, progress=None):
+    """
+    Recomputes loan_eligibility_score and message for every row of evaluations from its
+    stored metrics, using weights, without reprocessing any PDF.
+
+    Rows are streamed in batches of batch_size (a server-side cursor on Postgres) and scored
+    with metrics.calculate_loan_eligibility_scores. The results are loaded into a temporary
+    staging table (COPY on Postgres) and written back with a single UPDATE, in one transaction.
+
+    Parameters:
+      connection: A psycopg2 connection, or a sqlite3 connection to a stand-in database with
+                  the same evaluations table (metrics stored as JSON text).
+      weights (dict): Scoring weights, e.g. from metrics.get_metrics_dictionary(...).
+      batch_size (int): Rows fetched and scored per batch.
+      dry_run (bool): Score everything but leave the table unchanged.
+      progress (callable): Called with the running stats dict after every batch.
+
+    Returns:
+      dict: rows, updated, seconds and rows_per_second.
+    """
+    started = time.perf_counter()
+    stats = {"rows": 0, "updated": 0, "seconds": 0.0, "rows_per_second": 0.0}
+    try:
+        _create_staging(connection)
+        for batch in _iter_batches(connection, batch_size):
+            ids = [row_id for row_id, _ in batch]
+            scores, messages = metrics.calculate_loan_eligibility_scores(metrics.metrics_frame([m for _, m in batch]), weights)
+            # NaN is not valid JSON; store it as null.
+            _stage(connection, [(row_id, None if math.isnan(score) else float(score), message)
+                                for row_id, score, message in zip(ids, scores, messages)])
+            stats["rows"] += len(batch)
+            stats["seconds"] = time.perf_counter() - started
+            stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+            if progress is not None:
+                progress(dict(stats))
+        if dry_run:
+            connection.rollback()
+        else:
+            stats["updated"] = _apply_staging(connection)
+            connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+def _print_progress(stats):
+    print(f"rescored {stats['rows']} rows in {stats['seconds']:.1f}s ({stats['rows_per_second']:.0f} rows/s)", file=sys.stderr)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-score stored loan evaluations with new weights.")
+    parser.add_argument("--weight", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override one entry of DEFAULT_METRICS_DICTIONARY (repeatable).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_RESCORE_BATCH_SIZE)
+    parser.add_argument("--sqlite", metavar="PATH", help="Use a SQLite stand-in database instead of Postgres.")
+    parser.add_argument("--dry-run", action="store_true", help="Score without writing the results back.")
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.weight:
+        name, _, value = item.partition("=")
+        if name not in metrics.DEFAULT_METRICS_DICTIONARY:
+            sys.exit(f"Unknown weight: {name}")
+        overrides[name] = float(value)
+    connection = sqlite3.connect(args.sqlite) if args.sqlite else connect_postgres()
+    try:
+        result = rescore_evaluations(connection, metrics.get_metrics_dictionary(**overrides), batch_size=args.batch_size,
+                                     dry_run=args.dry_run, progress=_print_progress)
+    finally:
+        connection.close()
+    print(json.dumps(result))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import the data_processing packages (data_parser, analyzer) as top-level modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
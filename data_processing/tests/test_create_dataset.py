@@ -0,0 +1,137 @@
+import random
+import warnings
+
+import pandas as pd
+import pytest
+from dateutil import parser
+
+from data_parser import clean_data_utils
+
+COLUMNS = ["Date", "Transaction Description", "Debit", "Credit", "Balance"]
+
+# Cells seen in extracted statement tables: dates with and without a year, amounts,
+# blanks, text that should be dropped, and text that only looks numeric or like a date.
+CELLS = [
+    "12/03/2023", "03 Mar", "Mar 03", "2023-03-12", "31 Jan 2024", "12.03.2023",
+    "1,234.56", "100.00", "5", "-3.2", "0.50", "99999", "nan", "inf",
+    "", " ", None,
+    "TRANSFER TO SAVINGS", "Opening balance", "Closing", "Account total", "account fee",
+    "Total", "Woolworths 1234", "Staff assisted", "salary", "rent", "Card xx1234",
+]
+
+
+def _reference_date(cell):
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            return parser.parse(cell, fuzzy=False)
+    except Exception:
+        return None
+
+
+def _reference_number(cell):
+    try:
+        return float(cell.replace(",", "").strip())
+    except (ValueError, AttributeError):
+        return None
+
+
+def reference_create_dataset(processed_data):
+    """
+    The row-at-a-time create_dataset that the columnar version replaced, condensed: the
+    previous balance is the balance of the nearest earlier row that has one.
+    """
+    records = []
+    prev_balance = None
+    for idx, row in enumerate(processed_data):
+        date, date_index, numbers = None, None, []
+        for i, cell in enumerate(row):
+            if isinstance(cell, str):
+                if "." not in cell and date is None:
+                    date = _reference_date(cell)
+                    date_index = i if date is not None else None
+                number = _reference_number(cell)
+                if number is not None:
+                    numbers.append((i, number))
+        if not numbers:
+            continue
+        balance_index, balance = numbers[-1]
+        debit = credit = None
+        if len(numbers) > 1 and (idx == 0 or prev_balance is None):
+            credit = numbers[-2][1]
+        elif prev_balance is not None and balance < prev_balance:
+            debit = prev_balance - balance
+        elif prev_balance is not None:
+            credit = balance - prev_balance
+        end_index = numbers[-2][0] if len(numbers) > 1 else balance_index
+        if date is None:
+            description = " ".join(cell.strip() for cell in row[:end_index] if cell and isinstance(cell, str))
+        else:
+            description = " ".join(cell.strip() for cell in row[date_index + 1:end_index]
+                                   if cell and isinstance(cell, str) and cell.strip() and not _reference_date(cell))
+        records.append([date, description, debit, credit, balance])
+        prev_balance = balance
+
+    # A "nan" balance still counts as the previous balance above, but its row is dropped.
+    df = pd.DataFrame(records, columns=COLUMNS, dtype=object)
+    df = df[df["Balance"].notnull()].reset_index(drop=True)
+    text = df["Transaction Description"].str
+    drop = (text.contains(r"opening|closing|staff assisted|cheques written|checks written", case=False)
+            | text.strip().str.lower().isin(["total", "account total", "total 0 0 0"])
+            | (text.contains("account", case=False) & ~text.contains("fee|withdrawal|deposit|transfer", case=False))
+            | (df["Credit"].notnull() & (df["Credit"] > df["Balance"])))
+    return df[~drop]
+
+
+def _random_rows(rng, max_rows=40, max_cells=7):
+    return [[rng.choice(CELLS) for _ in range(rng.randint(0, max_cells))] for _ in range(rng.randint(1, max_rows))]
+
+
+def _cell_types(df):
+    return [[type(value) for value in row] for row in df.itertuples()]
+
+
+def _assert_same_as_reference(rows):
+    expected = reference_create_dataset([list(row) for row in rows])
+    actual = clean_data_utils.create_dataset([list(row) for row in rows])
+    pd.testing.assert_frame_equal(actual, expected)
+    assert _cell_types(actual) == _cell_types(expected)
+    return actual
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_reference_on_random_rows(seed):
+    rng = random.Random(seed)
+    for _ in range(25):
+        _assert_same_as_reference(_random_rows(rng))
+
+
+def test_no_previous_balance():
+    # The first rows carry no amount, so there is no earlier balance to compare with:
+    # the second-rightmost amount is the credit.
+    rows = [
+        ["01/02/2023", "Statement"],
+        ["02/02/2023", "salary", "250.00", "1,250.00"],
+        ["03/02/2023", "rent", "1,000.00"],
+    ]
+    df = _assert_same_as_reference(rows)
+    assert df.iloc[0]["Credit"] == 250.0
+    assert df.iloc[0]["Debit"] is None
+    assert df.iloc[1]["Debit"] == 250.0
+
+
+def test_first_row_credit():
+    rows = [
+        ["01/02/2023", "salary", "300.00", "500.00"],
+        ["02/02/2023", "groceries", "50.00", "450.00"],
+        ["03/02/2023", "refund", "20.00", "470.00"],
+    ]
+    df = _assert_same_as_reference(rows)
+    assert df["Credit"].tolist() == [300.0, None, 20.0]
+    assert df["Debit"].tolist() == [None, 50.0, None]
+
+
+def test_empty_input():
+    df = clean_data_utils.create_dataset([])
+    assert list(df.columns) == COLUMNS
+    assert df.empty
@@ -0,0 +1,56 @@
+-- Copies results stored in loan_evaluations (one JSONB blob per upload) into the
+-- normalized evaluations and transactions tables. Copied evaluations get new ids from
+-- the evaluations sequence, so they never collide with uploads stored there already;
+-- evaluation_backfill maps each legacy id to its new id. Safe to re-run: legacy rows
+-- that are already mapped are skipped.
+--
+--   psql -U <user> -d loan_evaluator_db -f db/backfill_evaluations.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS evaluation_backfill (
+  legacy_id INTEGER PRIMARY KEY,
+  evaluation_id INTEGER NOT NULL UNIQUE  -- kept after the evaluation is deleted, so it is not copied again
+);
+
+-- Legacy rows not copied yet, each with a fresh evaluation id.
+CREATE TEMP TABLE backfill_batch ON COMMIT DROP AS
+SELECT le.id AS legacy_id,
+       nextval(pg_get_serial_sequence('evaluations', 'id'))::integer AS evaluation_id
+FROM loan_evaluations le
+WHERE NOT EXISTS (SELECT 1 FROM evaluation_backfill b WHERE b.legacy_id = le.id);
+
+INSERT INTO evaluations (id, filename, applicant_name, loan_eligibility_score, message, metrics, transaction_count, created_at)
+SELECT b.evaluation_id,
+       le.filename,
+       COALESCE(le.evaluation_result->>'applicantName', 'Unknown'),
+       (le.evaluation_result->>'loan_eligibility_score')::double precision,
+       le.evaluation_result->>'message',
+       COALESCE(le.evaluation_result->'metrics', '{}'),
+       COALESCE(jsonb_array_length(le.evaluation_result->'transactions'), 0),
+       le.created_at
+FROM backfill_batch b
+JOIN loan_evaluations le ON le.id = b.legacy_id;
+
+INSERT INTO evaluation_backfill (legacy_id, evaluation_id)
+SELECT legacy_id, evaluation_id FROM backfill_batch;
+
+-- Only the evaluations copied in this run get transactions, under their new ids.
+INSERT INTO transactions (evaluation_id, row_index, date_text, transaction_date, description, debit, credit, balance, category)
+SELECT b.evaluation_id,
+       t.ordinality - 1,
+       t.r->>'Date',
+       -- The pipeline writes dates as ISO text; only its calendar-date prefix is read, as in
+       -- transactionDate in backend/services/evaluationStore.js.
+       CASE WHEN t.r->>'Date' ~ '^\d{4}-\d{2}-\d{2}([T ]|$)' THEN left(t.r->>'Date', 10)::date END,
+       t.r->>'Transaction Description',
+       CASE WHEN jsonb_typeof(t.r->'Debit') = 'number' THEN (t.r->>'Debit')::double precision END,
+       CASE WHEN jsonb_typeof(t.r->'Credit') = 'number' THEN (t.r->>'Credit')::double precision END,
+       CASE WHEN jsonb_typeof(t.r->'Balance') = 'number' THEN (t.r->>'Balance')::double precision END,
+       t.r->>'Category'
+FROM backfill_batch b
+JOIN loan_evaluations le ON le.id = b.legacy_id
+CROSS JOIN LATERAL jsonb_array_elements(le.evaluation_result->'transactions') WITH ORDINALITY AS t(r, ordinality)
+WHERE jsonb_typeof(le.evaluation_result->'transactions') = 'array';
+
+COMMIT;
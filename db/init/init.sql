@@ -1,3 +1,5 @@
+-- Results written by earlier versions, one JSONB blob per upload. db/backfill_evaluations.sql
+-- copies them into the evaluations and transactions tables below.
 
 CREATE TABLE IF NOT EXISTS loan_evaluations (
   id SERIAL PRIMARY KEY,
@@ -5,3 +7,34 @@ CREATE TABLE IF NOT EXISTS loan_evaluations (
   evaluation_result JSONB NOT NULL,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+-- One row per processed statement: the summary and metrics, without the transactions.
+CREATE TABLE IF NOT EXISTS evaluations (
+  id SERIAL PRIMARY KEY,
+  filename VARCHAR(255) NOT NULL,
+  applicant_name TEXT NOT NULL,
+  applicant_id TEXT,
+  loan_eligibility_score DOUBLE PRECISION,
+  message TEXT,
+  metrics JSONB NOT NULL DEFAULT '{}',
+  transaction_count INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS evaluations_applicant_id_idx ON evaluations (applicant_id);
+
+-- The classified transactions of each evaluation, fetched per evaluation on demand.
+CREATE TABLE IF NOT EXISTS transactions (
+  evaluation_id INTEGER NOT NULL REFERENCES evaluations (id) ON DELETE CASCADE,
+  row_index INTEGER NOT NULL,
+  date_text TEXT,
+  transaction_date DATE,
+  description TEXT,
+  debit DOUBLE PRECISION,
+  credit DOUBLE PRECISION,
+  balance DOUBLE PRECISION,
+  category TEXT,
+  PRIMARY KEY (evaluation_id, row_index)
+);
+
+CREATE INDEX IF NOT EXISTS transactions_evaluation_date_idx ON transactions (evaluation_id, transaction_date);
@@ -42,9 +42,18 @@ interface EvaluationRecord {
   id: number;
   filename: string;
   evaluation_result: EvaluationResult;
+  transaction_count: number;
   created_at: string;
 }
 
+// One page of evaluation summaries (transactions are fetched per evaluation).
+interface EvaluationPage {
+  items: EvaluationRecord[];
+  nextBefore: number | null;
+}
+
+const API_BASE = 'http://127.0.0.1:8000/api/pdf';
+
 const defaultMetrics: Metrics = {
   starting_balance: 0,
   ending_balance: 0,
@@ -59,6 +68,8 @@ const defaultMetrics: Metrics = {
 const MetricsPage: React.FC = () => {
   const [evaluations, setEvaluations] = useState<EvaluationRecord[]>([]);
   const [selectedEvaluation, setSelectedEvaluation] = useState<EvaluationRecord | null>(null);
+  const [nextBefore, setNextBefore] = useState<number | null>(null);
+  const [transactionsById, setTransactionsById] = useState<Record<number, Transaction[]>>({});
   const [filterName, setFilterName] = useState<string>('');
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string>('');
@@ -70,43 +81,59 @@ const MetricsPage: React.FC = () => {
     else return 'Ineligible for loan';
   };
 
-  // Fetch evaluations from the backend
-  useEffect(() => {
-    const fetchEvaluations = async () => {
-      try {
-        const response = await axios.get<EvaluationRecord[]>('http://127.0.0.1:8000/api/pdf/evaluations');
-        console.log('Fetched evaluations:', response.data);
-        setEvaluations(response.data);
-        // Set the first evaluation as selected if available.
-        if (response.data.length > 0) {
-          setSelectedEvaluation(response.data[0]);
-        }
-      } catch (err: any) {
-        console.error('Error fetching evaluations:', err);
-        setError('Failed to fetch evaluations.');
-      } finally {
-        setLoading(false);
+  // Fetch a page of evaluation summaries from the backend (the newest page when before is null).
+  const fetchEvaluations = async (before: number | null) => {
+    try {
+      const response = await axios.get<EvaluationPage>(`${API_BASE}/evaluations`, {
+        params: before !== null ? { before } : {},
+      });
+      console.log('Fetched evaluations:', response.data);
+      setEvaluations((previous) => (before === null ? response.data.items : [...previous, ...response.data.items]));
+      setNextBefore(response.data.nextBefore);
+      // Set the first evaluation as selected if available.
+      if (before === null && response.data.items.length > 0) {
+        setSelectedEvaluation(response.data.items[0]);
       }
-    };
-    fetchEvaluations();
+    } catch (err: any) {
+      console.error('Error fetching evaluations:', err);
+      setError('Failed to fetch evaluations.');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    fetchEvaluations(null);
   }, []);
 
+  // Fetch the selected evaluation's transactions once, on demand.
+  useEffect(() => {
+    if (!selectedEvaluation || transactionsById[selectedEvaluation.id]) return;
+    const evaluationId = selectedEvaluation.id;
+    axios
+      .get<Transaction[]>(`${API_BASE}/evaluations/${evaluationId}/transactions`)
+      .then((response) => setTransactionsById((previous) => ({ ...previous, [evaluationId]: response.data })))
+      .catch((err) => console.error('Error fetching transactions:', err));
+  }, [selectedEvaluation]);
+
+  const transactions: Transaction[] | undefined = selectedEvaluation ? transactionsById[selectedEvaluation.id] : undefined;
+
   // Filter evaluations based on applicant name.
   const filteredEvaluations = evaluations.filter((evalRec) =>
     evalRec.evaluation_result.applicantName.toLowerCase().includes(filterName.toLowerCase())
   );
 
   // Data for charts. We'll use the transactions array.
-  const balanceData = selectedEvaluation?.evaluation_result.transactions
-    ? selectedEvaluation.evaluation_result.transactions.map((tx, i) => ({
+  const balanceData = transactions
+    ? transactions.map((tx, i) => ({
         time: tx.Date ? new Date(tx.Date).toLocaleDateString() : `T${i + 1}`,
         balance: tx.Balance !== undefined ? Number(tx.Balance) : 0,
       }))
     : [];
     console.log('Balance Data:', balanceData);
   // Expenses data: only transactions with Debit values.
-  const expensesData = selectedEvaluation?.evaluation_result.transactions
-    ? selectedEvaluation.evaluation_result.transactions
+  const expensesData = transactions
+    ? transactions
         .filter((tx: Transaction) => tx.Debit !== null)
         .map((tx: Transaction, i: number) => ({
           time: tx.Date ? new Date(tx.Date).toLocaleDateString() : `T${i + 1}`,
@@ -115,8 +142,8 @@ const MetricsPage: React.FC = () => {
     : [];
     console.log('Expense Data:', expensesData);
   // Income data: only transactions with Credit values.
-  const incomeData = selectedEvaluation?.evaluation_result.transactions
-    ? selectedEvaluation.evaluation_result.transactions
+  const incomeData = transactions
+    ? transactions
         .filter((tx: Transaction) => tx.Credit !== null)
         .map((tx: Transaction, i: number) => ({
           time: tx.Date ? new Date(tx.Date).toLocaleDateString() : `T${i + 1}`,
@@ -190,6 +217,11 @@ const MetricsPage: React.FC = () => {
           {evalRec.evaluation_result.applicantName}
         </button>
         ))}
+        {nextBefore !== null && (
+          <button onClick={() => fetchEvaluations(nextBefore)} style={{ padding: '0.5rem 1rem' }}>
+            Load more
+          </button>
+        )}
       </div>
       
       {/* Display text with applicant name and loan eligibility score */}
@@ -287,8 +319,8 @@ const MetricsPage: React.FC = () => {
       </tr>
     </thead>
     <tbody>
-      {selectedEvaluation.evaluation_result.transactions && selectedEvaluation.evaluation_result.transactions.length > 0 ? (
-        selectedEvaluation.evaluation_result.transactions.map((tx: Transaction, index: number) => (
+      {transactions && transactions.length > 0 ? (
+        transactions.map((tx: Transaction, index: number) => (
           <tr key={index}>
             <td style={{ border: '1px solid black', padding: '0.5rem' }}>
               {tx.Date ? new Date(tx.Date).toLocaleDateString() : `T${index + 1}`}